@@ -66,3 +66,26 @@ def require_role(*roles):
             return f(*args, **kwargs)
         return decorated
     return decorator
+
+
+def get_include_fields(data=None):
+    """
+    Read the response field groups a client asked for.
+
+    Taken from "include" (or its alias "fields") in the JSON body, as a
+    list or a comma-separated string, or else from the query string.
+
+    Returns:
+        Set of field group names, or None if the client did not restrict them
+    """
+    sources = [data if isinstance(data, dict) else {}, request.args]
+    values = [source[key] for source in sources for key in ('include', 'fields')
+              if source.get(key) is not None]
+    if not values:
+        return None
+    value = values[0]
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError('include must be a list or a comma-separated string')
+    return {str(name).strip() for name in value if str(name).strip()}
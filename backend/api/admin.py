@@ -2,7 +2,13 @@
 from flask import Blueprint, request, jsonify
 
 from api import require_role
+from ml.registry import get_model_registry, read_manifest
+from ml.model_reload import get_model_reloader
+from ml.dispatcher import get_dispatcher
+from ml.pipeline import get_scoring_pipeline
+from ml.what_if import get_what_if_engine
 from utils.audit_logger import get_audit_logger
+from utils.narrative import get_narrative_cache, get_narrative_client
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -19,6 +25,10 @@ def get_audit_logs():
         - user: Filter by user email
         - role: Filter by role (citizen, bank, admin)
         - action: Filter by action type
+        - applicant_id: Filter by applicant ID
+        - risk_category: Filter by risk category
+        - cursor: next_cursor of the previous page (keyset pagination with
+          AUDIT_STORAGE=sqlite; takes the place of offset)
 
     Response:
         {
@@ -38,7 +48,8 @@ def get_audit_logs():
                 "avg_score": 650,
                 "total_filtered": 100,
                 "showing": 50
-            }
+            },
+            "next_cursor": "2024-01-15T10:29:58.123456|1042"
         }
     """
     limit = request.args.get('limit', 100, type=int)
@@ -46,6 +57,9 @@ def get_audit_logs():
     user_filter = request.args.get('user')
     role_filter = request.args.get('role')
     action_filter = request.args.get('action')
+    applicant_filter = request.args.get('applicant_id')
+    risk_filter = request.args.get('risk_category')
+    cursor = request.args.get('cursor')
 
     # Validate parameters
     limit = min(max(limit, 1), 500)  # Between 1 and 500
@@ -64,19 +78,28 @@ def get_audit_logs():
                 'offset': offset,
                 'user': user_filter,
                 'role': role_filter,
-                'action': action_filter
+                'action': action_filter,
+                'applicant_id': applicant_filter,
+                'risk_category': risk_filter,
+                'cursor': cursor
             }
         }
     )
 
     # Get filtered logs
-    result = logger.get_logs(
-        limit=limit,
-        offset=offset,
-        user_filter=user_filter,
-        role_filter=role_filter,
-        action_filter=action_filter
-    )
+    try:
+        result = logger.get_logs(
+            limit=limit,
+            offset=offset,
+            user_filter=user_filter,
+            role_filter=role_filter,
+            action_filter=action_filter,
+            applicant_filter=applicant_filter,
+            risk_filter=risk_filter,
+            cursor=cursor
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify(result)
 
@@ -87,14 +110,25 @@ def get_stats():
     """
     Get system statistics.
 
+    All values are maintained incrementally as events are logged, so this
+    does not read the log.
+
     Response:
         {
             "total_requests": 150,
+            "score_count": 120,
             "avg_score": 650,
             "min_score": 450,
             "max_score": 820,
             "requests_by_role": {"citizen": 100, "bank": 50},
-            "requests_last_24h": 25
+            "risk_distribution": {"Excellent": 10, "Very Good": 25, ...},
+            "score_histogram": {"300-349": 2, "350-399": 4, ...},
+            "requests_last_24h": 25,
+            "windows": {
+                "1h": {"requests": 4, "scored": 3, "avg_score": 655},
+                "24h": {"requests": 25, "scored": 20, "avg_score": 648},
+                "7d": {"requests": 90, "scored": 71, "avg_score": 651}
+            }
         }
     """
     logger = get_audit_logger()
@@ -144,25 +178,24 @@ def system_health():
                 "model": "loaded",
                 "scaler": "loaded",
                 "audit_log": "available"
+            },
+            "artifacts": {
+                "model": {"status": "loaded", "load_ms": 41.2, "rss_delta_mb": 3.1, ...},
+                ...
             }
         }
     """
-    import os
     from config import Config
 
     components = {}
 
-    # Check model
-    if os.path.exists(Config.MODEL_PATH):
-        components['model'] = 'loaded'
-    else:
-        components['model'] = 'not_found'
-
-    # Check scaler
-    if os.path.exists(Config.SCALER_PATH):
-        components['scaler'] = 'loaded'
-    else:
-        components['scaler'] = 'not_found'
+    # Check model artifacts (loaded once into the shared registry)
+    registry = get_model_registry()
+    registry.load_all()
+    components['model'] = registry.status('model')
+    components['scaler'] = registry.status('scaler')
+    components['anomaly_detector'] = registry.status('anomaly_detector')
+    components['model_version'] = registry.version
 
     # Check audit log
     try:
@@ -174,20 +207,154 @@ def system_health():
 
     # Check HuggingFace API
     if Config.HUGGINGFACE_API_KEY:
-        components['huggingface_api'] = 'configured'
+        components['huggingface_api'] = f"configured (circuit {get_narrative_client().breaker.state})"
     else:
         components['huggingface_api'] = 'not_configured (using templates)'
 
     # Overall status
     critical_components = ['model', 'scaler', 'audit_log']
     all_ok = all(
-        components.get(c) in ['loaded', 'available', 'configured', 'not_configured (using templates)']
+        components.get(c) in ['loaded', 'skipped', 'available', 'configured', 'not_configured (using templates)']
         for c in critical_components
     )
 
     return jsonify({
         'status': 'healthy' if all_ok else 'degraded',
-        'components': components
+        'components': components,
+        'artifacts': registry.stats()
+    })
+
+
+@admin_bp.route('/models', methods=['GET'])
+@require_role('admin')
+def model_status():
+    """
+    Get the live model version, the version manifest and the last reload.
+
+    Response:
+        {
+            "active_version": "20250101-120000",
+            "manifest": {"active": "20250101-120000", "versions": {...}},
+            "reload_in_progress": false,
+            "watcher_running": true,
+            "last_reload": {"status": "swapped", "version": "...", "smoke_test": {...}, ...}
+        }
+    """
+    return jsonify(get_model_reloader().status())
+
+
+@admin_bp.route('/models/reload', methods=['POST'])
+@require_role('admin')
+def reload_model():
+    """
+    Load a model version, smoke-test it and swap it in without downtime.
+
+    Request body (all optional):
+        {
+            "version": "20250101-120000",   # default: the manifest's active version
+            "activate": true,               # also set it active in the manifest (default true)
+            "wait": false                   # block until the reload finishes
+        }
+
+    Response:
+        202 {"status": "started", ...} when running in the background,
+        200 {"status": "swapped", ...} / 409 {"status": "failed", ...} with wait,
+        409 {"status": "busy"} if a reload is already running
+    """
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    activate = bool(data.get('activate', True))
+    wait = bool(data.get('wait', False))
+
+    if version is not None and version not in read_manifest().get('versions', {}):
+        return jsonify({'error': f"Unknown model version '{version}'"}), 404
+
+    reloader = get_model_reloader()
+    result = reloader.reload(version, activate=activate, background=not wait)
+
+    logger = get_audit_logger()
+    logger.log_score_request(
+        user_email=request.user.get('email', 'unknown'),
+        user_role='admin',
+        action='model_reload',
+        additional_data={
+            'version': version,
+            'status': result['status'],
+            'error': result.get('error')
+        },
+        model_version=result.get('version') if result['status'] == 'swapped' else None
+    )
+
+    if result['status'] == 'started':
+        return jsonify(result), 202
+    if result['status'] in ('busy', 'failed'):
+        return jsonify(result), 409
+    return jsonify(result)
+
+
+@admin_bp.route('/metrics', methods=['GET'])
+@require_role('admin')
+def get_metrics():
+    """
+    Get in-process serving metrics for this worker.
+
+    Response:
+        {
+            "pid": 12345,
+            "dispatcher": {
+                "enabled": true,
+                "queue_depth": 0,
+                "batches": 120,
+                "rows": 900,
+                "batch_size_histogram": {"<=1": 40, "<=2": 10, ...},
+                "wait_ms": {"p50": 0.4, "p99": 2.1, "max": 2.6},
+                ...
+            },
+            "audit_writer": {
+                "queue_depth": 0,
+                "flushes": 80,
+                "avg_group_size": 3.1,
+                "dropped": 0,
+                "spilled": 0,
+                "flush_ms": {"p50": 0.1, "p99": 0.9, "max": 1.4},
+                ...
+            },
+            "pipeline": {
+                "runs": 200,
+                "rows": 450,
+                "stage_ms": {"extract": {"samples": 200, "p50": 0.3, "p99": 1.1}, ...},
+                "cache": {"size": 120, "hits": 310, "misses": 140, "evictions": 0, "hit_rate": 0.6889, ...},
+                ...
+            },
+            "what_if": {
+                "sessions": {"size": 12, "hits": 85, "misses": 1, ...},
+                "evaluations": 85,
+                "trees": 150,
+                "avg_trees_evaluated": 31.4
+            },
+            "narratives": {
+                "calls": 40,
+                "in_budget": 31,
+                "late": 9,
+                "failed": 0,
+                "circuit_open": 0,
+                "breaker": {"state": "closed", "opened": 0},
+                "latency_ms": {"p50": 180.2, "p99": 290.4, "max": 298.7},
+                ...
+            },
+            "narrative_cache": {"size": 420, "hits": 3100, "misses": 450, "hit_rate": 0.8732, "loaded": 380, ...}
+        }
+    """
+    import os
+
+    return jsonify({
+        'pid': os.getpid(),
+        'dispatcher': get_dispatcher().metrics(),
+        'audit_writer': get_audit_logger().metrics(),
+        'pipeline': get_scoring_pipeline().metrics(),
+        'what_if': get_what_if_engine().metrics(),
+        'narratives': get_narrative_client().metrics(),
+        'narrative_cache': get_narrative_cache().metrics()
     })
 
 
@@ -195,24 +362,70 @@ def system_health():
 @require_role('admin')
 def export_logs():
     """
-    Export all audit logs as JSON.
+    Stream audit logs as a file download.
+
+    Rows are read from the audit store and written to the response as they
+    are produced, oldest first, so memory stays flat however much history
+    is exported.
+
+    Query parameters:
+        - format: json (default; {"logs": [...], "stats": {...}}), ndjson or csv
+        - since / until: ISO timestamps bounding the export (until is exclusive)
+        - user, role, action, applicant_id, risk_category: Filters as for /audit
+        - gzip: true to gzip the stream (file name gets a .gz suffix)
 
     Response:
-        Full audit log data as JSON download
+        Chunked attachment audit_logs.<format>[.gz]
     """
+    from datetime import datetime
     from flask import Response
-    import json
+    from utils.audit_export import EXPORT_FORMATS, export_chunks, gzip_chunks
+
+    fmt = request.args.get('format', 'json').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    bounds = {}
+    for name in ('since', 'until'):
+        value = request.args.get(name)
+        if value:
+            try:
+                bounds[name] = datetime.fromisoformat(value).isoformat()
+            except ValueError:
+                return jsonify({'error': f"{name} must be an ISO timestamp"}), 400
+
+    filters = {
+        'user_filter': request.args.get('user'),
+        'role_filter': request.args.get('role'),
+        'action_filter': request.args.get('action'),
+        'applicant_filter': request.args.get('applicant_id'),
+        'risk_filter': request.args.get('risk_category'),
+    }
+    compress = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
 
     logger = get_audit_logger()
-    result = logger.get_logs(limit=10000)  # Get all logs
+    logger.log_score_request(
+        user_email=request.user.get('email', 'unknown'),
+        user_role='admin',
+        action='audit_export',
+        additional_data={'format': fmt, 'gzip': compress, **bounds,
+                         'filters': {key: value for key, value in filters.items() if value}}
+    )
+
+    def trailer(count):
+        return {**logger.running_totals(), 'total_filtered': count, 'showing': count, 'offset': 0}
 
-    # Create downloadable response
-    response = Response(
-        json.dumps(result, indent=2),
-        mimetype='application/json',
+    chunks = export_chunks(logger.iter_logs(**filters, **bounds), fmt, trailer)
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f'audit_logs.{extension}'
+    if compress:
+        chunks = gzip_chunks(chunks)
+        mimetype, filename = 'application/gzip', filename + '.gz'
+
+    return Response(
+        chunks,
+        mimetype=mimetype,
         headers={
-            'Content-Disposition': 'attachment; filename=audit_logs.json'
+            'Content-Disposition': f'attachment; filename={filename}'
         }
     )
-
-    return response
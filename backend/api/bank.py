@@ -1,11 +1,10 @@
 """Bank API endpoints for credit risk assessment."""
 from flask import Blueprint, request, jsonify
 
-from api import require_role
-from ml.feature_extractor import FeatureExtractor, parse_csv_transactions
-from ml.predictor import get_predictor
-from ml.explainer import get_explainer
-from ml.counterfactual import get_counterfactual_generator
+from config import Config
+from api import require_role, get_include_fields
+from ml.feature_extractor import parse_csv_transactions
+from ml.pipeline import FIELD_STAGES, get_scoring_pipeline, stages_for_fields
 from utils.audit_logger import get_audit_logger
 from utils.recommendations import get_recommendation_engine
 
@@ -32,6 +31,13 @@ def assess_risk():
             "csv_content": "date,amount,category,type,balance\\n..."
         }
 
+        Optional "include" (list or comma-separated string, also accepted as
+        the include/fields query parameter) limits the response to the listed
+        field groups - score, recommendation (risk_level, recommendation),
+        factors (risk_factors, positive_factors, feature_importance), anomaly -
+        and skips the stages the others need. "score" (applicant_id, score,
+        probability_of_default, model_version) is always returned.
+
     Response:
         {
             "applicant_id": "APP123",
@@ -46,7 +52,9 @@ def assess_risk():
                 "conditions": [...]
             },
             "risk_factors": [...],
-            "positive_factors": [...]
+            "positive_factors": [...],
+            "anomaly": {"anomaly_score": -0.08, "is_anomaly": false},
+            "model_version": "20250101-120000"
         }
     """
     data = request.get_json()
@@ -67,66 +75,62 @@ def assess_risk():
     if not transactions:
         return jsonify({'error': 'Could not parse transaction data'}), 400
 
-    # Extract features
-    extractor = FeatureExtractor()
-    features = extractor.extract_features(transactions)
-
-    # Get prediction
-    predictor = get_predictor()
-    prediction = predictor.predict(features.copy())
-
-    score = prediction['score']
-    category = prediction['category']
-    prob_default = prediction['probability_of_default']
-    raw_features = prediction.get('raw_features', {})
-
-    # Generate explanations
-    explainer = get_explainer()
-    explanations = explainer.explain(
-        prediction['feature_vector'],
-        prediction['feature_values'],
-        raw_features
-    )
-
-    # Generate bank recommendations
-    recommender = get_recommendation_engine()
-    bank_recommendation = recommender.generate_bank_recommendations(
-        score, category, prob_default, explanations, raw_features
-    )
-
-    # Log the request
-    logger = get_audit_logger()
-    logger.log_score_request(
-        user_email=request.user.get('email', 'unknown'),
-        user_role='bank',
-        action='risk_assessment',
-        score=score,
-        risk_category=category,
-        applicant_id=applicant_id,
-        additional_data={
-            'decision': bank_recommendation['decision'],
-            'risk_level': bank_recommendation['risk_level']
-        }
-    )
+    try:
+        fields = get_include_fields(data)
+        stages = stages_for_fields('bank', fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if fields is None:
+        fields = set(FIELD_STAGES['bank'])
+
+    user_email = request.user.get('email', 'unknown')
+
+    def audit(result):
+        bank_recommendation = result.recommendations
+        get_audit_logger().log_score_request(
+            user_email=user_email,
+            user_role='bank',
+            action='risk_assessment',
+            score=result.score,
+            risk_category=result.category,
+            applicant_id=result.applicant_id,
+            additional_data={
+                'decision': bank_recommendation['decision'],
+                'risk_level': bank_recommendation['risk_level']
+            } if bank_recommendation else None,
+            model_version=result.model_version
+        )
+
+    # Extract -> predict -> anomaly -> explain -> recommend -> audit (no counterfactuals),
+    # skipping the stages no requested field needs
+    result = get_scoring_pipeline().run([transactions], audience='bank', stages=stages, audit=audit,
+                                        applicant_ids=[applicant_id]).applicants[0]
 
     # Build response
     response = {
         'applicant_id': applicant_id,
-        'score': score,
-        'risk_level': bank_recommendation['risk_level'],
-        'probability_of_default': prob_default,
-        'recommendation': {
+        'score': result.score,
+        'probability_of_default': result.probability_of_default,
+        'model_version': result.model_version
+    }
+    if 'recommendation' in fields:
+        bank_recommendation = result.recommendations
+        response['risk_level'] = bank_recommendation['risk_level']
+        response['recommendation'] = {
             'decision': bank_recommendation['decision'],
             'suggested_limit': bank_recommendation['suggested_limit'],
             'interest_rate_tier': bank_recommendation['interest_rate_tier'],
             'monitoring_flags': bank_recommendation['monitoring_flags'],
             'conditions': bank_recommendation['conditions'],
             'confidence': bank_recommendation['confidence']
-        },
-        'risk_factors': explanations.get('negative', []),
-        'positive_factors': explanations.get('positive', []),
-        'feature_importance': explanations.get('feature_importance', {})
-    }
+        }
+    if 'factors' in fields:
+        explanations = result.explanations
+        response['risk_factors'] = explanations.get('negative', [])
+        response['positive_factors'] = explanations.get('positive', [])
+        response['feature_importance'] = explanations.get('feature_importance', {})
+    if 'anomaly' in fields:
+        response['anomaly'] = result.anomaly
 
     return jsonify(response)
 
@@ -156,7 +160,8 @@ def batch_assess():
                 "approved": 1,
                 "conditional": 1,
                 "denied": 0
-            }
+            },
+            "model_version": "20250101-120000"
         }
     """
     data = request.get_json()
@@ -165,84 +170,217 @@ def batch_assess():
         return jsonify({'error': 'No applicants data provided'}), 400
 
     applicants = data['applicants']
-    results = []
+    results = [None] * len(applicants)
     summary = {'total': 0, 'approved': 0, 'conditional': 0, 'review': 0}
 
-    extractor = FeatureExtractor()
-    predictor = get_predictor()
-    explainer = get_explainer()
-    recommender = get_recommendation_engine()
-    logger = get_audit_logger()
-
-    for applicant in applicants:
-        applicant_id = applicant.get('applicant_id', 'UNKNOWN')
-        transactions = applicant.get('transactions', [])
-
-        if not transactions:
-            results.append({
-                'applicant_id': applicant_id,
+    pipeline = get_scoring_pipeline()
+    user_email = request.user.get('email', 'unknown')
+
+    # Applicants with transactions are scored together in one vectorized pass
+    scored = []
+    for i, applicant in enumerate(applicants):
+        if applicant.get('transactions'):
+            scored.append(i)
+        else:
+            results[i] = {
+                'applicant_id': applicant.get('applicant_id', 'UNKNOWN'),
                 'error': 'No transaction data'
-            })
-            continue
+            }
 
+    def audit(result):
+        get_audit_logger().log_score_request(
+            user_email=user_email,
+            user_role='bank',
+            action='batch_assessment',
+            score=result.score,
+            risk_category=result.category,
+            applicant_id=result.applicant_id,
+            model_version=result.model_version
+        )
+
+    # Batch decisions need neither counterfactuals nor narratives
+    outcomes = []
+    if scored:
         try:
-            # Process
-            features = extractor.extract_features(transactions)
-            prediction = predictor.predict(features.copy())
-
-            explanations = explainer.explain(
-                prediction['feature_vector'],
-                prediction['feature_values'],
-                prediction.get('raw_features', {})
-            )
+            outcomes = pipeline.run(
+                [applicants[i]['transactions'] for i in scored],
+                audience='bank',
+                audit=audit,
+                applicant_ids=[applicants[i].get('applicant_id', 'UNKNOWN') for i in scored],
+                row_errors=True
+            ).applicants
+        except Exception as e:
+            for i in scored:
+                results[i] = {
+                    'applicant_id': applicants[i].get('applicant_id', 'UNKNOWN'),
+                    'error': str(e)
+                }
+
+    for i, result in zip(scored, outcomes):
+        if result.error is not None:
+            results[i] = {
+                'applicant_id': result.applicant_id,
+                'error': result.error
+            }
+            continue
 
-            bank_rec = recommender.generate_bank_recommendations(
-                prediction['score'],
-                prediction['category'],
-                prediction['probability_of_default'],
-                explanations,
-                prediction.get('raw_features', {})
-            )
+        bank_rec = result.recommendations
+
+        # Track summary
+        decision = bank_rec['decision']
+        if decision == 'APPROVE':
+            summary['approved'] += 1
+        elif decision == 'APPROVE_WITH_CONDITIONS':
+            summary['conditional'] += 1
+        else:
+            summary['review'] += 1
+
+        summary['total'] += 1
+
+        results[i] = {
+            'applicant_id': result.applicant_id,
+            'score': result.score,
+            'risk_level': bank_rec['risk_level'],
+            'decision': decision,
+            'suggested_limit': bank_rec['suggested_limit'],
+            'confidence': bank_rec['confidence']
+        }
+        if result.anomaly is not None:
+            results[i]['is_anomaly'] = result.anomaly['is_anomaly']
 
-            # Log
-            logger.log_score_request(
-                user_email=request.user.get('email', 'unknown'),
-                user_role='bank',
-                action='batch_assessment',
-                score=prediction['score'],
-                risk_category=prediction['category'],
-                applicant_id=applicant_id
-            )
+    return jsonify({
+        'results': results,
+        'summary': summary,
+        'model_version': pipeline.model_version
+    })
 
-            # Track summary
-            decision = bank_rec['decision']
-            if decision == 'APPROVE':
-                summary['approved'] += 1
-            elif decision == 'APPROVE_WITH_CONDITIONS':
-                summary['conditional'] += 1
-            else:
-                summary['review'] += 1
 
-            summary['total'] += 1
+@bank_bp.route('/batch/improvements', methods=['POST'])
+@require_role('bank', 'admin')
+def batch_improvements():
+    """
+    Find what would move each applicant in a queue to a target decision.
 
-            results.append({
-                'applicant_id': applicant_id,
-                'score': prediction['score'],
-                'risk_level': bank_rec['risk_level'],
-                'decision': decision,
-                'suggested_limit': bank_rec['suggested_limit'],
-                'confidence': bank_rec['confidence']
-            })
+    Request body:
+        {
+            "applicants": [
+                {"applicant_id": "APP123", "transactions": [...]},
+                ...
+            ],
+            "target_decision": "APPROVE"    (optional, default APPROVE)
+        }
+
+    Response:
+        {
+            "results": [
+                {
+                    "applicant_id": "APP123",
+                    "score": 610,
+                    "decision": "APPROVE_WITH_CONDITIONS",
+                    "reaches_target": true,
+                    "potential_score": 684,
+                    "potential_decision": "APPROVE",
+                    "changes": [
+                        {"lever": "overdraft", "action": "Eliminate overdrafts",
+                         "current": "15% transactions overdraft", "target": "No overdrafts"}
+                    ]
+                },
+                ...
+            ],
+            "summary": {"total": 1, "already_met": 0, "reachable": 1, "unreachable": 0},
+            "target_decision": "APPROVE",
+            "target_score": 670,
+            "model_version": "20250101-120000"
+        }
+    """
+    data = request.get_json()
 
+    if not data or 'applicants' not in data:
+        return jsonify({'error': 'No applicants data provided'}), 400
+
+    decisions = get_recommendation_engine().BANK_DECISIONS
+    target_decision = data.get('target_decision', 'APPROVE')
+    floors = [Config.RISK_CATEGORIES[category][0]
+              for category, decision in decisions.items() if decision == target_decision]
+    if not floors:
+        return jsonify({'error': f"Unknown target_decision '{target_decision}'"}), 400
+    target_score = min(floors)
+
+    applicants = data['applicants']
+    results = [None] * len(applicants)
+    summary = {'total': 0, 'already_met': 0, 'reachable': 0, 'unreachable': 0}
+
+    pipeline = get_scoring_pipeline()
+    user_email = request.user.get('email', 'unknown')
+
+    scored = []
+    for i, applicant in enumerate(applicants):
+        if applicant.get('transactions'):
+            scored.append(i)
+        else:
+            results[i] = {
+                'applicant_id': applicant.get('applicant_id', 'UNKNOWN'),
+                'error': 'No transaction data'
+            }
+
+    # One vectorized extract and predict, then every applicant's candidate
+    # grid scored in memory-capped chunks
+    plans = None
+    if scored:
+        try:
+            features = pipeline.extract([applicants[i]['transactions'] for i in scored])
+            prediction = pipeline.predict(features)
+            plans = pipeline.counterfactual.search_many(features.feature_matrix, features.raw_matrix,
+                                                        scores=prediction.score, target_scores=target_score)
         except Exception as e:
-            results.append({
+            for i in scored:
+                results[i] = {
+                    'applicant_id': applicants[i].get('applicant_id', 'UNKNOWN'),
+                    'error': str(e)
+                }
+
+    if plans is not None:
+        for row, i in enumerate(scored):
+            applicant_id = applicants[i].get('applicant_id', 'UNKNOWN')
+            score = int(prediction.score[row])
+            category = str(prediction.category[row])
+            reaches = bool(plans['reaches_target'][row])
+
+            if score >= target_score:
+                summary['already_met'] += 1
+            elif reaches:
+                summary['reachable'] += 1
+            else:
+                summary['unreachable'] += 1
+            summary['total'] += 1
+
+            results[i] = {
                 'applicant_id': applicant_id,
-                'error': str(e)
-            })
+                'score': score,
+                'decision': decisions.get(category, 'MANUAL_REVIEW'),
+                'reaches_target': reaches,
+                'potential_score': int(plans['score'][row]),
+                'potential_decision': decisions.get(plans['category'][row], 'MANUAL_REVIEW'),
+                'changes': pipeline.counterfactual.describe_plan(plans['current'][row], plans['changes'][row])
+            }
+
+            get_audit_logger().log_score_request(
+                user_email=user_email,
+                user_role='bank',
+                action='improvement_plan',
+                score=score,
+                risk_category=category,
+                applicant_id=applicant_id,
+                additional_data={'target_decision': target_decision, 'reaches_target': reaches},
+                model_version=prediction.model_version
+            )
 
     return jsonify({
         'results': results,
-        'summary': summary
+        'summary': summary,
+        'target_decision': target_decision,
+        'target_score': target_score,
+        'model_version': pipeline.model_version
     })
 
 
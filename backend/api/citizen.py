@@ -1,13 +1,12 @@
 """Citizen API endpoints for credit score assessment."""
 from flask import Blueprint, request, jsonify
 
-from api import require_role
-from ml.feature_extractor import FeatureExtractor, parse_csv_transactions
-from ml.predictor import get_predictor
-from ml.explainer import get_explainer
-from ml.counterfactual import get_counterfactual_generator
+from api import require_role, get_include_fields
+from ml.feature_extractor import parse_csv_transactions
+from ml.pipeline import FIELD_STAGES, get_scoring_pipeline, stages_for_fields
+from ml.what_if import get_what_if_engine
 from utils.audit_logger import get_audit_logger
-from utils.recommendations import get_recommendation_engine
+from utils.narrative import get_narrative_client
 
 citizen_bp = Blueprint('citizen', __name__)
 
@@ -30,6 +29,13 @@ def calculate_score():
             "csv_content": "date,amount,category,type,balance\\n2024-01-01,1000,salary,credit,5000\\n..."
         }
 
+        Optional "include" (list or comma-separated string, also accepted as
+        the include/fields query parameter) limits the response to the listed
+        field groups - score, explanations, improvements, recommendations -
+        and skips the stages the others need. "score" (score, category,
+        probability_of_default, trend, reward_eligible, model_version) is
+        always returned.
+
     Response:
         {
             "score": 680,
@@ -48,6 +54,11 @@ def calculate_score():
                 "next_steps": [...]
             }
         }
+
+        With a HuggingFace API key, recommendations also carry
+        narrative_source ("ai" or "template") and narrative_status; when the
+        AI narrative missed the latency budget it is "pending" with a
+        narrative_id for GET /narrative/<narrative_id>.
     """
     data = request.get_json()
 
@@ -65,50 +76,33 @@ def calculate_score():
     if not transactions:
         return jsonify({'error': 'Could not parse transaction data'}), 400
 
-    # Extract features
-    extractor = FeatureExtractor()
-    features = extractor.extract_features(transactions)
-
-    # Get prediction
-    predictor = get_predictor()
-    prediction = predictor.predict(features.copy())
-
-    score = prediction['score']
-    category = prediction['category']
-    prob_default = prediction['probability_of_default']
-    raw_features = prediction.get('raw_features', {})
-
-    # Generate explanations
-    explainer = get_explainer()
-    explanations = explainer.explain(
-        prediction['feature_vector'],
-        prediction['feature_values'],
-        raw_features
-    )
-
-    # Generate improvement suggestions
-    counterfactual = get_counterfactual_generator()
-    improvements = counterfactual.generate_improvements(
-        prediction['feature_values'],
-        raw_features,
-        score
-    )
-
-    # Generate recommendations
-    recommender = get_recommendation_engine()
-    recommendations = recommender.generate_citizen_recommendations(
-        score, category, explanations, improvements
-    )
-
-    # Log the request
-    logger = get_audit_logger()
-    logger.log_score_request(
-        user_email=request.user.get('email', 'unknown'),
-        user_role='citizen',
-        action='score_request',
-        score=score,
-        risk_category=category
-    )
+    try:
+        fields = get_include_fields(data)
+        stages = stages_for_fields('citizen', fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if fields is None:
+        fields = set(FIELD_STAGES['citizen'])
+
+    user_email = request.user.get('email', 'unknown')
+
+    def audit(result):
+        get_audit_logger().log_score_request(
+            user_email=user_email,
+            user_role='citizen',
+            action='score_request',
+            score=result.score,
+            risk_category=result.category,
+            model_version=result.model_version
+        )
+
+    # Extract -> predict -> explain -> counterfactual -> recommend -> audit,
+    # skipping the stages no requested field needs
+    result = get_scoring_pipeline().run([transactions], audience='citizen', stages=stages,
+                                        audit=audit).applicants[0]
+    features = result.features
+    score = result.score
+    category = result.category
 
     # Calculate trend if possible
     trend = 'stable'
@@ -121,14 +115,18 @@ def calculate_score():
     response = {
         'score': score,
         'category': category,
-        'probability_of_default': prob_default,
+        'probability_of_default': result.probability_of_default,
         'trend': trend,
         'reward_eligible': category in ['Excellent', 'Good'] and trend != 'declining',
-        'explanations': {
-            'positive': explanations.get('positive', []),
-            'negative': explanations.get('negative', [])
-        },
-        'improvements': [
+        'model_version': result.model_version
+    }
+    if 'explanations' in fields:
+        response['explanations'] = {
+            'positive': result.explanations.get('positive', []),
+            'negative': result.explanations.get('negative', [])
+        }
+    if 'improvements' in fields:
+        response['improvements'] = [
             {
                 'action': imp['action'],
                 'detail': imp['detail'],
@@ -136,14 +134,114 @@ def calculate_score():
                 'priority': imp['priority'],
                 'timeline': imp['timeline']
             }
-            for imp in improvements[:5]
-        ],
-        'recommendations': recommendations
-    }
+            for imp in result.improvements[:5]
+        ]
+    if 'recommendations' in fields:
+        response['recommendations'] = result.recommendations
+
+    return jsonify(response)
+
+
+@citizen_bp.route('/what-if', methods=['POST'])
+@require_role('citizen', 'admin')
+def what_if():
+    """
+    Rescore a profile with a few model features changed.
+
+    The first call sends the transactions (as for /score) and opens a
+    session holding the profile's tree paths; later calls send only the
+    session id and the changed features, so each slider move rescans only
+    the trees the change can affect. Changes replace the base values, they
+    do not stack across calls. Sessions expire WHAT_IF_SESSION_TTL_SECONDS
+    after they are opened or when the model changes. The session id is
+    signed and self-contained, so any worker can serve the follow-ups.
+
+    Request body:
+        {"transactions": [...]} or {"csv_content": "..."}, optionally with "changes"
+        OR
+        {"session_id": "...", "changes": {"PAY_0": 0, "BILL_AMT1": 12000}}
+
+    Response:
+        {
+            "session_id": "...",
+            "base": {"score": 612, "category": "Fair", "probability_of_default": 0.4327,
+                     "rules_fired": ["late_payment"], "model_version": "..."},
+            "features": {"PAY_0": 1.0, "BILL_AMT1": 15400.0, ...},
+            "result": {"score": 655, "category": "Fair", "score_change": 43,
+                       "trees_evaluated": 21, ...}
+        }
+
+        "features" (the base model features) is returned when the session
+        is opened, "result" whenever changes are sent.
+    """
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    changes = data.get('changes', {})
+    if not isinstance(changes, dict):
+        return jsonify({'error': 'changes must be an object of feature name -> value'}), 400
+
+    engine = get_what_if_engine()
+    user_email = request.user.get('email', 'unknown')
+    response = {}
+
+    if 'session_id' in data:
+        session_id = data['session_id']
+        session = engine.session(session_id, user_email)
+        if session is None:
+            return jsonify({'error': 'What-if session not found or expired; send the transactions again'}), 404
+    else:
+        if 'csv_content' in data:
+            transactions = parse_csv_transactions(data['csv_content'])
+        elif 'transactions' in data:
+            transactions = data['transactions']
+        else:
+            return jsonify({'error': 'Include "session_id", or a "transactions" array or "csv_content" string.'}), 400
+        if not transactions:
+            return jsonify({'error': 'Could not parse transaction data'}), 400
+
+        features = get_scoring_pipeline().extract([transactions])
+        session_id, session = engine.start(features.feature_matrix[0], features.raw_matrix[0], user_email)
+        response['features'] = dict(zip(engine.feature_names, session.feature_row.tolist()))
+
+        get_audit_logger().log_score_request(
+            user_email=user_email,
+            user_role='citizen',
+            action='what_if_session',
+            score=session.base['score'],
+            risk_category=session.base['category'],
+            model_version=session.base['model_version']
+        )
+
+    response['session_id'] = session_id
+    response['base'] = session.base
+    if changes:
+        try:
+            response['result'] = engine.evaluate(session, changes)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
     return jsonify(response)
 
 
+@citizen_bp.route('/narrative/<narrative_id>', methods=['GET'])
+@require_role('citizen', 'admin')
+def get_narrative(narrative_id):
+    """
+    Fetch an AI narrative that arrived after its score response.
+
+    Response:
+        {"narrative_id": "...", "status": "pending" | "ready" | "failed",
+         "narrative": "..."}  (narrative only when ready)
+    """
+    result = get_narrative_client().result(narrative_id)
+    if result is None:
+        return jsonify({'error': 'Narrative not found or expired'}), 404
+    return jsonify({'narrative_id': narrative_id, **result})
+
+
 @citizen_bp.route('/sample-analysis', methods=['GET'])
 @require_role('citizen', 'admin')
 def sample_analysis():
@@ -164,42 +262,19 @@ def sample_analysis():
         {'date': '2024-02-15', 'amount': 450, 'category': 'groceries', 'type': 'debit', 'balance': 6250},
     ]
 
-    # Process same as score endpoint
-    extractor = FeatureExtractor()
-    features = extractor.extract_features(sample_transactions)
-
-    predictor = get_predictor()
-    prediction = predictor.predict(features.copy())
-
-    explainer = get_explainer()
-    explanations = explainer.explain(
-        prediction['feature_vector'],
-        prediction['feature_values'],
-        prediction.get('raw_features', {})
-    )
-
-    counterfactual = get_counterfactual_generator()
-    improvements = counterfactual.generate_improvements(
-        prediction['feature_values'],
-        prediction.get('raw_features', {}),
-        prediction['score']
-    )
-
-    recommender = get_recommendation_engine()
-    recommendations = recommender.generate_citizen_recommendations(
-        prediction['score'],
-        prediction['category'],
-        explanations,
-        improvements
-    )
+    # Process same as score endpoint (nothing is audited for demo data)
+    result = get_scoring_pipeline().run(
+        [sample_transactions], audience='citizen',
+        stages=('explain', 'counterfactual', 'recommend')
+    ).applicants[0]
 
     # Calculate mock trend for sample data
     # In a real scenario, we would compare with previous month's score
     # Here we infer from recent behavior metrics
     trend = 'stable'
-    volatility = features.get('transaction_volatility', 0.5)
-    consistency = features.get('payment_consistency', 30)
-    utilization = features.get('_raw_features', {}).get('expense_ratio', 0.8)
+    volatility = result.features.get('transaction_volatility', 0.5)
+    consistency = result.features.get('payment_consistency', 30)
+    utilization = result.raw_features.get('expense_ratio', 0.8)
 
     if consistency < 10 and volatility < 0.8 and utilization < 0.9:
          trend = 'improving'
@@ -207,16 +282,17 @@ def sample_analysis():
          trend = 'declining'
 
     return jsonify({
-        'score': prediction['score'],
-        'category': prediction['category'],
-        'probability_of_default': prediction['probability_of_default'],
+        'score': result.score,
+        'category': result.category,
+        'probability_of_default': result.probability_of_default,
         'trend': trend,
-        'reward_eligible': prediction['category'] in ['Excellent', 'Good', 'Very Good'] and trend != 'declining',
+        'reward_eligible': result.category in ['Excellent', 'Good', 'Very Good'] and trend != 'declining',
         'explanations': {
-            'positive': explanations.get('positive', []),
-            'negative': explanations.get('negative', [])
+            'positive': result.explanations.get('positive', []),
+            'negative': result.explanations.get('negative', [])
         },
-        'improvements': improvements[:5],
-        'recommendations': recommendations,
+        'improvements': result.improvements[:5],
+        'recommendations': result.recommendations,
+        'model_version': result.model_version,
         'sample_data': True
     })
@@ -1,5 +1,5 @@
 """Flask application entry point for Credit Score API."""
-from flask import Flask, jsonify
+from flask import Flask, jsonify, g
 from flask_cors import CORS
 
 from config import Config
@@ -7,6 +7,8 @@ from api.auth import auth_bp
 from api.citizen import citizen_bp
 from api.bank import bank_bp
 from api.admin import admin_bp
+from ml.registry import pin_model_registry, unpin_model_registry
+from ml.model_reload import get_model_reloader
 
 
 def create_app(config_class=Config):
@@ -23,6 +25,19 @@ def create_app(config_class=Config):
     app.register_blueprint(bank_bp, url_prefix='/api/bank')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
+    # Score each request with one model version, even if a reload swaps
+    # the active registry while it is in flight
+    @app.before_request
+    def pin_model_version():
+        get_model_reloader().start_watcher()
+        g.model_registry_token = pin_model_registry()
+
+    @app.teardown_request
+    def unpin_model_version(exc):
+        token = g.pop('model_registry_token', None)
+        if token is not None:
+            unpin_model_registry(token)
+
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
     def health_check():
@@ -0,0 +1,73 @@
+"""
+Peak memory and time to first byte of audit exports.
+
+Compares the old in-memory export (get_logs + one json.dumps string) with
+the streaming export over the same store, for JSONL and SQLite storage.
+Memory is measured with tracemalloc while the whole response is consumed.
+
+Usage (from the backend directory):
+    python benchmarks/audit_export.py [--events 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(__file__))
+
+from audit_queries import events
+from utils.audit_storage import JsonlAuditStorage, SqliteAuditStorage
+from utils.audit_logger import AuditLogger
+from utils.audit_export import export_chunks, gzip_chunks
+
+
+def measure(make_chunks):
+    """Consume a chunk stream; return (first byte ms, total ms, peak MB, bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_ms, size = None, 0
+    for chunk in make_chunks():
+        if first_ms is None:
+            first_ms = (time.perf_counter() - start) * 1000
+        size += len(chunk)
+    total_ms = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return first_ms, total_ms, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        loggers = {
+            'jsonl': AuditLogger(storage=JsonlAuditStorage(os.path.join(tmp, 'audit'))),
+            'sqlite': AuditLogger(storage=SqliteAuditStorage(os.path.join(tmp, 'audit.db'))),
+        }
+        for logger in loggers.values():
+            logger.storage.append_many(list(events(args.events)))
+
+        print(f"{'export':>24} {'first byte (ms)':>16} {'total (ms)':>11} {'peak (MB)':>10} {'size (MB)':>10}")
+        for name, logger in loggers.items():
+            cases = {
+                f'{name} in-memory json': lambda: [json.dumps(logger.get_logs(limit=args.events),
+                                                              indent=2).encode()],
+                f'{name} stream ndjson': lambda: export_chunks(logger.iter_logs(), 'ndjson'),
+                f'{name} stream csv.gz': lambda: gzip_chunks(export_chunks(logger.iter_logs(), 'csv')),
+            }
+            for label, make_chunks in cases.items():
+                first_ms, total_ms, peak, size = measure(make_chunks)
+                print(f"{label:>24} {first_ms:>16.1f} {total_ms:>11.0f} {peak:>10.1f} {size / 1e6:>10.1f}")
+
+        for logger in loggers.values():
+            logger.storage.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare audit-log write cost of the legacy JSON file, JSONL segments, and
+JSONL segments behind the asynchronous group-commit writer.
+
+Appends events to a fresh store of each kind in a temporary directory and
+reports the per-write latency seen by the caller as the log grows. With
+--fsync every write (or group, for the async writer) is fsynced.
+
+Usage (from the backend directory):
+    python benchmarks/audit_log.py [--events 5000] [--fsync]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from utils.audit_storage import JsonAuditStorage, JsonlAuditStorage
+from utils.audit_writer import AsyncAuditWriter
+
+
+def event(i):
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'user': f'user{i % 50}@test.com',
+        'role': 'citizen',
+        'action': 'score_request',
+        'score': 300 + i % 550,
+        'risk_category': 'Good',
+        'applicant_id': None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--fsync', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            'json': JsonAuditStorage(os.path.join(tmp, 'audit_log.json')),
+            'jsonl': JsonlAuditStorage(os.path.join(tmp, 'audit'), fsync=args.fsync),
+            'async': AsyncAuditWriter(JsonlAuditStorage(os.path.join(tmp, 'audit-async'), fsync=args.fsync)),
+        }
+        checkpoints = sorted({100, 1000, args.events})
+
+        print(f"{'storage':>8} " + ' '.join(f"{'@' + str(c) + ' (us)':>12}" for c in checkpoints))
+        for name, store in stores.items():
+            timings = []
+            for i in range(args.events):
+                start = time.perf_counter()
+                store.append(event(i))
+                timings.append(time.perf_counter() - start)
+            # Median of the 100 writes ending at each checkpoint
+            cells = [np.median(timings[max(c - 100, 0):c]) * 1e6 for c in checkpoints]
+            start = time.perf_counter()
+            store.close()
+            drain_ms = (time.perf_counter() - start) * 1000
+            print(f"{name:>8} " + ' '.join(f"{cell:>12.1f}" for cell in cells)
+                  + f"   total {sum(timings) * 1000:.0f} ms, close {drain_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
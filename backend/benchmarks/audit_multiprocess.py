@@ -0,0 +1,63 @@
+"""
+Audit write throughput with several forked worker processes.
+
+Each worker appends events to one shared store (created before the fork,
+as serve.py does) until it has written its share; the aggregate rate is
+reported for 1, 2, 4 and 8 workers and checked for lost events.
+
+Usage (from the backend directory; POSIX only):
+    python benchmarks/audit_multiprocess.py [--events 20000] [--storage jsonl] [--fsync]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.audit_storage import JsonlAuditStorage, SqliteAuditStorage
+
+
+def worker(storage, index, count):
+    for i in range(count):
+        storage.append({'timestamp': '2024-01-01T00:00:00', 'user': f'w{index}@test.com',
+                        'role': 'bank', 'action': 'score_request', 'score': 700,
+                        'applicant_id': f'{index}-{i}'})
+    storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--storage', choices=['jsonl', 'sqlite'], default='jsonl')
+    parser.add_argument('--fsync', action='store_true')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('fork')
+    print(f"{args.storage}, {args.events} events, {os.cpu_count()} CPUs, fsync={args.fsync}")
+    print(f"{'workers':>8} {'events/s':>10} {'lost':>6}")
+    for workers in (1, 2, 4, 8):
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.storage == 'jsonl':
+                storage = JsonlAuditStorage(os.path.join(tmp, 'audit'), fsync=args.fsync)
+            else:
+                storage = SqliteAuditStorage(os.path.join(tmp, 'audit.db'), fsync=args.fsync)
+
+            share = args.events // workers
+            processes = [context.Process(target=worker, args=(storage, i, share)) for i in range(workers)]
+            start = time.perf_counter()
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            seconds = time.perf_counter() - start
+
+            written = sum(1 for _ in storage.entries())
+            print(f"{workers:>8} {share * workers / seconds:>10.0f} {share * workers - written:>6}")
+            storage.close()
+
+
+if __name__ == '__main__':
+    main()
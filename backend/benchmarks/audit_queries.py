@@ -0,0 +1,103 @@
+"""
+Compare filtered admin audit queries on JSONL segments and SQLite.
+
+Fills a fresh store of each kind with synthetic events, then times
+AuditLogger.get_logs() for the first page, a deep offset page, the same
+depth reached by keyset cursor (SQLite only), and a few filters, plus
+AuditLogger.get_stats() (the /api/admin/stats payload).
+
+Usage (from the backend directory):
+    python benchmarks/audit_queries.py [--events 200000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.audit_storage import JsonlAuditStorage, SqliteAuditStorage
+from utils.audit_logger import AuditLogger
+
+ROLES = ['citizen', 'bank', 'admin']
+CATEGORIES = ['Excellent', 'Very Good', 'Good', 'Fair', 'Poor']
+
+
+def events(count):
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        yield {
+            'timestamp': (start + timedelta(seconds=i)).isoformat(),
+            'user': f'user{i % 500}@test.com',
+            'role': ROLES[i % 3],
+            'action': 'risk_assessment' if i % 3 == 1 else 'score_request',
+            'score': 300 + i % 550,
+            'risk_category': CATEGORIES[i % 5],
+            'applicant_id': f'APP-{i % 20000}' if i % 3 == 1 else None,
+        }
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        loggers = {
+            'jsonl': AuditLogger(storage=JsonlAuditStorage(os.path.join(tmp, 'audit'))),
+            'sqlite': AuditLogger(storage=SqliteAuditStorage(os.path.join(tmp, 'audit.db'))),
+        }
+        for name, logger in loggers.items():
+            start = time.perf_counter()
+            batch = []
+            for entry in events(args.events):
+                batch.append(entry)
+                if len(batch) == 1000:
+                    logger.storage.append_many(batch)
+                    batch = []
+            if batch:
+                logger.storage.append_many(batch)
+            print(f"{name:>7}: loaded {args.events} events in {time.perf_counter() - start:.1f} s")
+
+        deep = args.events // 3 // 2
+        sqlite = loggers['sqlite']
+
+        def cursor_to_deep_page():
+            # Cursor of the page that ends just before `deep` rows
+            return sqlite.get_logs(limit=deep, role_filter='bank')['next_cursor']
+
+        cursor = cursor_to_deep_page()
+        cases = [
+            ('first page', {}),
+            ('role=bank', {'role_filter': 'bank'}),
+            ('applicant', {'applicant_filter': 'APP-1234'}),
+            ('user substring', {'user_filter': 'user42@'}),
+            (f'role=bank offset {deep}', {'role_filter': 'bank', 'offset': deep}),
+        ]
+
+        print(f"\n{'query':>24} {'jsonl (ms)':>12} {'sqlite (ms)':>12}")
+        for label, kwargs in cases:
+            cells = [timed(lambda: logger.get_logs(limit=100, **kwargs)) for logger in loggers.values()]
+            print(f"{label:>24} {cells[0]:>12.1f} {cells[1]:>12.1f}")
+        keyset_ms = timed(lambda: sqlite.get_logs(limit=100, role_filter='bank', cursor=cursor))
+        print(f"{f'role=bank cursor @{deep}':>24} {'-':>12} {keyset_ms:>12.1f}")
+        cells = [timed(logger.get_stats) for logger in loggers.values()]
+        print(f"{'get_stats':>24} {cells[0]:>12.1f} {cells[1]:>12.1f}")
+
+        for logger in loggers.values():
+            logger.storage.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Time the model-driven counterfactual search.
+
+For the sample applicants and synthetic profiles where every lever applies,
+prints the candidate grid size, the time of one generate_improvements call
+(one batched predict_many over the grid) and the time of scoring the same
+candidates one predict_many call at a time.
+
+Then times search_many on a synthetic portfolio under two memory caps,
+against calling search() once per applicant, with the peak memory traced.
+
+Usage (from the backend directory):
+    python benchmarks/counterfactual.py [--repeat 20] [--synthetic 3] [--portfolio 20000]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from ml.counterfactual import get_counterfactual_generator
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions, transactions_to_block
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'samples')
+
+
+def synthetic_profiles(n, seed=0, spread=False):
+    """
+    Struggling profiles (late, overspending, overdrawn) that activate every lever.
+
+    With spread, income, spending, payment gaps and overdrafts vary widely,
+    giving a queue from Poor to Excellent.
+    """
+    rng = np.random.default_rng(seed)
+    if spread:
+        col = {name: i for i, name in enumerate(FeatureExtractor.RAW_FEATURES)}
+        raw = np.zeros((n, len(FeatureExtractor.RAW_FEATURES)))
+        income = rng.uniform(500, 8000, n)
+        expenses = rng.uniform(-2000, 30000, n)
+        raw[:, col['transaction_volatility']] = rng.uniform(0.1, 3.0, n)
+        raw[:, col['expense_ratio']] = expenses / (income + 1)
+        raw[:, col['payment_consistency']] = rng.uniform(10, 120, n)
+        raw[:, col['overdraft_frequency']] = rng.uniform(0, 0.5, n)
+        raw[:, col['avg_balance']] = rng.uniform(100, 20000, n)
+        features = FeatureExtractor().map_to_model_features_many(raw, income, expenses)
+        return list(zip(features, raw))
+
+    col = {name: i for i, name in enumerate(FeatureExtractor.RAW_FEATURES)}
+    raw = np.zeros((n, len(FeatureExtractor.RAW_FEATURES)))
+    income = rng.uniform(1500, 3000, n)
+    expenses = rng.uniform(25000, 40000, n)
+    raw[:, col['transaction_volatility']] = rng.uniform(0.6, 1.5, n)
+    raw[:, col['expense_ratio']] = expenses / (income + 1)
+    raw[:, col['payment_consistency']] = rng.uniform(66, 120, n)
+    raw[:, col['overdraft_frequency']] = rng.uniform(0.12, 0.19, n)
+    features = FeatureExtractor().map_to_model_features_many(raw, income, expenses)
+    return list(zip(features, raw))
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--synthetic', type=int, default=3)
+    parser.add_argument('--portfolio', type=int, default=20000)
+    args = parser.parse_args()
+
+    generator = get_counterfactual_generator()
+    predictor = generator.predictor
+
+    applicants, names = [], []
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+        with open(path, 'r') as f:
+            applicants.append(parse_csv_transactions(f.read()))
+        names.append(os.path.splitext(os.path.basename(path))[0])
+    feature_matrix, raw_matrix = FeatureExtractor().extract_features_many(*transactions_to_block(applicants))
+    profiles = list(zip(names, feature_matrix, raw_matrix))
+    profiles += [(f'synthetic {i}', f, r) for i, (f, r) in enumerate(synthetic_profiles(args.synthetic))]
+
+    print(f"{'profile':>12} {'candidates':>10} {'batched (ms)':>13} {'one by one (ms)':>16} {'plan':>30}")
+    for name, feature_row, raw_row in profiles:
+        score = int(predictor.predict_many(feature_row[None, :], raw_row[None, :])['score'][0])
+        values = dict(zip(predictor.feature_names, feature_row))
+        raw_values = dict(zip(FeatureExtractor.RAW_FEATURES, raw_row))
+        search = generator.search(feature_row, raw_row, score)
+        if search is None:
+            print(f'{name:>12} {0:>10}')
+            continue
+
+        batched = best_ms(lambda: generator.generate_improvements(values, raw_values, score), args.repeat)
+        candidates = list(zip(search['feature_matrix'], search['raw_matrix']))
+        one_by_one = best_ms(lambda: [predictor.predict_many(f[None, :], r[None, :]) for f, r in candidates],
+                             max(args.repeat // 5, 1))
+        plan = search['plan']
+        summary = f"{score} -> {plan['score']} {plan['category']}" if plan else '-'
+        print(f'{name:>12} {len(search["grid"]):>10} {batched:>13.2f} {one_by_one:>16.2f} {summary:>30}')
+
+    if args.portfolio <= 0:
+        return
+    portfolio = synthetic_profiles(args.portfolio, seed=1, spread=True)
+    feature_matrix = np.array([f for f, _ in portfolio])
+    raw_matrix = np.array([r for _, r in portfolio])
+    scores = predictor.predict_many(feature_matrix, raw_matrix)['score']
+
+    sample = min(len(portfolio), 500)
+    start = time.perf_counter()
+    for i in range(sample):
+        generator.search(feature_matrix[i], raw_matrix[i], int(scores[i]))
+    per_applicant_s = (time.perf_counter() - start) / sample
+
+    print(f'\nportfolio of {len(portfolio)} applicants, target APPROVE (670)')
+    print(f"{'method':>22} {'seconds':>9} {'applicants/s':>13} {'peak MB':>8} {'reachable':>10}")
+    print(f"{'search() per row':>22} {per_applicant_s * len(portfolio):>9.1f} {1 / per_applicant_s:>13.0f}"
+          f" {'-':>8} {'-':>10}   (extrapolated from {sample})")
+    for cap_mb in (32, 256):
+        tracemalloc.start()
+        start = time.perf_counter()
+        plans = generator.search_many(feature_matrix, raw_matrix, scores, target_scores=670,
+                                      max_bytes=cap_mb * 1024 * 1024)
+        seconds = time.perf_counter() - start
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+        reachable = int((plans['reaches_target'] & (scores < 670)).sum())
+        label = f'search_many {cap_mb} MB'
+        print(f'{label:>22} {seconds:>9.1f} {len(portfolio) / seconds:>13.0f} {peak_mb:>8.0f} {reachable:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare per-row shap.TreeExplainer explanations with batched native contributions.
+
+For 1 to 1000 applicants, times the old per-applicant path (one
+TreeExplainer.shap_values call and one Python sort per row) against
+CreditScoreExplainer.explain_many (one pred_contribs call and vectorized
+top-k selection), and the import cost of shap that the native backend
+no longer pays at worker startup.
+
+Usage (from the backend directory):
+    python benchmarks/explainer.py [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from ml.explainer import ShapContributions, get_explainer
+
+ROWS = [1, 16, 64, 256, 1000]
+
+
+def per_row_shap(explainer, shap_backend, scaled, values):
+    """The previous path: one TreeExplainer call and list sort per applicant."""
+    for row in range(len(scaled)):
+        contributions = shap_backend.contributions(scaled[row:row + 1])[0]
+        importance = list(zip(explainer.feature_names, contributions))
+        importance.sort(key=lambda x: abs(x[1]), reverse=True)
+        for feature, value in importance[:explainer.TOP_FACTORS]:
+            if value < 0:
+                explainer._format_positive_factor(feature, values[row].get(feature, 0), abs(value))
+            else:
+                explainer._format_negative_factor(feature, values[row].get(feature, 0), abs(value))
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    explainer = get_explainer()
+    if explainer.backend is None:
+        print('Model artifacts not available; run ml/train_model.py first.')
+        return
+
+    start = time.perf_counter()
+    try:
+        shap_backend = ShapContributions(explainer.model)
+    except ImportError:
+        shap_backend = None
+    shap_setup_ms = (time.perf_counter() - start) * 1000
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>6} {'shap per row (ms)':>18} {'native batch (ms)':>18} {'speedup':>8}")
+    for n in ROWS:
+        scaled = rng.normal(size=(n, len(explainer.feature_names)))
+        values = [{} for _ in range(n)]
+        raw = [None] * n
+        native = best_ms(lambda: explainer.explain_many(scaled, values, raw, scaled=scaled), args.repeat)
+        if shap_backend is None:
+            print(f'{n:>6} {"-":>18} {native:>18.2f}')
+            continue
+        legacy = best_ms(lambda: per_row_shap(explainer, shap_backend, scaled, values), args.repeat)
+        print(f'{n:>6} {legacy:>18.2f} {native:>18.2f} {legacy / native:>7.1f}x')
+
+    if shap_backend is not None:
+        code = 'import time; t = time.perf_counter(); import shap; print(time.perf_counter() - t)'
+        seconds = float(subprocess.run([sys.executable, '-c', code], capture_output=True,
+                                       text=True, check=True).stdout.strip().splitlines()[-1])
+        print(f'\nshap import in a fresh interpreter: {seconds * 1000:.0f} ms '
+              f'(TreeExplainer setup here: {shap_setup_ms:.0f} ms); the native backend imports neither')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark the pandas and NumPy feature extraction engines.
+
+Runs both engines over every profile in data/samples/*.csv, checks that
+they produce identical features and reports the median per-request latency.
+
+Usage (from the backend directory):
+    python benchmarks/feature_extraction.py [--repeats 2000]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'samples')
+
+
+def load_profiles():
+    """Load every sample CSV as a list of transactions, keyed by profile name."""
+    profiles = {}
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+        with open(path, 'r') as f:
+            profiles[os.path.splitext(os.path.basename(path))[0]] = parse_csv_transactions(f.read())
+    return profiles
+
+
+def time_engine(extractor, transactions, repeats):
+    """Return the median latency of extract_features in microseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        extractor.extract_features(transactions)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=2000)
+    args = parser.parse_args()
+
+    pandas_engine = FeatureExtractor(engine='pandas')
+    numpy_engine = FeatureExtractor(engine='numpy')
+
+    print(f"{'profile':<12} {'rows':>5} {'pandas (us)':>12} {'numpy (us)':>11} {'speedup':>8}")
+    for name, transactions in load_profiles().items():
+        expected = pandas_engine.extract_features(transactions)
+        actual = numpy_engine.extract_features(transactions)
+        if actual != expected:
+            raise SystemExit(f"Engines disagree on profile '{name}'")
+
+        pandas_us = time_engine(pandas_engine, transactions, args.repeats)
+        numpy_us = time_engine(numpy_engine, transactions, args.repeats)
+        print(f"{name:<12} {len(transactions):>5} {pandas_us:>12.1f} {numpy_us:>11.1f} "
+              f"{pandas_us / numpy_us:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
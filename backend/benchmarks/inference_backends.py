@@ -0,0 +1,68 @@
+"""
+Compare XGBoost, ONNX Runtime and compiled-tree inference latency.
+
+Runs the same unscaled feature rows through both backends, reporting the
+median single-row latency, batch throughput, and the largest probability
+difference from XGBoost.
+
+Usage (from the backend directory, after `python ml/export_onnx.py` and
+`python ml/compile_trees.py`):
+    python benchmarks/inference_backends.py
+"""
+import os
+import pickle
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from config import Config
+from ml.predictor import XGBoostBackend, OnnxBackend
+from ml.tree_ensemble import CompiledTreeEnsemble
+
+BATCH_SIZES = [1, 100, 10_000]
+
+
+def median_seconds(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    with open(Config.MODEL_PATH, 'rb') as f:
+        model = pickle.load(f)
+    with open(Config.SCALER_PATH, 'rb') as f:
+        scaler = pickle.load(f)
+
+    backends = [
+        XGBoostBackend(model, scaler),
+        OnnxBackend(Config.ONNX_MODEL_PATH, Config.SCALER_PARAMS_PATH, Config.ONNX_INTRA_OP_THREADS),
+        CompiledTreeEnsemble.load(Config.TREES_MODEL_PATH),
+    ]
+
+    rng = np.random.default_rng(0)
+    rows = scaler.mean_ + rng.normal(size=(max(BATCH_SIZES), len(scaler.mean_))) * scaler.scale_
+
+    print(f"{'rows':>7} " + ' '.join(f"{b.name + ' (ms)':>14}" for b in backends))
+    for n in BATCH_SIZES:
+        batch = rows[:n]
+        repeats = 200 if n == 1 else 20
+        timings = [median_seconds(lambda: b.predict_proba(batch), repeats) for b in backends]
+        print(f"{n:>7} " + ' '.join(f"{t * 1e3:>14.3f}" for t in timings))
+
+    print()
+    expected = backends[0].predict_proba(rows)
+    for backend in backends[1:]:
+        max_diff = np.abs(backend.predict_proba(rows) - expected).max()
+        print(f"Max |p_{backend.name} - p_xgboost| over {len(rows)} rows: {max_diff:.2e}")
+
+
+if __name__ == '__main__':
+    main()
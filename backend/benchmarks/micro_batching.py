@@ -0,0 +1,73 @@
+"""
+Compare per-request model calls with the micro-batching dispatcher.
+
+Runs CreditScorePredictor.predict from 1 to 32 concurrent threads, first
+calling the backend once per request, then through MicroBatchDispatcher,
+and reports throughput and p50/p99 latency.
+
+Usage (from the backend directory):
+    python benchmarks/micro_batching.py [--requests 400]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from config import Config
+from ml.dispatcher import get_dispatcher
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions
+from ml.predictor import get_predictor
+
+THREADS = [1, 4, 8, 16, 32]
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'samples')
+
+
+def run(predictor, features, threads, n_requests):
+    """Return (requests/s, latencies in ms) for n_requests on `threads` threads."""
+    def one(i):
+        start = time.perf_counter()
+        predictor.predict(dict(features[i % len(features)]))
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(one, range(n_requests)))
+        elapsed = time.perf_counter() - start
+    return n_requests / elapsed, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=400)
+    args = parser.parse_args()
+
+    extractor = FeatureExtractor()
+    features = []
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+        with open(path, 'r') as f:
+            features.append(extractor.extract_features(parse_csv_transactions(f.read())))
+
+    predictor = get_predictor()
+    print(f"{'threads':>7} {'mode':>10} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for threads in THREADS:
+        for dispatch in (False, True):
+            Config.BATCH_DISPATCH = dispatch
+            run(predictor, features, threads, 50)  # warm-up
+            throughput, latencies = run(predictor, features, threads, args.requests)
+            mode = 'batched' if dispatch else 'direct'
+            print(f"{threads:>7} {mode:>10} {throughput:>8.0f} "
+                  f"{np.percentile(latencies, 50):>9.2f} {np.percentile(latencies, 99):>9.2f}")
+
+    metrics = get_dispatcher().metrics()
+    print(f"\nDispatcher: {metrics['batches']} batches, avg size {metrics['avg_batch_size']}, "
+          f"wait p99 {metrics['wait_ms']['p99']} ms")
+
+
+if __name__ == '__main__':
+    main()
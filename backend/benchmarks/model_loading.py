@@ -0,0 +1,76 @@
+"""
+Measure cold-start time and RSS of the model singletons.
+
+Each mode runs in a fresh interpreter with all modules already imported:
+  - per_singleton: model.pkl and scaler.pkl unpickled once per consumer
+    (predictor and explainer) as before the shared registry, plus the
+    anomaly detector for a stand-alone anomaly scorer
+  - registry: predictor, explainer, counterfactual generator and anomaly
+    scorer built from one ModelRegistry
+
+Usage (from the backend directory):
+    python benchmarks/model_loading.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PRELUDE = '''
+import json, pickle, time, warnings
+warnings.filterwarnings('ignore')
+from config import Config
+from ml.registry import _rss_bytes
+from ml.predictor import get_predictor
+from ml.explainer import get_explainer
+from ml.counterfactual import get_counterfactual_generator
+from ml.anomaly import get_anomaly_scorer
+import xgboost
+rss_before = _rss_bytes()
+start = time.perf_counter()
+'''
+
+MODES = {
+    'per_singleton': '''
+copies = []
+for _ in range(2):
+    with open(Config.MODEL_PATH, 'rb') as f:
+        model = pickle.load(f)
+    with open(Config.SCALER_PATH, 'rb') as f:
+        scaler = pickle.load(f)
+    copies.append((model, scaler))
+with open(Config.ANOMALY_DETECTOR_PATH, 'rb') as f:
+    detector = pickle.load(f)
+''',
+    'registry': '''
+get_predictor(); get_explainer(); get_counterfactual_generator(); get_anomaly_scorer()
+''',
+}
+
+EPILOGUE = '''
+from ml.registry import get_model_registry
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'rss_mb': (_rss_bytes() - rss_before) / 2**20,
+                  'artifacts': get_model_registry().stats()}))
+'''
+
+
+def main():
+    print(f"{'mode':>14} {'load (ms)':>10} {'RSS delta (MB)':>15}")
+    for mode, body in MODES.items():
+        output = subprocess.run([sys.executable, '-c', PRELUDE + body + EPILOGUE],
+                                cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>14} {result['seconds'] * 1e3:>10.1f} {result['rss_mb']:>15.1f}")
+        if mode == 'registry':
+            artifacts = result['artifacts']
+
+    print("\nRegistry per-artifact load:")
+    for name, stats in artifacts.items():
+        print(f"  {name:>16}: {stats.get('load_ms', 0):>7.1f} ms {stats.get('rss_delta_mb', 0):>7.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
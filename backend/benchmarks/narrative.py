@@ -0,0 +1,155 @@
+"""
+Time citizen narrative generation against a slow or failing model service.
+
+Starts a local stub of the HuggingFace Inference API that answers after
+--delay-ms (or fails), then times generate_citizen_recommendations with the
+old blocking path (one requests.post per call, new connection each time)
+and with the NarrativeClient (pooled session, latency budget, circuit
+breaker) for a healthy, a slow and a failing service, with the narrative
+cache off.
+
+Then times a queue of citizens spread over --signatures distinct
+assessment signatures with the narrative cache on.
+
+Usage (from the backend directory):
+    python benchmarks/narrative.py [--calls 20] [--delay-ms 80] [--slow-ms 1500] [--signatures 5]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import requests
+
+from config import Config
+from utils import narrative
+from utils.narrative import NarrativeCache, NarrativeClient
+from utils.recommendations import RecommendationEngine
+
+EXPLANATIONS = {'positive': ['Consistent income'], 'negative': ['High spending volatility']}
+IMPROVEMENTS = [{'action': 'Reduce spending volatility', 'timeline': '3 months'}]
+
+
+def start_stub(state):
+    """Serve generated text after state['delay'] seconds, or state['status'] errors."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            prompt = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['inputs']
+            time.sleep(state['delay'])
+            body = json.dumps([{'generated_text': prompt + ' Keep it up.'}]).encode()
+            self.send_response(state['status'])
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/models/stub'
+
+
+def blocking_narrative(url, prompt, timeout):
+    """The previous implementation: a fresh requests.post per call."""
+    try:
+        response = requests.post(url, headers={'Authorization': 'Bearer test'},
+                                 json={'inputs': prompt, 'parameters': {'max_new_tokens': 150}},
+                                 timeout=timeout)
+        if response.status_code == 200:
+            return response.json()[0]['generated_text']
+    except requests.RequestException:
+        pass
+    return None
+
+
+def time_calls(fn, calls):
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return np.percentile(times, 50), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--delay-ms', type=float, default=80)
+    parser.add_argument('--slow-ms', type=float, default=1500)
+    parser.add_argument('--signatures', type=int, default=5)
+    args = parser.parse_args()
+
+    state = {'delay': 0.0, 'status': 200}
+    server, url = start_stub(state)
+    engine = RecommendationEngine()
+    prompt = 'Explain a score of 680 (Good).'
+
+    print(f'budget {Config.NARRATIVE_BUDGET_MS:.0f} ms, {args.calls} calls per row')
+    print(f"{'service':>22} {'path':>9} {'p50 ms':>8} {'max ms':>8}   outcome")
+    scenarios = [('healthy', args.delay_ms / 1000, 200), ('slow', args.slow_ms / 1000, 200),
+                 ('failing (503)', args.delay_ms / 1000, 503)]
+    narrative._cache = NarrativeCache(max_entries=0, path='')
+    with mock.patch.object(Config, 'HUGGINGFACE_API_KEY', 'test'):
+        for name, delay, status in scenarios:
+            state.update(delay=delay, status=status)
+            calls = max(args.calls // 5, 1) if name == 'slow' else args.calls
+
+            p50, worst = time_calls(lambda: blocking_narrative(url, prompt, Config.NARRATIVE_TIMEOUT_SECONDS), calls)
+            print(f'{name:>22} {"blocking":>9} {p50:>8.1f} {worst:>8.1f}')
+
+            narrative._client = NarrativeClient(url=url, api_key='test')
+            outcomes = []
+
+            def pooled():
+                result = engine.generate_citizen_recommendations(680, 'Good', EXPLANATIONS, IMPROVEMENTS)
+                outcomes.append(result.get('narrative_status'))
+
+            p50, worst = time_calls(pooled, calls)
+            counts = {outcome: outcomes.count(outcome) for outcome in sorted(set(outcomes))}
+            print(f'{name:>22} {"pooled":>9} {p50:>8.1f} {worst:>8.1f}   {counts}')
+            narrative._client.close()
+
+        # Citizens sharing assessment signatures, narrative cache on
+        state.update(delay=args.delay_ms / 1000, status=200)
+        narrative._client = NarrativeClient(url=url, api_key='test')
+        narrative._cache = NarrativeCache(path='')
+        categories = list(Config.RISK_CATEGORIES)
+        queue = [(categories[i % args.signatures % len(categories)], 700 + i % 7)
+                 for i in range(args.calls * 5)]
+        outcomes = []
+
+        def cached(item):
+            category, score = item
+            improvements = [{'action': f'Action {categories.index(category)}'}]
+            result = engine.generate_citizen_recommendations(score, category, EXPLANATIONS, improvements)
+            outcomes.append('cached' if result.get('narrative_cached') else result.get('narrative_status'))
+
+        times = []
+        for item in queue:
+            start = time.perf_counter()
+            cached(item)
+            times.append((time.perf_counter() - start) * 1000)
+        counts = {outcome: outcomes.count(outcome) for outcome in sorted(set(outcomes))}
+        label = f'{min(args.signatures, len(categories))} signatures'
+        print(f'{label:>22} {"cached":>9} {np.percentile(times, 50):>8.1f} {max(times):>8.1f}   {counts}')
+        print(f"narrative cache hit rate {narrative._cache.metrics()['hit_rate']:.0%}")
+        narrative._client.close()
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Time business-rule evaluation separately from model inference.
+
+Scores random feature rows with CreditScorePredictor, then times the
+ScoreCapRules pass on its own for batches from 1 to 1,000,000 rows.
+
+Usage (from the backend directory):
+    python benchmarks/score_rules.py
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from ml.feature_extractor import FeatureExtractor
+from ml.predictor import get_predictor
+
+BATCH_SIZES = [1, 100, 10_000, 1_000_000]
+
+
+def random_rows(n, rng):
+    """Generate plausible model and raw feature matrices."""
+    features = np.column_stack([
+        rng.uniform(30000, 300000, n),        # LIMIT_BAL
+        np.full(n, 35.0),                     # AGE
+        *[rng.integers(-1, 4, n).astype(float)] * 3,  # PAY_0, PAY_2, PAY_3
+        *[rng.uniform(0, 40000, n)] * 3,      # BILL_AMT1-3
+        *[rng.uniform(0, 40000, n)] * 3,      # PAY_AMT1-3
+    ])
+    raw = rng.uniform(0, 1.2, (n, len(FeatureExtractor.RAW_FEATURES)))
+    return features, raw
+
+
+def median_seconds(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    predictor = get_predictor()
+    rng = np.random.default_rng(0)
+
+    print(f"{'rows':>9} {'inference (ms)':>15} {'rules (ms)':>11} {'rules share':>12}")
+    for n in BATCH_SIZES:
+        features, raw = random_rows(n, rng)
+        scores = np.full(n, 800)
+        repeats = 5 if n >= 1_000_000 else 50
+
+        total = median_seconds(lambda: predictor.predict_many(features, raw), repeats)
+        rules = median_seconds(lambda: predictor.rules.apply(scores, features, raw), repeats)
+        print(f"{n:>9} {(total - rules) * 1e3:>15.3f} {rules * 1e3:>11.3f} {rules / total:>11.1%}")
+
+
+if __name__ == '__main__':
+    main()
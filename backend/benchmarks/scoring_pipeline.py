@@ -0,0 +1,105 @@
+"""
+Stage-by-stage timing of the shared scoring pipeline.
+
+Scores the sample applicants through ScoringPipeline the way each endpoint
+does (single citizen request, single bank request, bank batch, and the
+include=score requests of pre-screening clients) and prints the mean time
+per stage, with the result cache off (every request scored) and on (every
+request a repeat of an earlier one), next to the old endpoint sequence of
+extract_features -> predict -> explain -> counterfactual -> recommend,
+which copied feature dicts and re-scaled the vector in the explainer.
+
+Usage (from the backend directory):
+    python benchmarks/scoring_pipeline.py [--repeat 200] [--batch 64]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml.counterfactual import get_counterfactual_generator
+from ml.explainer import get_explainer
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions
+from ml.pipeline import STAGES, ScoringPipeline, stages_for_fields
+from ml.predictor import get_predictor
+from utils.recommendations import get_recommendation_engine
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'samples')
+
+
+def legacy_citizen(transactions):
+    """The per-endpoint sequence the pipeline replaced."""
+    features = FeatureExtractor().extract_features(transactions)
+    prediction = get_predictor().predict(features.copy())
+    explanations = get_explainer().explain(prediction['feature_vector'], prediction['feature_values'],
+                                           prediction.get('raw_features', {}))
+    improvements = get_counterfactual_generator().generate_improvements(
+        prediction['feature_values'], prediction.get('raw_features', {}), prediction['score'])
+    get_recommendation_engine().generate_citizen_recommendations(
+        prediction['score'], prediction['category'], explanations, improvements)
+
+
+def time_pipeline(pipeline, batches, audience, stages=None):
+    """Return (mean ms per run, mean ms per stage)."""
+    totals = {}
+    start = time.perf_counter()
+    for batch in batches:
+        result = pipeline.run(batch, audience=audience, stages=stages, audit=lambda result: None)
+        for stage, ms in result.timings_ms.items():
+            totals[stage] = totals.get(stage, 0.0) + ms
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return elapsed_ms / len(batches), {stage: ms / len(batches) for stage, ms in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=64)
+    args = parser.parse_args()
+
+    applicants = []
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+        with open(path, 'r') as f:
+            applicants.append(parse_csv_transactions(f.read()))
+
+    with mock.patch('ml.pipeline.Config.RESULT_CACHE_SIZE', 0):
+        uncached = ScoringPipeline()
+    cached = ScoringPipeline()
+    singles = [[applicants[i % len(applicants)]] for i in range(args.repeat)]
+    batch = [applicants[i % len(applicants)] for i in range(args.batch)]
+
+    # Warm up the model, and fill the cache for every run below
+    for pipeline in (uncached, cached):
+        for audience in ('citizen', 'bank'):
+            for stages in (None, stages_for_fields(audience, ['score'])):
+                pipeline.run(applicants, audience=audience, stages=stages)
+    legacy_citizen(applicants[0])
+
+    start = time.perf_counter()
+    for (transactions,) in singles:
+        legacy_citizen(transactions)
+    legacy_ms = (time.perf_counter() - start) * 1000 / len(singles)
+
+    runs = [
+        ('citizen x1', singles, 'citizen', None),
+        ('bank x1', singles, 'bank', None),
+        (f'bank x{args.batch}', [batch] * max(args.repeat // args.batch, 3), 'bank', None),
+        ('citizen score', singles, 'citizen', stages_for_fields('citizen', ['score'])),
+        ('bank score', singles, 'bank', stages_for_fields('bank', ['score'])),
+    ]
+    for label, pipeline in (('result cache off', uncached), ('result cache on, all repeats', cached)):
+        print(f'\n{label}')
+        print(f"{'run':>13} {'total':>8} " + ' '.join(f'{stage:>14}' for stage in STAGES) + '   (ms)')
+        for name, batches, audience, run_stages in runs:
+            total, stages = time_pipeline(pipeline, batches, audience, run_stages)
+            cells = ' '.join(f"{stages[stage]:>14.3f}" if stage in stages else f"{'-':>14}" for stage in STAGES)
+            print(f'{name:>13} {total:>8.3f} {cells}')
+    print(f"\n{'legacy x1':>13} {legacy_ms:>8.3f}   (old citizen endpoint sequence, no audit)")
+
+
+if __name__ == '__main__':
+    main()
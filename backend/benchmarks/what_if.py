@@ -0,0 +1,94 @@
+"""
+Time one what-if rescoring (a slider move) per approach.
+
+For the sample applicants, changes one model feature at a time and times:
+the whole request path again (extract + predict_many), predict_many on the
+changed row, a full walk of the compiled trees, and a what-if session that
+walks only the trees whose cached path tests the changed feature. Also
+prints how many of the trees each feature's change walks on average.
+
+Usage (from the backend directory):
+    python benchmarks/what_if.py [--repeat 200]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from ml.feature_extractor import parse_csv_transactions
+from ml.pipeline import get_scoring_pipeline
+from ml.what_if import get_what_if_engine
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'samples')
+
+FEATURES = ('PAY_0', 'BILL_AMT1', 'PAY_AMT1', 'LIMIT_BAL')
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    pipeline = get_scoring_pipeline()
+    engine = get_what_if_engine()
+    if engine.ensemble is None:
+        raise SystemExit('No trained model; run ml/train_model.py first')
+    ensemble, predictor = engine.ensemble, engine.predictor
+
+    applicants = []
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+        with open(path, 'r') as f:
+            applicants.append(parse_csv_transactions(f.read()))
+
+    timings = {name: [] for name in ('request', 'predict_many', 'full walk', 'what-if')}
+    walked = {name: [] for name in FEATURES}
+    for transactions in applicants:
+        features = pipeline.extract([transactions])
+        feature_row, raw_row = features.feature_matrix[0], features.raw_matrix[0]
+        _, session = engine.start(feature_row, raw_row, 'benchmark')
+
+        for name in FEATURES:
+            column = engine.feature_names.index(name)
+            value = feature_row[column] + 1 if name == 'PAY_0' else feature_row[column] * 0.5
+            changed = feature_row.copy()
+            changed[column] = value
+
+            def full_walk():
+                default_prob = ensemble.predict_proba(changed[None, :])
+                return predictor.score_probabilities(default_prob, changed[None, :], raw_row[None, :])
+
+            timings['request'].append(best_ms(
+                lambda: predictor.predict_many(pipeline.extract([transactions]).feature_matrix, raw_row[None, :]),
+                args.repeat))
+            timings['predict_many'].append(best_ms(
+                lambda: predictor.predict_many(changed[None, :], raw_row[None, :]), args.repeat))
+            timings['full walk'].append(best_ms(full_walk, args.repeat))
+            timings['what-if'].append(best_ms(lambda: engine.evaluate(session, {name: value}), args.repeat))
+            walked[name].append(engine.evaluate(session, {name: value})['trees_evaluated'])
+
+    print(f'{len(applicants)} applicants x {len(FEATURES)} features, best of {args.repeat}, '
+          f'{type(predictor.backend).__name__} backend, {len(ensemble.roots)} trees')
+    print(f"{'method':>14} {'mean ms':>9} {'max ms':>8}")
+    for name, values in timings.items():
+        print(f'{name:>14} {np.mean(values):>9.3f} {np.max(values):>8.3f}')
+    print(f"\n{'feature':>10} {'trees walked':>13}")
+    for name, counts in walked.items():
+        print(f'{name:>10} {np.mean(counts):>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -23,13 +23,98 @@ class Config:
     # ML Model paths
     MODEL_PATH = os.path.join(os.path.dirname(__file__), 'data', 'model.pkl')
     SCALER_PATH = os.path.join(os.path.dirname(__file__), 'data', 'scaler.pkl')
+    FEATURE_NAMES_PATH = os.path.join(os.path.dirname(__file__), 'data', 'feature_names.pkl')
+    ANOMALY_DETECTOR_PATH = os.path.join(os.path.dirname(__file__), 'data', 'anomaly_detector.pkl')
+
+    # Versioned model artifacts: <dir>/<version>/model.pkl, ... plus <dir>/manifest.json.
+    # Without a manifest the flat files above are used.
+    MODEL_ARTIFACTS_DIR = os.getenv('MODEL_ARTIFACTS_DIR', os.path.join(os.path.dirname(__file__), 'data', 'models'))
+    # Seconds between manifest checks for a new active version (0 disables the watcher)
+    MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '5'))
+    # Reload smoke test: maximum median single-applicant scoring latency
+    RELOAD_MAX_LATENCY_MS = float(os.getenv('RELOAD_MAX_LATENCY_MS', '250'))
+
+    # Inference backend: 'xgboost' (pickled XGBClassifier), 'onnx' (ONNX Runtime)
+    # or 'trees' (NumPy evaluator over the compiled booster)
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'xgboost').lower()
+    ONNX_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'data', 'model.onnx')
+    SCALER_PARAMS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'scaler_params.json')
+    ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', '1'))
+    TREES_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'data', 'model_trees.npz')
+
+    # Explanation backend: 'native' (XGBoost pred_contribs, exact tree SHAP),
+    # 'shap' (shap.TreeExplainer, imported only when selected) or 'heuristic'
+    EXPLAINER_BACKEND = os.getenv('EXPLAINER_BACKEND', 'native').lower()
+
+    # Scoring result cache (prediction, anomaly, explanation, counterfactuals),
+    # keyed by feature rows + model version; 0 entries disables it
+    RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '10000'))
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv('RESULT_CACHE_TTL_SECONDS', '900'))
+
+    # Citizen what-if sessions (cached tree paths of the base profile); 0 disables them
+    WHAT_IF_SESSIONS = int(os.getenv('WHAT_IF_SESSIONS', '1000'))
+    WHAT_IF_SESSION_TTL_SECONDS = float(os.getenv('WHAT_IF_SESSION_TTL_SECONDS', '900'))
+
+    # Memory cap for one chunk of portfolio counterfactual candidates
+    COUNTERFACTUAL_MAX_MB = int(os.getenv('COUNTERFACTUAL_MAX_MB', '256'))
+
+    # Micro-batching of concurrent single-score requests (ml/dispatcher.py)
+    BATCH_DISPATCH = os.getenv('BATCH_DISPATCH', 'False').lower() == 'true'
+    BATCH_WINDOW_MS = float(os.getenv('BATCH_WINDOW_MS', '2'))
+    BATCH_MAX_ROWS = int(os.getenv('BATCH_MAX_ROWS', '64'))
+
+    # Preload-and-fork server (serve.py)
+    SERVE_HOST = os.getenv('SERVE_HOST', '0.0.0.0')
+    SERVE_PORT = int(os.getenv('SERVE_PORT', '5000'))
+    SERVE_WORKERS = int(os.getenv('SERVE_WORKERS', str(os.cpu_count() or 2)))
+    SERVE_THREADED = os.getenv('SERVE_THREADED', 'False').lower() == 'true'
+    SERVE_BACKLOG = int(os.getenv('SERVE_BACKLOG', '128'))
 
     # Audit log path
     AUDIT_LOG_PATH = os.path.join(os.path.dirname(__file__), 'data', 'audit_log.json')
 
+    # Audit storage: 'jsonl' (append-only segments in AUDIT_LOG_DIR), 'sqlite' (indexed
+    # database at AUDIT_DB_PATH) or 'json' (legacy single file)
+    AUDIT_STORAGE = os.getenv('AUDIT_STORAGE', 'jsonl').lower()
+    AUDIT_LOG_DIR = os.getenv('AUDIT_LOG_DIR', os.path.join(os.path.dirname(__file__), 'data', 'audit'))
+    AUDIT_DB_PATH = os.getenv('AUDIT_DB_PATH', os.path.join(AUDIT_LOG_DIR, 'audit.db'))
+    AUDIT_SEGMENT_BYTES = int(os.getenv('AUDIT_SEGMENT_BYTES', str(8 * 1024 * 1024)))
+    AUDIT_MAX_SEGMENTS = int(os.getenv('AUDIT_MAX_SEGMENTS', '0'))  # 0 = keep everything
+    AUDIT_FSYNC = os.getenv('AUDIT_FSYNC', 'False').lower() == 'true'
+
+    # Background group-commit audit writer (utils/audit_writer.py)
+    AUDIT_ASYNC = os.getenv('AUDIT_ASYNC', 'True').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+    AUDIT_FLUSH_ROWS = int(os.getenv('AUDIT_FLUSH_ROWS', '256'))
+    AUDIT_FLUSH_INTERVAL_MS = float(os.getenv('AUDIT_FLUSH_INTERVAL_MS', '5'))
+    # When the queue is full: 'block' the request, 'drop' the event, or 'spill' it to disk
+    AUDIT_FULL_POLICY = os.getenv('AUDIT_FULL_POLICY', 'block').lower()
+
     # HuggingFace API (optional, for narrative generation)
     HUGGINGFACE_API_KEY = os.getenv('HUGGINGFACE_API_KEY', '')
     HUGGINGFACE_MODEL = 'mistralai/Mistral-7B-Instruct-v0.2'
+    HUGGINGFACE_API_URL = os.getenv('HUGGINGFACE_API_URL',
+                                    f'https://api-inference.huggingface.co/models/{HUGGINGFACE_MODEL}')
+
+    # Narrative calls (utils/narrative.py): run on a dedicated pool; a request waits at
+    # most NARRATIVE_BUDGET_MS before using the template, late results are kept by id
+    NARRATIVE_WORKERS = int(os.getenv('NARRATIVE_WORKERS', '4'))
+    NARRATIVE_BUDGET_MS = float(os.getenv('NARRATIVE_BUDGET_MS', '300'))
+    NARRATIVE_TIMEOUT_SECONDS = float(os.getenv('NARRATIVE_TIMEOUT_SECONDS', '10'))
+    NARRATIVE_MAX_PENDING = int(os.getenv('NARRATIVE_MAX_PENDING', '64'))
+    NARRATIVE_BREAKER_FAILURES = int(os.getenv('NARRATIVE_BREAKER_FAILURES', '5'))
+    NARRATIVE_BREAKER_RESET_SECONDS = float(os.getenv('NARRATIVE_BREAKER_RESET_SECONDS', '30'))
+    NARRATIVE_RESULTS = int(os.getenv('NARRATIVE_RESULTS', '10000'))
+    NARRATIVE_RESULT_TTL_SECONDS = float(os.getenv('NARRATIVE_RESULT_TTL_SECONDS', '600'))
+    # Late results are also written here (one file per id) so every serve.py worker can
+    # answer /citizen/narrative/<id>; '' keeps them in the calling process only
+    NARRATIVE_RESULTS_DIR = os.getenv('NARRATIVE_RESULTS_DIR', os.path.join(os.path.dirname(__file__), 'data', 'narratives'))
+    # Generated narratives reused across assessments with the same signature (score
+    # bucket, category, factors, top action); NARRATIVE_CACHE_PATH persists them (JSONL)
+    NARRATIVE_CACHE_SIZE = int(os.getenv('NARRATIVE_CACHE_SIZE', '5000'))
+    NARRATIVE_CACHE_TTL_SECONDS = float(os.getenv('NARRATIVE_CACHE_TTL_SECONDS', '86400'))
+    NARRATIVE_CACHE_PATH = os.getenv('NARRATIVE_CACHE_PATH', '')
+    NARRATIVE_SCORE_BUCKET = int(os.getenv('NARRATIVE_SCORE_BUCKET', '10'))
 
     # Mock users for authentication
     MOCK_USERS = {
@@ -0,0 +1,65 @@
+"""Anomaly scoring for applicant feature profiles."""
+import numpy as np
+from typing import Dict, Any
+
+from ml.registry import get_model_registry
+
+
+class AnomalyScorer:
+    """
+    Flags feature profiles unlike the training data.
+
+    Uses the Isolation Forest trained alongside the credit model (on scaled
+    features) and the scaler from the shared model registry.
+    """
+
+    def __init__(self, registry=None):
+        """Initialize the scorer from the model registry."""
+        registry = registry or get_model_registry()
+        self.detector = registry.get('anomaly_detector')
+        self.scaler = registry.get('scaler')
+
+    @property
+    def available(self) -> bool:
+        """Whether the detector and scaler were loaded."""
+        return self.detector is not None and self.scaler is not None
+
+    def score_many(self, feature_matrix: np.ndarray,
+                   scaled: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """
+        Score a batch of unscaled model feature rows.
+
+        Args:
+            feature_matrix: (n, n_features) unscaled model features
+            scaled: The same rows already scaled by the predictor, if available
+
+        Returns:
+            Dictionary with 'anomaly_score' (higher = more unusual) and
+            'is_anomaly' arrays, or None if the detector is not available
+        """
+        if not self.available:
+            return None
+
+        if scaled is None:
+            scaled = self.scaler.transform(np.asarray(feature_matrix, dtype=np.float64))
+        # decision_function is negative for outliers; flip so higher = more anomalous
+        anomaly_score = -self.detector.decision_function(scaled)
+        return {
+            'anomaly_score': np.round(anomaly_score, 4),
+            'is_anomaly': anomaly_score > 0,
+        }
+
+    def score(self, feature_vector: list) -> Dict[str, Any]:
+        """Score a single unscaled feature vector."""
+        result = self.score_many([feature_vector])
+        if result is None:
+            return None
+        return {
+            'anomaly_score': float(result['anomaly_score'][0]),
+            'is_anomaly': bool(result['is_anomaly'][0]),
+        }
+
+
+def get_anomaly_scorer() -> AnomalyScorer:
+    """Get or create the anomaly scorer for the current model version."""
+    return get_model_registry().consumer('anomaly', AnomalyScorer)
@@ -0,0 +1,64 @@
+"""
+Compile the trained booster into a NumPy-only tree artifact.
+
+Writes Config.TREES_MODEL_PATH: the XGBoost trees from model.pkl flattened
+into arrays plus the StandardScaler parameters, loadable with
+CompiledTreeEnsemble.load() without importing xgboost. The compiled
+ensemble is checked against predict_proba before it is saved.
+
+Usage (from the backend directory):
+    python ml/compile_trees.py
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from ml.registry import get_model_registry
+from ml.tree_ensemble import CompiledTreeEnsemble
+
+TOLERANCE = 1e-6
+
+
+def load_artifacts():
+    """Load model, scaler, and feature names from the model registry."""
+    registry = get_model_registry()
+    return registry.get('model'), registry.get('scaler'), registry.get('feature_names')
+
+
+def compile_model(model, scaler, feature_names):
+    """Flatten the XGBClassifier's booster into a CompiledTreeEnsemble."""
+    model_json = json.loads(model.get_booster().save_raw('json'))
+    return CompiledTreeEnsemble.from_booster_json(model_json, scaler.mean_, scaler.scale_, feature_names)
+
+
+def validate(ensemble, model, scaler, n_samples=5000):
+    """Compare compiled probabilities with predict_proba on random rows."""
+    rng = np.random.default_rng(42)
+    rows = scaler.mean_ + rng.normal(size=(n_samples, len(scaler.mean_))) * scaler.scale_
+    # Exercise the default (missing value) branches too
+    rows[rng.random(rows.shape) < 0.05] = np.nan
+
+    expected = model.predict_proba(scaler.transform(rows))[:, 1]
+    actual = ensemble.predict_proba(rows)
+    max_diff = float(np.abs(expected - actual).max())
+    print(f"Max |p_trees - p_xgboost| over {n_samples} rows: {max_diff:.2e}")
+    return max_diff
+
+
+def main():
+    model, scaler, feature_names = load_artifacts()
+    ensemble = compile_model(model, scaler, feature_names)
+    print(f"Compiled {len(ensemble.roots)} trees, {len(ensemble.value)} nodes, depth {ensemble.max_depth}")
+    if validate(ensemble, model, scaler) > TOLERANCE:
+        raise SystemExit("Compiled trees do not match the pickled model")
+    ensemble.save(Config.TREES_MODEL_PATH)
+    print(f"Compiled trees saved to: {Config.TREES_MODEL_PATH}")
+
+
+if __name__ == '__main__':
+    main()
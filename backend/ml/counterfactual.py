@@ -1,35 +1,100 @@
 """Counterfactual explanation module for improvement suggestions."""
-from typing import Dict, List, Any
+from functools import lru_cache
+from itertools import combinations, product
+from typing import Dict, List, Any, Optional, Tuple
+
 import numpy as np
 
+from config import Config
+from ml.feature_extractor import FeatureExtractor
+from ml.predictor import CreditScorePredictor
+from ml.registry import get_model_registry
+
+# Month-over-month shape of the BILL_AMT / PAY_AMT columns in the feature mapping
+MONTH_SHAPE = np.array([1.0, 0.95, 0.9])
+
+
+@lru_cache(maxsize=256)
+def candidate_grid(level_counts: Tuple[int, ...], max_changes: int) -> np.ndarray:
+    """
+    Enumerate the candidate lever settings to score.
+
+    Args:
+        level_counts: Number of target levels available per lever (0: lever unused)
+        max_changes: Most levers changed in one candidate
+
+    Returns:
+        Read-only (n_candidates, n_levers) int matrix of level numbers
+        (0 = unchanged, k = the lever's k-th level); row 0 changes nothing
+    """
+    rows = [(0,) * len(level_counts)]
+    active = [lever for lever, count in enumerate(level_counts) if count]
+    for n_changes in range(1, min(max_changes, len(active)) + 1):
+        for levers in combinations(active, n_changes):
+            for levels in product(*(range(1, level_counts[lever] + 1) for lever in levers)):
+                row = [0] * len(level_counts)
+                for lever, level in zip(levers, levels):
+                    row[lever] = level
+                rows.append(tuple(row))
+    grid = np.array(rows, dtype=np.int64)
+    grid.setflags(write=False)
+    return grid
+
 
 class CounterfactualGenerator:
-    """Generate actionable improvement suggestions based on feature gaps."""
-
-    # Target values for a "good" credit profile
-    GOOD_PROFILE = {
-        'PAY_0': -1,  # Paid early
-        'PAY_2': -1,
-        'PAY_3': -1,
-        'utilization': 0.4,  # 40% credit utilization (was 30%)
-        'payment_ratio': 0.8,  # Pay 80% of bill
-        'expense_ratio': 0.7,  # Spend 70% of income
-        'overdraft_frequency': 0,
-        'income_stability': 0.2,  # Low variance
-        'transaction_volatility': 0.3,
+    """
+    Search for the cheapest changes that move an applicant up a risk category.
+
+    Every lever (paying on time, lowering utilization, ...) has a few target
+    levels. The generator builds a grid of candidate profiles that change up
+    to MAX_CHANGES levers, scores the whole grid with one
+    CreditScorePredictor.predict_many call (model probability plus the
+    business-rule caps) and picks the cheapest candidate that reaches the
+    next category. Levers on transaction behaviour (expense ratio,
+    overdrafts, volatility) change the raw features and go back through the
+    extractor's feature mapping, so they move the model features and the
+    rules the way the same change in real data would.
+    """
+
+    # Lever order of the candidate grid
+    LEVERS = ('payment_status', 'utilization', 'payment_amount',
+              'expense_ratio', 'overdraft', 'spending_consistency')
+
+    # Target levels per lever, mildest first; only the levels that improve on
+    # the applicant's current value are tried
+    LEVELS = {
+        'payment_status': (1, 0, -1),        # PAY_0/PAY_2/PAY_3 (months late)
+        'utilization': (0.7, 0.5, 0.3),      # BILL_AMT1 / LIMIT_BAL
+        'payment_amount': (0.5, 0.8, 1.05),  # PAY_AMT1 / BILL_AMT1
+        'expense_ratio': (0.85, 0.7),        # raw expense_ratio
+        'overdraft': (0.1, 0.0),             # raw overdraft_frequency
+        'spending_consistency': (0.5, 0.3),  # raw transaction_volatility
     }
 
-    # Impact estimates for improvements (points)
-    IMPROVEMENT_IMPACTS = {
-        'payment_status': 50,
-        'utilization': 40,
-        'payment_amount': 35,
-        'expense_ratio': 30,
-        'overdraft': 25,
-        'income_stability': 20,
-        'spending_consistency': 15,
+    # Levers where a higher value is better
+    INCREASING = frozenset({'payment_amount'})
+
+    # Levers applied to the raw features and re-mapped
+    RAW_LEVERS = {
+        'expense_ratio': 'expense_ratio',
+        'overdraft': 'overdraft_frequency',
+        'spending_consistency': 'transaction_volatility',
+    }
+
+    # Relative effort of taking a lever all the way to its last level;
+    # a partial change costs the same fraction of it
+    EFFORT = {
+        'payment_status': 3.0,
+        'utilization': 2.0,
+        'payment_amount': 2.0,
+        'expense_ratio': 2.0,
+        'overdraft': 1.0,
+        'spending_consistency': 1.5,
     }
 
+    # Most levers changed by one candidate
+    MAX_CHANGES = 3
+
     # Improvement suggestions templates
     SUGGESTIONS = {
         'payment_status': {
@@ -57,11 +122,6 @@ class CounterfactualGenerator:
             'detail': 'Maintain a buffer in your account and set up low balance alerts',
             'timeline': '1-2 months',
         },
-        'income_stability': {
-            'action': 'Stabilize income patterns',
-            'detail': 'Consider regular income sources or consistent freelance scheduling',
-            'timeline': '3-6 months',
-        },
         'spending_consistency': {
             'action': 'Reduce spending volatility',
             'detail': 'Smooth out large purchases over time when possible',
@@ -69,157 +129,490 @@ class CounterfactualGenerator:
         },
     }
 
+    def __init__(self, registry=None):
+        """Initialize the generator on the registry's predictor."""
+        registry = registry or get_model_registry()
+        self.predictor = registry.consumer('predictor', CreditScorePredictor)
+        self.extractor = FeatureExtractor()
+
+        col = {name: i for i, name in enumerate(self.predictor.feature_names)}
+        self._pay = [col['PAY_0'], col['PAY_2'], col['PAY_3']]
+        self._bill = [col['BILL_AMT1'], col['BILL_AMT2'], col['BILL_AMT3']]
+        self._pay_amt = [col['PAY_AMT1'], col['PAY_AMT2'], col['PAY_AMT3']]
+        self._limit = col['LIMIT_BAL']
+        self._raw = {name: i for i, name in enumerate(FeatureExtractor.RAW_FEATURES)}
+
+        # Per-lever tables for search_many; column 0 of _level_table is "unchanged"
+        width = max(len(levels) for levels in self.LEVELS.values()) + 1
+        self._level_table = np.full((len(self.LEVERS), width), np.nan)
+        for j, lever in enumerate(self.LEVERS):
+            self._level_table[j, 1:len(self.LEVELS[lever]) + 1] = self.LEVELS[lever]
+        self._increasing = np.array([lever in self.INCREASING for lever in self.LEVERS])
+        self._raw_lever = np.array([lever in self.RAW_LEVERS for lever in self.LEVERS])
+        self._last_level = np.array([self.LEVELS[lever][-1] for lever in self.LEVERS])
+        self._effort = np.array([self.EFFORT[lever] for lever in self.LEVERS])
+
     def generate_improvements(self, feature_values: Dict[str, float],
                                raw_features: Dict[str, float],
                                current_score: int) -> List[Dict[str, Any]]:
         """
         Generate prioritized improvement suggestions.
 
+        The steps of the cheapest plan that reaches the next category come
+        first, with their share of the plan's gain; other levers the model
+        rewards follow, with the gain each gives on its own.
+
         Args:
             feature_values: Model feature values
             raw_features: Raw extracted features
             current_score: Current credit score
 
         Returns:
-            List of improvement suggestions with estimated impact
+            List of improvement suggestions with model-estimated impact
         """
+        feature_row = np.array([feature_values.get(name, 0) for name in self.predictor.feature_names],
+                               dtype=np.float64)
+        raw_row = np.array([(raw_features or {}).get(name, 0) for name in FeatureExtractor.RAW_FEATURES],
+                           dtype=np.float64)
+        search = self.search(feature_row, raw_row, current_score)
+        if search is None:
+            return []
+
+        levers, levels, current = search['levers'], search['levels'], search['current']
+        grid, scores, categories = search['grid'], search['scores'], search['categories']
+        rows = {tuple(row): i for i, row in enumerate(grid.tolist())}
+        plan = search['plan']
+
         improvements = []
+        plan_levers = set()
+        if plan is not None:
+            plan_row = grid[plan['row']]
+            for j in np.flatnonzero(plan_row):
+                without = plan_row.copy()
+                without[j] = 0
+                gain = int(scores[plan['row']] - scores[rows[tuple(without.tolist())]])
+                improvements.append(self._suggestion(levers[j], current[j], levels[j][plan_row[j] - 1],
+                                                     gain, scores[plan['row']], categories[plan['row']],
+                                                     in_plan=True))
+                plan_levers.add(j)
 
-        # Analyze payment status
-        pay_0 = feature_values.get('PAY_0', 0)
-        if pay_0 > 0:
-            impact = self._calculate_impact('payment_status', pay_0, 0)
-            improvements.append({
-                **self.SUGGESTIONS['payment_status'],
-                'impact': f"+{impact} points",
-                'impact_value': impact,
-                'priority': 'high' if pay_0 >= 2 else 'medium',
-                'current': f"{pay_0} months late",
-                'target': 'On-time payments'
-            })
-
-        # Analyze credit utilization
-        bill = feature_values.get('BILL_AMT1', 0)
-        limit = feature_values.get('LIMIT_BAL', 1)
-        utilization = bill / limit if limit > 0 else 0
-
-        if utilization > 0.3:
-            impact = self._calculate_impact('utilization', utilization, 0.3)
-            improvements.append({
-                **self.SUGGESTIONS['utilization'],
-                'impact': f"+{impact} points",
-                'impact_value': impact,
-                'priority': 'high' if utilization > 0.7 else 'medium',
-                'current': f"{utilization:.0%} utilization",
-                'target': '30% utilization'
-            })
-
-        # Analyze payment amounts
-        pay_amt = feature_values.get('PAY_AMT1', 0)
-        payment_ratio = pay_amt / bill if bill > 0 else 1
-
-        if payment_ratio < 0.5:
-            impact = self._calculate_impact('payment_amount', payment_ratio, 0.5)
-            improvements.append({
-                **self.SUGGESTIONS['payment_amount'],
-                'impact': f"+{impact} points",
-                'impact_value': impact,
-                'priority': 'medium',
-                'current': f"Paying {payment_ratio:.0%} of balance",
-                'target': 'Pay 50%+ of balance'
-            })
-
-        # Analyze raw features if available
-        if raw_features:
-            # Expense ratio
-            expense_ratio = raw_features.get('expense_ratio', 0.8)
-            if expense_ratio > 0.85:
-                impact = self._calculate_impact('expense_ratio', expense_ratio, 0.7)
-                improvements.append({
-                    **self.SUGGESTIONS['expense_ratio'],
-                    'impact': f"+{impact} points",
-                    'impact_value': impact,
-                    'priority': 'medium',
-                    'current': f"{expense_ratio:.0%} expense ratio",
-                    'target': '70% expense ratio'
-                })
-
-            # Overdrafts
-            overdraft = raw_features.get('overdraft_frequency', 0)
-            if overdraft > 0:
-                impact = self._calculate_impact('overdraft', overdraft, 0)
-                improvements.append({
-                    **self.SUGGESTIONS['overdraft'],
-                    'impact': f"+{impact} points",
-                    'impact_value': impact,
-                    'priority': 'high',
-                    'current': f"{overdraft:.0%} transactions overdraft",
-                    'target': 'No overdrafts'
-                })
-
-            # Income stability
-            income_stability = raw_features.get('income_stability', 0.5)
-            if income_stability > 0.5:
-                impact = self._calculate_impact('income_stability', income_stability, 0.2)
-                improvements.append({
-                    **self.SUGGESTIONS['income_stability'],
-                    'impact': f"+{impact} points",
-                    'impact_value': impact,
-                    'priority': 'low',
-                    'current': 'Variable income',
-                    'target': 'Stable income'
-                })
-
-            # Spending consistency
-            volatility = raw_features.get('transaction_volatility', 0.5)
-            if volatility > 0.5:
-                impact = self._calculate_impact('spending_consistency', volatility, 0.3)
-                improvements.append({
-                    **self.SUGGESTIONS['spending_consistency'],
-                    'impact': f"+{impact} points",
-                    'impact_value': impact,
-                    'priority': 'low',
-                    'current': 'High spending volatility',
-                    'target': 'Consistent spending'
-                })
-
-        # Sort by impact value (highest first)
-        improvements.sort(key=lambda x: x['impact_value'], reverse=True)
-
-        # Add potential score after improvements
-        total_potential = sum(i['impact_value'] for i in improvements[:3])
-        for imp in improvements:
-            imp['potential_score'] = min(current_score + imp['impact_value'], 850)
+        for j, lever in enumerate(levers):
+            if j in plan_levers:
+                continue
+            single = [0] * len(levers)
+            single[j] = len(levels[j])
+            row = rows[tuple(single)]
+            gain = int(scores[row] - current_score)
+            if gain > 0:
+                improvements.append(self._suggestion(lever, current[j], levels[j][-1], gain,
+                                                     scores[row], categories[row], in_plan=False))
 
+        # Plan steps first, then by impact value (highest first)
+        improvements.sort(key=lambda x: (not x['in_plan'], -x['impact_value']))
         return improvements
 
-    def _calculate_impact(self, improvement_type: str,
-                          current_value: float,
-                          target_value: float) -> int:
-        """Calculate estimated score impact for an improvement."""
-        base_impact = self.IMPROVEMENT_IMPACTS.get(improvement_type, 20)
-
-        # Scale impact by how far from target
-        if improvement_type in ['utilization', 'expense_ratio', 'income_stability',
-                                 'spending_consistency', 'overdraft']:
-            # For these, lower is better
-            gap = max(0, current_value - target_value)
-            scale = min(gap / 0.5, 1.0)  # Max scale at 50% gap
+    def search(self, feature_row: np.ndarray, raw_row: np.ndarray,
+               current_score: int) -> Optional[Dict[str, Any]]:
+        """
+        Score the candidate grid for one applicant and pick the plan.
+
+        Args:
+            feature_row: Model features in feature_names order
+            raw_row: Raw features in FeatureExtractor.RAW_FEATURES order
+            current_score: Current credit score
+
+        Returns:
+            Dictionary with the active levers, their current values and
+            levels, the candidate grid with its feature/raw matrices, scores,
+            categories and costs, and 'plan' (row, score, category, cost, changes,
+            reaches_next_category; None when nothing improves the score), or
+            None when no lever applies
+        """
+        current = self._lever_values_many(feature_row[None, :], raw_row[None, :])[0].tolist()
+        income, expenses, invertible = self._estimate_totals_many(feature_row[None, :], raw_row[None, :])
+
+        levers, levels, values = [], [], []
+        for lever, value in zip(self.LEVERS, current):
+            if lever in self.RAW_LEVERS and not invertible[0]:
+                continue
+            if lever in self.INCREASING:
+                options = tuple(level for level in self.LEVELS[lever] if level > value)
+            else:
+                options = tuple(level for level in self.LEVELS[lever] if level < value)
+            if options:
+                levers.append(lever)
+                levels.append(options)
+                values.append(value)
+        if not levers:
+            return None
+
+        grid = candidate_grid(tuple(len(options) for options in levels), self.MAX_CHANGES)
+        targets = {}
+        costs = np.zeros(len(grid))
+        for j, (lever, options, value) in enumerate(zip(levers, levels, values)):
+            targets[lever] = np.concatenate([[np.nan], options])[grid[:, j]]
+            step = np.abs(np.asarray(options) - value) / abs(options[-1] - value)
+            costs += np.concatenate([[0.0], step * self.EFFORT[lever]])[grid[:, j]]
+
+        n = len(grid)
+        feature_matrix, raw_matrix = self._apply(
+            np.repeat(feature_row[None, :], n, axis=0), np.repeat(raw_row[None, :], n, axis=0),
+            targets, np.repeat(income, n), np.repeat(expenses, n))
+        prediction = self.predictor.predict_many(feature_matrix, raw_matrix)
+        scores = prediction['score']
+        categories = prediction['category']
+
+        next_category = self._next_category(current_score)
+        reaches = scores >= next_category[1] if next_category else np.zeros(len(grid), dtype=bool)
+        if reaches.any():
+            # Cheapest first, then highest score, then fewest changes
+            order = np.lexsort(((grid > 0).sum(axis=1), -scores, costs))
+            best = int(order[reaches[order]][0])
         else:
-            # For payment status, higher deviation is worse
-            gap = abs(current_value - target_value)
-            scale = min(gap / 3, 1.0)  # Max scale at 3 months late
+            order = np.lexsort(((grid > 0).sum(axis=1), costs, -scores))
+            best = int(order[0])
+
+        plan = None
+        if scores[best] > current_score:
+            plan = {
+                'row': best,
+                'score': int(scores[best]),
+                'category': str(categories[best]),
+                'cost': round(float(costs[best]), 4),
+                'changes': {levers[j]: levels[j][grid[best, j] - 1] for j in np.flatnonzero(grid[best])},
+                'reaches_next_category': bool(reaches[best]),
+            }
+
+        return {
+            'levers': levers,
+            'levels': levels,
+            'current': values,
+            'grid': grid,
+            'feature_matrix': feature_matrix,
+            'raw_matrix': raw_matrix,
+            'scores': scores,
+            'categories': categories,
+            'costs': costs,
+            'next_category': next_category[0] if next_category else None,
+            'plan': plan,
+        }
+
+    def search_many(self, feature_matrix: np.ndarray, raw_matrix: np.ndarray,
+                    scores: np.ndarray = None, target_scores=None,
+                    max_bytes: int = None) -> Dict[str, np.ndarray]:
+        """
+        Find the cheapest plan to reach a target score for a whole portfolio.
+
+        Uses the levers, levels, costs and tie-breaks of search(). Every
+        applicant shares the full lever grid: the (applicants, candidates,
+        levers) target array is masked down to the levels that improve on
+        each applicant's current values, and the valid candidates are built
+        and scored in chunks of applicants - one predict_many call per chunk,
+        sized so a chunk stays under `max_bytes`. There is no per-applicant
+        Python loop.
+
+        Args:
+            feature_matrix: (n, n_features) model features in feature_names order
+            raw_matrix: (n, n_raw) raw features in FeatureExtractor.RAW_FEATURES order
+            scores: (n,) current scores (scored here if omitted)
+            target_scores: Score to reach, scalar or (n,) (default: the floor
+                of each applicant's next category)
+            max_bytes: Memory cap for one chunk (default: COUNTERFACTUAL_MAX_MB)
+
+        Returns:
+            Dictionary of columnar results:
+                - current: (n, n_levers) current lever values, in LEVERS order
+                - changes: (n, n_levers) plan target per lever, NaN where unchanged
+                - score / category: after the plan (the current ones without a plan)
+                - cost: plan cost (0 without a plan)
+                - has_plan: the plan raises the score
+                - reaches_target: the plan (or the current profile) reaches the target
+                - target_score: the target per applicant
+                - candidates: number of candidates scored per applicant
+        """
+        feature_matrix = np.asarray(feature_matrix, dtype=np.float64)
+        raw_matrix = np.asarray(raw_matrix, dtype=np.float64)
+        n = len(feature_matrix)
+        if scores is None:
+            scores = self.predictor.predict_many(feature_matrix, raw_matrix)['score']
+        scores = np.asarray(scores, dtype=np.int64)
+        if target_scores is None:
+            target_scores = self._next_floors(scores)
+        target_scores = np.broadcast_to(np.asarray(target_scores, dtype=np.int64), (n,)).copy()
+
+        grid = candidate_grid(tuple(len(self.LEVELS[lever]) for lever in self.LEVERS), self.MAX_CHANGES)
+        if max_bytes is None:
+            max_bytes = Config.COUNTERFACTUAL_MAX_MB * 1024 * 1024
+        # Candidate feature/raw/scaled rows and per-lever temporaries, per applicant
+        applicant_bytes = len(grid) * 8 * 3 * (feature_matrix.shape[1] + raw_matrix.shape[1] + len(self.LEVERS))
+        chunk = max(1, int(max_bytes // applicant_bytes))
+
+        results = {
+            'current': np.empty((n, len(self.LEVERS))),
+            'changes': np.full((n, len(self.LEVERS)), np.nan),
+            'score': scores.copy(),
+            'category': np.empty(n, dtype=object),
+            'cost': np.zeros(n),
+            'has_plan': np.zeros(n, dtype=bool),
+            'reaches_target': np.zeros(n, dtype=bool),
+            'target_score': target_scores,
+            'candidates': np.zeros(n, dtype=np.int64),
+        }
+        for start in range(0, n, chunk):
+            stop = min(start + chunk, n)
+            part = self._search_chunk(feature_matrix[start:stop], raw_matrix[start:stop],
+                                      scores[start:stop], target_scores[start:stop], grid)
+            for key, values in part.items():
+                results[key][start:stop] = values
+        return results
+
+    def _search_chunk(self, feature_matrix: np.ndarray, raw_matrix: np.ndarray,
+                      scores: np.ndarray, target_scores: np.ndarray,
+                      grid: np.ndarray) -> Dict[str, np.ndarray]:
+        """Build, score and pick the candidates of one chunk of applicants."""
+        n = len(feature_matrix)
+        targets = self._level_table[np.arange(len(self.LEVERS)), grid]  # (candidates, levers)
+        changed = grid > 0
+        current = self._lever_values_many(feature_matrix, raw_matrix)
+        income, expenses, invertible = self._estimate_totals_many(feature_matrix, raw_matrix)
+
+        # A candidate is valid when every lever it changes improves on the applicant
+        improves = np.where(self._increasing, targets[None] > current[:, None], targets[None] < current[:, None])
+        allowed = improves & (invertible[:, None, None] | ~self._raw_lever)
+        valid = np.all(allowed | ~changed[None], axis=2)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.abs(targets[None] - current[:, None]) / np.abs(self._last_level - current)[:, None]
+            costs = np.where(changed[None], step * self._effort, 0.0).sum(axis=2)
+
+        rows, cols = np.nonzero(valid)
+        candidate_features, candidate_raw = self._apply(
+            feature_matrix[rows], raw_matrix[rows],
+            {lever: targets[cols, j] for j, lever in enumerate(self.LEVERS)},
+            income[rows], expenses[rows])
+        prediction = self.predictor.predict_many(candidate_features, candidate_raw)
+        position = np.zeros((n, len(grid)), dtype=np.int64)
+        position[rows, cols] = np.arange(len(rows))
+        candidate_scores = np.full((n, len(grid)), -1, dtype=np.int64)
+        candidate_scores[rows, cols] = prediction['score']
+
+        n_changes = changed.sum(axis=1)
+        reach = valid & (candidate_scores >= target_scores[:, None])
+        # Reaching the target: cheapest, then highest score, then fewest changes;
+        # otherwise: highest score, then cheapest, then fewest changes
+        best = np.where(reach.any(axis=1),
+                        self._pick(reach, costs, -candidate_scores, n_changes),
+                        self._pick(valid, -candidate_scores, costs, n_changes))
+
+        index = np.arange(n)
+        best_scores = candidate_scores[index, best]
+        has_plan = best_scores > scores
+        return {
+            'current': current,
+            'changes': np.where(has_plan[:, None] & changed[best], targets[best], np.nan),
+            'score': np.where(has_plan, best_scores, scores),
+            'category': prediction['category'][position[index, np.where(has_plan, best, 0)]],
+            'cost': np.where(has_plan, costs[index, best], 0.0),
+            'has_plan': has_plan,
+            'reaches_target': reach[index, best],
+            'candidates': valid.sum(axis=1),
+        }
+
+    @staticmethod
+    def _pick(mask: np.ndarray, first: np.ndarray, second: np.ndarray, third: np.ndarray) -> np.ndarray:
+        """Per row, the first masked column minimizing (first, second, third)."""
+        for key in (first, second):
+            key = np.where(mask, key, np.inf)
+            mask = mask & (key == key.min(axis=1, keepdims=True))
+        return np.argmin(np.where(mask, third, np.inf), axis=1)
+
+    def describe_plan(self, current: np.ndarray, changes: np.ndarray) -> List[Dict[str, Any]]:
+        """Format one row of search_many's current/changes as a list of changes."""
+        return [
+            {
+                'lever': lever,
+                'action': self.SUGGESTIONS[lever]['action'],
+                'current': self._describe_current(lever, current[j]),
+                'target': self._describe_target(lever, changes[j]),
+            }
+            for j, lever in enumerate(self.LEVERS) if not np.isnan(changes[j])
+        ]
+
+    def _lever_values_many(self, feature_matrix: np.ndarray, raw_matrix: np.ndarray) -> np.ndarray:
+        """Current value of every lever, (n, n_levers) in LEVERS order."""
+        bill = feature_matrix[:, self._bill[0]]
+        limit = feature_matrix[:, self._limit]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = {
+                'payment_status': feature_matrix[:, self._pay[0]],
+                'utilization': np.where(limit > 0, bill / limit, 0.0),
+                'payment_amount': np.where(bill > 0, feature_matrix[:, self._pay_amt[0]] / bill, 1.0),
+            }
+        for lever, name in self.RAW_LEVERS.items():
+            values[lever] = raw_matrix[:, self._raw[name]]
+        return np.column_stack([values[lever] for lever in self.LEVERS]).astype(np.float64)
+
+    def _estimate_totals(self, feature_row: np.ndarray,
+                         raw_row: np.ndarray) -> Optional[Tuple[float, float]]:
+        """Recover one applicant's income and expense totals (None if not invertible)."""
+        income, expenses, invertible = self._estimate_totals_many(feature_row[None, :], raw_row[None, :])
+        if not invertible[0]:
+            return None
+        return float(income[0]), float(expenses[0])
+
+    def _estimate_totals_many(self, feature_matrix: np.ndarray,
+                              raw_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Recover the income and expense totals behind feature rows.
+
+        Inverts the feature mapping: the income from the credit limit (or
+        from the expense ratio when the limit is at its floor), the expenses
+        from the bill amount or the expense ratio. Rows whose recovered totals
+        do not map back to the same model features (e.g. default rows for
+        applicants without transactions) are flagged, and the raw-feature
+        levers are not tried for them.
+
+        Returns:
+            Tuple of (income, expenses, invertible) arrays
+        """
+        limit = feature_matrix[:, self._limit]
+        bill = feature_matrix[:, self._bill[0]]
+        expense_ratio = raw_matrix[:, self._raw['expense_ratio']]
+        multiplier = self.extractor.limit_multiplier(raw_matrix[:, self._raw['transaction_volatility']])
+
+        positive = expense_ratio > 0
+        above_floor = limit > self.extractor.LIMIT_FLOOR
+        with np.errstate(divide='ignore', invalid='ignore'):
+            income = np.where(positive, 3 * bill / expense_ratio - 1,
+                              np.where(above_floor, limit / multiplier, 0.0))
+            expenses = np.where(positive, 3 * bill,
+                                np.where(above_floor, expense_ratio * (income + 1), expense_ratio))
+            mapped = self.extractor.map_to_model_features_many(raw_matrix, income, expenses)
+        invertible = np.isclose(mapped, feature_matrix, rtol=1e-6, atol=1e-6).all(axis=1)
+        return income, expenses, invertible
+
+    def _apply(self, feature_matrix: np.ndarray, raw_matrix: np.ndarray,
+               targets: Dict[str, np.ndarray], income: np.ndarray,
+               expenses: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Apply lever targets (NaN: unchanged) to candidate rows, in place.
+
+        Args:
+            feature_matrix: (m, n_features) one copy of the applicant's features per candidate
+            raw_matrix: (m, n_raw) one copy of the applicant's raw features per candidate
+            targets: Lever name -> (m,) target level
+            income: (m,) applicant income totals
+            expenses: (m,) applicant expense totals
+
+        Returns:
+            Tuple of (feature_matrix, raw_matrix)
+        """
+        n = len(feature_matrix)
+
+        # Raw levers: change the raw features, then re-run the feature mapping
+        remap = np.zeros(n, dtype=bool)
+        for lever, name in self.RAW_LEVERS.items():
+            if lever in targets:
+                changed = ~np.isnan(targets[lever])
+                raw_matrix[changed, self._raw[name]] = targets[lever][changed]
+                remap |= changed
+        if remap.any():
+            total_expenses = np.array(expenses, dtype=np.float64)
+            if 'expense_ratio' in targets:
+                changed = ~np.isnan(targets['expense_ratio'])
+                total_expenses[changed] = targets['expense_ratio'][changed] * (income[changed] + 1)
+            feature_matrix[remap] = self.extractor.map_to_model_features_many(
+                raw_matrix[remap], income[remap], total_expenses[remap])
+
+        # Model-feature levers on top of the (re-mapped) rows
+        if 'payment_status' in targets:
+            changed = ~np.isnan(targets['payment_status'])
+            feature_matrix[np.ix_(changed, self._pay)] = np.minimum(
+                feature_matrix[np.ix_(changed, self._pay)], targets['payment_status'][changed, None])
+        if 'utilization' in targets:
+            changed = ~np.isnan(targets['utilization'])
+            bill = (targets['utilization'][changed] * feature_matrix[changed, self._limit])[:, None] * MONTH_SHAPE
+            feature_matrix[np.ix_(changed, self._bill)] = np.minimum(
+                feature_matrix[np.ix_(changed, self._bill)], bill)
+        if 'payment_amount' in targets:
+            changed = ~np.isnan(targets['payment_amount'])
+            pay_amt = (targets['payment_amount'][changed] * feature_matrix[changed, self._bill[0]])[:, None] * MONTH_SHAPE
+            feature_matrix[np.ix_(changed, self._pay_amt)] = np.maximum(
+                feature_matrix[np.ix_(changed, self._pay_amt)], pay_amt)
+
+        return feature_matrix, raw_matrix
+
+    def _next_floors(self, scores: np.ndarray) -> np.ndarray:
+        """Floor of each score's next category (SCORE_MAX + 1 at the top)."""
+        floors = np.sort([min_score for min_score, _ in Config.RISK_CATEGORIES.values()])
+        index = np.searchsorted(floors, scores, side='right')
+        return np.append(floors, Config.SCORE_MAX + 1)[index]
+
+    def _next_category(self, score: int) -> Optional[Tuple[str, int]]:
+        """Return (name, floor) of the lowest category above `score`, or None at the top."""
+        for name, (min_score, _) in sorted(Config.RISK_CATEGORIES.items(), key=lambda item: item[1][0]):
+            if min_score > score:
+                return name, min_score
+        return None
+
+    def _suggestion(self, lever: str, current: float, target: float, gain: int,
+                    potential_score: int, potential_category: str, in_plan: bool) -> Dict[str, Any]:
+        """Format one lever change as an improvement suggestion."""
+        return {
+            **self.SUGGESTIONS[lever],
+            'impact': f"+{gain} points",
+            'impact_value': gain,
+            'priority': self._priority(lever, current),
+            'current': self._describe_current(lever, current),
+            'target': self._describe_target(lever, target),
+            'potential_score': int(potential_score),
+            'potential_category': str(potential_category),
+            'in_plan': in_plan,
+        }
 
-        return int(base_impact * (0.5 + 0.5 * scale))
+    def _priority(self, lever: str, current: float) -> str:
+        """Priority of a lever given how far off the applicant is."""
+        if lever == 'payment_status':
+            return 'high' if current >= 2 else 'medium'
+        if lever == 'utilization':
+            return 'high' if current > 0.7 else 'medium'
+        if lever == 'overdraft':
+            return 'high'
+        if lever == 'spending_consistency':
+            return 'low'
+        return 'medium'
 
+    def _describe_current(self, lever: str, value: float) -> str:
+        """Describe the applicant's current value of a lever."""
+        if lever == 'payment_status':
+            return f"{int(value)} months late" if value > 0 else 'Revolving balance'
+        if lever == 'utilization':
+            return f"{value:.0%} utilization"
+        if lever == 'payment_amount':
+            return f"Paying {value:.0%} of balance"
+        if lever == 'expense_ratio':
+            return f"{value:.0%} expense ratio"
+        if lever == 'overdraft':
+            return f"{value:.0%} transactions overdraft"
+        return 'High spending volatility'
 
-# Singleton instance
-_generator = None
+    def _describe_target(self, lever: str, value: float) -> str:
+        """Describe a lever's target level."""
+        if lever == 'payment_status':
+            if value < 0:
+                return 'On-time payments'
+            return 'No late payments' if value == 0 else f"At most {int(value)} month late"
+        if lever == 'utilization':
+            return f"{value:.0%} utilization"
+        if lever == 'payment_amount':
+            return f"Pay {value:.0%}+ of balance"
+        if lever == 'expense_ratio':
+            return f"{value:.0%} expense ratio"
+        if lever == 'overdraft':
+            return 'No overdrafts' if value == 0 else f"At most {value:.0%} transactions overdraft"
+        return 'Consistent spending' if value <= 0.3 else f"Spending volatility below {value:.1f}"
 
 
 def get_counterfactual_generator() -> CounterfactualGenerator:
-    """Get or create the singleton generator instance."""
-    global _generator
-    if _generator is None:
-        _generator = CounterfactualGenerator()
-    return _generator
+    """Get or create the generator for the current model version."""
+    return get_model_registry().consumer('counterfactual', CounterfactualGenerator)
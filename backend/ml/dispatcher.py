@@ -0,0 +1,198 @@
+"""Micro-batching of concurrent single-applicant model calls."""
+import os
+import queue
+import time
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import Dict, List, Any
+
+import numpy as np
+
+from config import Config
+
+
+class _Pending:
+    """One caller's feature row waiting to be scored."""
+
+    __slots__ = ('backend', 'row', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, backend, row: List[float]):
+        self.backend = backend
+        self.row = row
+        self.enqueued_at = time.perf_counter()
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatchDispatcher:
+    """
+    Collects feature rows from concurrent request threads and scores them
+    with one vectorized backend call.
+
+    A single dispatcher thread takes the first waiting row plus everything
+    already queued behind it. Only when that shows concurrency (more than
+    one row) does it keep collecting, up to `window_ms` after the first row
+    arrived or `max_rows` rows. A lone request is therefore never delayed,
+    which keeps p99 latency flat at low load. Rows are grouped by backend,
+    so requests pinned to different model versions are never mixed.
+    """
+
+    # Upper bounds of the batch-size histogram buckets
+    BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+    # Recent waits kept for percentile metrics
+    WAIT_SAMPLES = 2048
+
+    def __init__(self, window_ms: float = None, max_rows: int = None):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            window_ms: Longest time to hold the first row of a batch
+            max_rows: Largest batch scored in one call
+        """
+        self.window_ms = Config.BATCH_WINDOW_MS if window_ms is None else window_ms
+        self.max_rows = max_rows or Config.BATCH_MAX_ROWS
+        self._lock = Lock()
+        self._pid = None
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._batches = 0
+        self._rows = 0
+        self._max_queue_depth = 0
+        self._histogram = [0] * (len(self.BATCH_SIZE_BUCKETS) + 1)
+        self._waits_ms = deque(maxlen=self.WAIT_SAMPLES)
+        self._inference_ms = deque(maxlen=self.WAIT_SAMPLES)
+
+    def _ensure_worker(self):
+        """Start the dispatcher thread (again, after a fork) if needed."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads do not survive fork(): every process gets its own queue and thread
+            self._queue = queue.Queue()
+            self._reset_metrics()
+            Thread(target=self._run, name='micro-batch-dispatcher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def predict_proba(self, backend, feature_vector: List[float]) -> float:
+        """
+        Score one unscaled feature vector as part of a micro-batch.
+
+        Blocks the calling thread until its batch has been scored.
+
+        Returns:
+            P(default) for the row
+        """
+        self._ensure_worker()
+        pending = _Pending(backend, feature_vector)
+        self._queue.put(pending)
+
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        """Dispatcher loop: collect a batch, score it, wake its callers."""
+        while True:
+            batch = [self._queue.get()]
+            self._drain(batch)
+
+            if len(batch) > 1 and self.window_ms > 0:
+                deadline = batch[0].enqueued_at + self.window_ms / 1000
+                while len(batch) < self.max_rows:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                    self._drain(batch)
+
+            self._score(batch)
+
+    def _drain(self, batch: List[_Pending]):
+        """Move rows that are already queued into the batch, up to max_rows."""
+        while len(batch) < self.max_rows:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _score(self, batch: List[_Pending]):
+        """Score a batch with one call per backend and record metrics."""
+        started = time.perf_counter()
+        for pending in batch:
+            self._waits_ms.append((started - pending.enqueued_at) * 1000)
+
+        groups = {}
+        for pending in batch:
+            groups.setdefault(id(pending.backend), []).append(pending)
+
+        for group in groups.values():
+            try:
+                matrix = np.array([pending.row for pending in group], dtype=np.float64)
+                probabilities = group[0].backend.predict_proba(matrix)
+                for pending, probability in zip(group, probabilities):
+                    pending.result = float(probability)
+            except Exception as e:
+                for pending in group:
+                    pending.error = e
+
+        self._inference_ms.append((time.perf_counter() - started) * 1000)
+        self._batches += 1
+        self._rows += len(batch)
+        self._histogram[int(np.searchsorted(self.BATCH_SIZE_BUCKETS, len(batch)))] += 1
+
+        for pending in batch:
+            pending.done.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue depth, batch-size histogram and wait-time metrics."""
+        waits = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+        inference = np.array(self._inference_ms) if self._inference_ms else np.zeros(1)
+        labels = [f'<={b}' for b in self.BATCH_SIZE_BUCKETS] + [f'>{self.BATCH_SIZE_BUCKETS[-1]}']
+        running = self._pid == os.getpid()
+
+        return {
+            'enabled': Config.BATCH_DISPATCH,
+            'window_ms': self.window_ms,
+            'max_rows': self.max_rows,
+            'queue_depth': self._queue.qsize() if running else 0,
+            'max_queue_depth': self._max_queue_depth,
+            'batches': self._batches,
+            'rows': self._rows,
+            'avg_batch_size': round(self._rows / self._batches, 2) if self._batches else 0,
+            'batch_size_histogram': dict(zip(labels, self._histogram)),
+            'wait_ms': {
+                'p50': round(float(np.percentile(waits, 50)), 3),
+                'p99': round(float(np.percentile(waits, 99)), 3),
+                'max': round(float(waits.max()), 3),
+            },
+            'inference_ms': {
+                'p50': round(float(np.percentile(inference, 50)), 3),
+                'p99': round(float(np.percentile(inference, 99)), 3),
+            },
+        }
+
+
+# Singleton instance
+_dispatcher = None
+
+
+def get_dispatcher() -> MicroBatchDispatcher:
+    """Get or create the singleton dispatcher instance."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = MicroBatchDispatcher()
+    return _dispatcher
@@ -1,20 +1,57 @@
-"""Explainability module using SHAP for credit score explanations."""
+"""Explainability module: exact tree SHAP explanations for credit scores."""
 import numpy as np
 from typing import Dict, List, Any
-import os
-import pickle
-
-try:
-    import shap
-    SHAP_AVAILABLE = True
-except ImportError:
-    SHAP_AVAILABLE = False
 
 from config import Config
+from ml.registry import get_model_registry
+
+
+class NativeContributions:
+    """
+    Exact tree SHAP values from XGBoost's native contribution output.
+
+    booster.predict(pred_contribs=True) runs the same TreeSHAP algorithm
+    that shap.TreeExplainer uses for XGBoost models, for a whole matrix in
+    one call, without importing shap.
+    """
+
+    name = 'native'
+
+    def __init__(self, model):
+        import xgboost  # already loaded to unpickle the model
+
+        self.booster = model.get_booster()
+        self._dmatrix = xgboost.DMatrix
+
+    def contributions(self, scaled: np.ndarray) -> np.ndarray:
+        """Return (n, n_features) SHAP values, in log-odds of default, for scaled rows."""
+        matrix = self._dmatrix(np.asarray(scaled, dtype=np.float32), feature_names=self.booster.feature_names)
+        # The last column is the bias term
+        return self.booster.predict(matrix, pred_contribs=True)[:, :-1]
+
+
+class ShapContributions:
+    """SHAP values from shap.TreeExplainer (imported only when selected)."""
+
+    name = 'shap'
+
+    def __init__(self, model):
+        import shap
+
+        self.explainer = shap.TreeExplainer(model)
+
+    def contributions(self, scaled: np.ndarray) -> np.ndarray:
+        """Return (n, n_features) SHAP values, in log-odds of default, for scaled rows."""
+        shap_values = self.explainer.shap_values(np.asarray(scaled, dtype=np.float64))
+        # Handle different SHAP output formats
+        if isinstance(shap_values, list):
+            # Binary classification: use class 1 (default) values
+            shap_values = shap_values[1] if len(shap_values) > 1 else shap_values[0]
+        return np.asarray(shap_values)
 
 
 class CreditScoreExplainer:
-    """Generate explanations for credit score predictions using SHAP."""
+    """Generate explanations for credit score predictions using tree SHAP values."""
 
     # Human-readable feature names
     FEATURE_DESCRIPTIONS = {
@@ -44,93 +81,122 @@ class CreditScoreExplainer:
         'avg_balance': 'Average account balance'
     }
 
-    def __init__(self):
+    # Contributions turned into factors, by absolute size
+    TOP_FACTORS = 6
+
+    BACKENDS = {'native': NativeContributions, 'shap': ShapContributions}
+
+    def __init__(self, registry=None):
         """Initialize the explainer."""
+        self.registry = registry or get_model_registry()
         self.model = None
         self.scaler = None
-        self.explainer = None
+        self.backend = None
+        self.feature_names = list(self.FEATURE_DESCRIPTIONS)
         self._load_model()
 
     def _load_model(self):
-        """Load model for SHAP explainer."""
+        """Fetch the shared model and scaler and create the contribution backend."""
+        if Config.EXPLAINER_BACKEND == 'heuristic':
+            # Heuristics need neither, so xgboost is not imported for them
+            return
+        self.model = self.registry.get('model')
+        self.scaler = self.registry.get('scaler')
+
+        if self.model is not None and self.scaler is not None:
+            self.backend = self._create_backend(Config.EXPLAINER_BACKEND)
+
+    def _create_backend(self, name: str):
+        """Create the configured contribution backend, or None for heuristics."""
+        if name == 'heuristic':
+            return None
+        if name not in self.BACKENDS:
+            print(f"Unknown explainer backend '{name}', using native.")
+            name = 'native'
         try:
-            with open(Config.MODEL_PATH, 'rb') as f:
-                self.model = pickle.load(f)
-            with open(Config.SCALER_PATH, 'rb') as f:
-                self.scaler = pickle.load(f)
-
-            if SHAP_AVAILABLE and self.model is not None:
-                self.explainer = shap.TreeExplainer(self.model)
-        except FileNotFoundError:
-            pass
+            return self.BACKENDS[name](self.model)
+        except (ImportError, AttributeError) as e:
+            print(f"Explainer backend '{name}' unavailable ({e}), using heuristic explanations.")
+            return None
 
     def explain(self, feature_vector: List[float],
                 feature_values: Dict[str, float],
-                raw_features: Dict[str, float] = None) -> Dict[str, Any]:
+                raw_features: Dict[str, float] = None,
+                scaled_vector: np.ndarray = None) -> Dict[str, Any]:
         """
         Generate explanations for a prediction.
 
         Args:
-            feature_vector: Scaled feature vector used for prediction
+            feature_vector: Unscaled feature vector used for prediction
             feature_values: Original feature values (unscaled)
             raw_features: Raw extracted features for additional context
+            scaled_vector: The same vector already scaled by the predictor,
+                so it is not transformed a second time
 
         Returns:
             Dictionary containing positive and negative factors
         """
-        if SHAP_AVAILABLE and self.explainer is not None:
-            return self._shap_explanation(feature_vector, feature_values, raw_features)
-        else:
+        if self.backend is None:
             return self._heuristic_explanation(feature_values, raw_features)
+        scaled = None if scaled_vector is None else np.asarray(scaled_vector, dtype=np.float64).reshape(1, -1)
+        return self.explain_many([feature_vector], [feature_values], [raw_features], scaled)[0]
 
-    def _shap_explanation(self, feature_vector: List[float],
-                          feature_values: Dict[str, float],
-                          raw_features: Dict[str, float]) -> Dict[str, Any]:
-        """Generate SHAP-based explanation."""
-        # Scale features
-        scaled_vector = self.scaler.transform([feature_vector])
-
-        # Get SHAP values
-        shap_values = self.explainer.shap_values(scaled_vector)
-
-        # Handle different SHAP output formats
-        if isinstance(shap_values, list):
-            # Binary classification: use class 1 (default) values
-            values = shap_values[1][0] if len(shap_values) > 1 else shap_values[0][0]
-        else:
-            values = shap_values[0]
-
-        # Create feature importance pairs
-        feature_names = list(self.FEATURE_DESCRIPTIONS.keys())
-        importance = list(zip(feature_names, values))
-
-        # Sort by absolute importance
-        importance.sort(key=lambda x: abs(x[1]), reverse=True)
-
-        # Split into positive and negative factors
-        # Note: For default prediction, positive SHAP = higher default risk = negative for credit
-        positive_factors = []
-        negative_factors = []
-
-        for feature, value in importance[:6]:  # Top 6 factors
-            description = self.FEATURE_DESCRIPTIONS.get(feature, feature)
-            feature_value = feature_values.get(feature, 0)
-
-            # Format the explanation
-            if value < 0:  # Negative SHAP = reduces default risk = good for credit
-                positive_factors.append(self._format_positive_factor(feature, feature_value, abs(value)))
-            else:  # Positive SHAP = increases default risk = bad for credit
-                negative_factors.append(self._format_negative_factor(feature, feature_value, abs(value)))
+    def explain_many(self, feature_matrix: np.ndarray,
+                     feature_values: List[Dict[str, float]],
+                     raw_features: List[Dict[str, float]],
+                     scaled: np.ndarray = None) -> List[Dict[str, Any]]:
+        """
+        Generate explanations for many predictions with one contribution call.
 
-        # Add raw feature insights if available
-        if raw_features:
-            self._add_raw_feature_insights(positive_factors, negative_factors, raw_features)
+        Args:
+            feature_matrix: (n, n_features) unscaled feature rows
+            feature_values: Per-row feature dicts (unscaled)
+            raw_features: Per-row raw feature dicts
+            scaled: The rows already scaled by the predictor, if available
 
-        return {
-            'positive': positive_factors[:3],
-            'negative': negative_factors[:3],
-            'feature_importance': {feature: float(value) for feature, value in importance}
-        }
+        Returns:
+            One explanation dict per row, as returned by explain()
+        """
+        if self.backend is None:
+            return [self._heuristic_explanation(values, raw)
+                    for values, raw in zip(feature_values, raw_features)]
+
+        if scaled is None:
+            scaled = self.scaler.transform(np.asarray(feature_matrix, dtype=np.float64))
+        contributions = self.backend.contributions(scaled)
+
+        # Features by descending |contribution|; the stable sort keeps ties in
+        # feature order, like the per-row list sort it replaces
+        order = np.argsort(-np.abs(contributions), axis=1, kind='stable')
+        top = order[:, :self.TOP_FACTORS]
+        top_values = np.take_along_axis(contributions, top, axis=1)
+        # Note: for default prediction, positive SHAP = higher default risk = negative for credit
+        reduces_risk = top_values < 0
+
+        names = self.feature_names
+        explanations = []
+        for row in range(len(contributions)):
+            values = feature_values[row]
+            positive_factors = []
+            negative_factors = []
+            for feature_index, value, good in zip(top[row], top_values[row], reduces_risk[row]):
+                feature = names[feature_index]
+                if good:
+                    positive_factors.append(self._format_positive_factor(feature, values.get(feature, 0), abs(value)))
+                else:
+                    negative_factors.append(self._format_negative_factor(feature, values.get(feature, 0), abs(value)))
+
+            # Add raw feature insights if available
+            if raw_features[row]:
+                self._add_raw_feature_insights(positive_factors, negative_factors, raw_features[row])
+
+            row_values = contributions[row].tolist()
+            explanations.append({
+                'positive': positive_factors[:3],
+                'negative': negative_factors[:3],
+                'feature_importance': {names[i]: row_values[i] for i in order[row].tolist()}
+            })
+        return explanations
 
     def _heuristic_explanation(self, feature_values: Dict[str, float],
                                 raw_features: Dict[str, float]) -> Dict[str, Any]:
@@ -240,13 +306,6 @@ class CreditScoreExplainer:
             negative.append("High expense-to-income ratio")
 
 
-# Singleton instance
-_explainer = None
-
-
 def get_explainer() -> CreditScoreExplainer:
-    """Get or create the singleton explainer instance."""
-    global _explainer
-    if _explainer is None:
-        _explainer = CreditScoreExplainer()
-    return _explainer
+    """Get or create the explainer for the current model version."""
+    return get_model_registry().consumer('explainer', CreditScoreExplainer)
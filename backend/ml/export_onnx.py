@@ -0,0 +1,77 @@
+"""
+Export the trained model for the ONNX Runtime inference backend.
+
+Writes Config.ONNX_MODEL_PATH (the XGBoost classifier as an ONNX graph
+taking scaled features) and Config.SCALER_PARAMS_PATH (StandardScaler
+mean/scale, applied by the backend before running the session), then
+checks the exported graph against predict_proba.
+
+Usage (from the backend directory):
+    python ml/export_onnx.py
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from ml.registry import get_model_registry
+
+
+def load_artifacts():
+    """Load model, scaler, and feature names from the model registry."""
+    registry = get_model_registry()
+    return registry.get('model'), registry.get('scaler'), registry.get('feature_names')
+
+
+def export_model(model, n_features, output_path):
+    """Convert the XGBClassifier to ONNX and save it."""
+    import onnx
+    from onnxmltools import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+
+    onnx_model = convert_xgboost(model, initial_types=[('float_input', FloatTensorType([None, n_features]))])
+    onnx.save_model(onnx_model, output_path)
+    print(f"ONNX model saved to: {output_path}")
+
+
+def export_scaler_params(scaler, feature_names, output_path):
+    """Save StandardScaler parameters as JSON."""
+    params = {
+        'mean': scaler.mean_.tolist(),
+        'scale': scaler.scale_.tolist(),
+        'feature_names': list(feature_names)
+    }
+    with open(output_path, 'w') as f:
+        json.dump(params, f, indent=2)
+    print(f"Scaler parameters saved to: {output_path}")
+
+
+def validate(model, scaler, n_samples=2000):
+    """Compare ONNX Runtime probabilities with predict_proba on random rows."""
+    from ml.predictor import OnnxBackend
+
+    backend = OnnxBackend(Config.ONNX_MODEL_PATH, Config.SCALER_PARAMS_PATH)
+    rng = np.random.default_rng(42)
+    rows = scaler.mean_ + rng.normal(size=(n_samples, len(scaler.mean_))) * scaler.scale_
+
+    expected = model.predict_proba(scaler.transform(rows))[:, 1]
+    actual = backend.predict_proba(rows)
+    max_diff = float(np.abs(expected - actual).max())
+    print(f"Max |p_onnx - p_xgboost| over {n_samples} rows: {max_diff:.2e}")
+    return max_diff
+
+
+def main():
+    model, scaler, feature_names = load_artifacts()
+    export_model(model, len(feature_names), Config.ONNX_MODEL_PATH)
+    export_scaler_params(scaler, feature_names, Config.SCALER_PARAMS_PATH)
+    if validate(model, scaler) > 1e-5:
+        raise SystemExit("Exported ONNX model does not match the pickled model")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""Zero-downtime model reload from versioned artifacts."""
+import glob
+import os
+import statistics
+import time
+from datetime import datetime
+from threading import Lock, Thread
+from typing import Dict, List, Any
+
+import numpy as np
+
+from config import Config
+from ml.registry import (ModelRegistry, get_model_registry, swap_model_registry,
+                         read_manifest, write_manifest, verify_checksums)
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions, transactions_to_block
+from ml.predictor import CreditScorePredictor
+from ml.explainer import CreditScoreExplainer
+from ml.counterfactual import CounterfactualGenerator
+from ml.anomaly import AnomalyScorer
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'samples')
+
+# The single and batch extraction paths agree only up to float rounding, and both
+# round P(default) to 4 decimals: allow one rounding step and a one-point score change
+PROBABILITY_TOLERANCE = 1.5e-4
+SCORE_TOLERANCE = 1
+
+# Consumers rebuilt on the new registry before it goes live
+CONSUMERS = {
+    'predictor': CreditScorePredictor,
+    'explainer': CreditScoreExplainer,
+    'counterfactual': CounterfactualGenerator,
+    'anomaly': AnomalyScorer,
+}
+
+
+def load_samples(samples_dir: str = None) -> List[List[Dict[str, Any]]]:
+    """Load the sample transaction CSVs used by the reload smoke test."""
+    applicants = []
+    for path in sorted(glob.glob(os.path.join(samples_dir or SAMPLES_DIR, '*.csv'))):
+        with open(path, 'r') as f:
+            applicants.append(parse_csv_transactions(f.read()))
+    return applicants
+
+
+def smoke_test(registry: ModelRegistry, applicants: List[List[Dict[str, Any]]],
+               reference: ModelRegistry = None) -> Dict[str, Any]:
+    """
+    Check a freshly loaded registry before it serves traffic.
+
+    Every sample must score in range through predict(), the batch path
+    (predict_many) must agree with it within PROBABILITY_TOLERANCE and
+    SCORE_TOLERANCE, the explainer must run, and
+    the median single-applicant latency must stay under
+    Config.RELOAD_MAX_LATENCY_MS.
+
+    Args:
+        registry: Registry to test (consumers are built on it)
+        applicants: Sample transaction lists
+        reference: Currently active registry, to report score changes against
+
+    Returns:
+        Dictionary with 'passed', 'failures' and measurements
+    """
+    extractor = FeatureExtractor()
+    predictor = registry.consumer('predictor', CreditScorePredictor)
+    explainer = registry.consumer('explainer', CreditScoreExplainer)
+    failures = []
+
+    if predictor.backend is None:
+        failures.append('model artifacts did not load')
+
+    scores = []
+    probabilities = []
+    latencies_ms = []
+    for transactions in applicants:
+        start = time.perf_counter()
+        prediction = predictor.predict(extractor.extract_features(transactions))
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        scores.append(prediction['score'])
+        probabilities.append(prediction['probability_of_default'])
+        if not Config.SCORE_MIN <= prediction['score'] <= Config.SCORE_MAX:
+            failures.append(f"score {prediction['score']} out of range")
+        if not 0.0 <= prediction['probability_of_default'] <= 1.0:
+            failures.append(f"probability {prediction['probability_of_default']} out of range")
+
+    if applicants:
+        explainer.explain(prediction['feature_vector'], prediction['feature_values'],
+                          prediction['raw_features'])
+
+        columns, offsets = transactions_to_block(applicants)
+        batch = predictor.predict_many(*extractor.extract_features_many(columns, offsets))
+        probability_diff = np.abs(batch['probability_of_default'] - np.array(probabilities)).max()
+        score_diff = np.abs(batch['score'] - np.array(scores)).max()
+        if probability_diff > PROBABILITY_TOLERANCE or score_diff > SCORE_TOLERANCE:
+            failures.append(f'batch scores differ from single-applicant scores '
+                            f'(probability by {probability_diff:.2e}, score by {score_diff})')
+
+    median_ms = statistics.median(latencies_ms) if latencies_ms else 0.0
+    if median_ms > Config.RELOAD_MAX_LATENCY_MS:
+        failures.append(f"median latency {median_ms:.1f} ms exceeds {Config.RELOAD_MAX_LATENCY_MS} ms")
+
+    result = {
+        'passed': not failures,
+        'failures': failures,
+        'samples': len(applicants),
+        'median_latency_ms': round(median_ms, 2),
+    }
+    if reference is not None and applicants:
+        reference_predictor = reference.consumer('predictor', CreditScorePredictor)
+        reference_scores = [reference_predictor.predict(extractor.extract_features(t))['score']
+                            for t in applicants]
+        result['max_score_change'] = int(np.abs(np.array(scores) - np.array(reference_scores)).max())
+    return result
+
+
+class ModelReloader:
+    """
+    Loads a model version in the background, smoke-tests it and swaps it in.
+
+    A published version whose files do not match the manifest's checksums
+    is rejected before anything is loaded.
+
+    Only one reload runs at a time. The swap replaces the active registry
+    pointer; requests that already pinned the previous registry finish on
+    it, and it is freed once they are done.
+    """
+
+    def __init__(self, artifacts_dir: str = None, samples_dir: str = None):
+        """
+        Initialize the reloader.
+
+        Args:
+            artifacts_dir: Versioned artifacts directory (default: Config.MODEL_ARTIFACTS_DIR)
+            samples_dir: Sample CSVs for the smoke test
+        """
+        self.artifacts_dir = artifacts_dir or Config.MODEL_ARTIFACTS_DIR
+        self.samples_dir = samples_dir or SAMPLES_DIR
+        self.last_result = None
+        self._lock = Lock()
+        self._watcher = None
+        self._failed_versions = set()
+
+    @property
+    def in_progress(self) -> bool:
+        """Whether a reload is currently running."""
+        return self._lock.locked()
+
+    def reload(self, version: str = None, activate: bool = False,
+               background: bool = False) -> Dict[str, Any]:
+        """
+        Load `version` (default: the manifest's active version) and swap it in.
+
+        Args:
+            version: Version directory name to load
+            activate: Also make it the manifest's active version once it passes,
+                so other worker processes follow through their watchers
+            background: Return immediately and reload on a thread
+
+        Returns:
+            Result dictionary ('status' is 'swapped', 'failed', 'busy' or 'started')
+        """
+        if background:
+            if self.in_progress:
+                return {'status': 'busy'}
+            Thread(target=self.reload, args=(version, activate), daemon=True).start()
+            return {'status': 'started', 'version': version}
+
+        if not self._lock.acquire(blocking=False):
+            return {'status': 'busy'}
+        try:
+            result = self._reload(version, activate)
+        finally:
+            self._lock.release()
+
+        self.last_result = result
+        print(f"Model reload: {result['status']} (version {result.get('version')})")
+        return result
+
+    def _reload(self, version: str, activate: bool) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = {'version': version, 'started_at': datetime.utcnow().isoformat()}
+        try:
+            if version is None:
+                version = read_manifest(self.artifacts_dir).get('active')
+            if version:
+                registry = ModelRegistry.for_version(version, self.artifacts_dir)
+                try:
+                    verify_checksums(version, self.artifacts_dir)
+                except ValueError:
+                    self._failed_versions.add(version)
+                    raise
+            else:
+                registry = ModelRegistry()
+            result['version'] = registry.version
+
+            # Load artifacts and build every consumer before going live
+            registry.load_all()
+            for name, factory in CONSUMERS.items():
+                registry.consumer(name, factory)
+
+            current = get_model_registry()
+            result['smoke_test'] = smoke_test(registry, load_samples(self.samples_dir), reference=current)
+            if not result['smoke_test']['passed']:
+                self._failed_versions.add(registry.version)
+                result['status'] = 'failed'
+                result['error'] = '; '.join(result['smoke_test']['failures'])
+                return result
+
+            previous = swap_model_registry(registry)
+            result['previous_version'] = previous.version if previous else None
+            result['status'] = 'swapped'
+            self._failed_versions.discard(registry.version)
+
+            if activate and version:
+                manifest = read_manifest(self.artifacts_dir)
+                manifest['active'] = version
+                write_manifest(manifest, self.artifacts_dir)
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+        finally:
+            result['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def check_manifest(self) -> Dict[str, Any]:
+        """Reload if the manifest's active version differs from the live one."""
+        active = read_manifest(self.artifacts_dir).get('active')
+        if not active or active == get_model_registry().version or active in self._failed_versions:
+            return None
+        return self.reload(active)
+
+    def start_watcher(self, interval: float = None) -> bool:
+        """
+        Poll the manifest on a daemon thread and follow active-version changes.
+
+        Returns:
+            True if a watcher is running
+        """
+        interval = Config.MODEL_WATCH_INTERVAL if interval is None else interval
+        if interval <= 0:
+            return False
+        if self._watcher is not None and self._watcher.is_alive():
+            return True
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check_manifest()
+                except Exception as e:
+                    print(f"Model watcher error: {e}")
+
+        self._watcher = Thread(target=watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        """Return the live version, manifest and last reload result."""
+        return {
+            'active_version': get_model_registry().version,
+            'manifest': read_manifest(self.artifacts_dir),
+            'reload_in_progress': self.in_progress,
+            'watcher_running': self._watcher is not None and self._watcher.is_alive(),
+            'last_reload': self.last_result,
+        }
+
+
+# Singleton instance
+_reloader = None
+
+
+def get_model_reloader() -> ModelReloader:
+    """Get or create the singleton reloader instance."""
+    global _reloader
+    if _reloader is None:
+        _reloader = ModelReloader()
+    return _reloader
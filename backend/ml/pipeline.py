@@ -0,0 +1,415 @@
+"""Shared scoring pipeline behind the citizen and bank endpoints."""
+import hashlib
+import time
+from collections import deque
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, List, Any, Callable, Iterable, Optional
+
+import numpy as np
+
+from config import Config
+from ml.anomaly import AnomalyScorer
+from ml.counterfactual import CounterfactualGenerator
+from ml.explainer import CreditScoreExplainer
+from ml.feature_extractor import FeatureExtractor, transactions_to_block
+from ml.predictor import CreditScorePredictor
+from ml.registry import get_model_registry
+from utils.lru_cache import LRUCache
+from utils.recommendations import get_recommendation_engine
+
+# Stages in execution order; extract and predict always run, cache when enabled
+STAGES = ('extract', 'cache', 'predict', 'anomaly', 'explain', 'counterfactual', 'recommend', 'audit')
+OPTIONAL_STAGES = frozenset({'anomaly', 'explain', 'counterfactual', 'recommend', 'audit'})
+
+# Model-derived stages whose output is kept in the result cache
+CACHED_STAGES = frozenset({'anomaly', 'explain', 'counterfactual'})
+
+# Default stages per audience
+AUDIENCE_STAGES = {
+    'citizen': frozenset({'explain', 'counterfactual', 'recommend', 'audit'}),
+    'bank': frozenset({'anomaly', 'explain', 'recommend', 'audit'}),
+}
+
+# Response field groups each endpoint can return, and the stages each needs
+# (recommendations are built from the explanations and, for citizens, the
+# improvements, so they pull those stages in too)
+FIELD_STAGES = {
+    'citizen': {
+        'score': frozenset(),
+        'explanations': frozenset({'explain'}),
+        'improvements': frozenset({'counterfactual'}),
+        'recommendations': frozenset({'explain', 'counterfactual', 'recommend'}),
+    },
+    'bank': {
+        'score': frozenset(),
+        'factors': frozenset({'explain'}),
+        'anomaly': frozenset({'anomaly'}),
+        'recommendation': frozenset({'explain', 'recommend'}),
+    },
+}
+
+
+def stages_for_fields(audience: str, fields: Iterable[str] = None) -> frozenset:
+    """
+    Return the stages needed to fill the requested response field groups.
+
+    Args:
+        audience: 'citizen' or 'bank'
+        fields: Field groups from FIELD_STAGES[audience] (None: all of them)
+
+    Returns:
+        Optional stages to run, always including the audit stage
+
+    Raises:
+        ValueError: If a field group is unknown for the audience
+    """
+    groups = FIELD_STAGES[audience]
+    if fields is None:
+        return AUDIENCE_STAGES[audience]
+    unknown = set(fields) - set(groups)
+    if unknown:
+        raise ValueError(f"Unknown fields {sorted(unknown)}, expected any of {sorted(groups)}")
+    stages = {'audit'}
+    for name in fields:
+        stages |= groups[name]
+    return frozenset(stages)
+
+
+@dataclass
+class FeatureBatch:
+    """Output of the extract stage: one row per applicant."""
+    feature_matrix: np.ndarray
+    raw_matrix: np.ndarray
+
+
+@dataclass
+class PredictionBatch:
+    """Output of the predict stage, columnar over the batch."""
+    score: np.ndarray
+    category: np.ndarray
+    probability_of_default: np.ndarray
+    rules_fired: np.ndarray
+    scaled_matrix: Optional[np.ndarray]
+    model_version: str
+
+
+@dataclass
+class ApplicantResult:
+    """Everything the pipeline produced for one applicant."""
+    score: int
+    category: str
+    probability_of_default: float
+    features: Dict[str, float]
+    raw_features: Dict[str, float]
+    model_version: str
+    applicant_id: Optional[str] = None
+    anomaly: Optional[Dict[str, Any]] = None
+    explanations: Optional[Dict[str, Any]] = None
+    improvements: Optional[List[Dict[str, Any]]] = None
+    recommendations: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class PipelineResult:
+    """Per-applicant results plus the time spent in each stage."""
+    applicants: List[ApplicantResult]
+    model_version: str
+    timings_ms: Dict[str, float]
+
+
+class ScoringPipeline:
+    """
+    Runs extract -> predict -> anomaly -> explain -> counterfactual ->
+    recommend -> audit for one or many applicants.
+
+    Extraction, prediction, anomaly scoring and explanation are vectorized
+    over the batch. The predictor scales the feature matrix once and the scaled
+    rows are handed to the anomaly scorer and the explainer, which would
+    otherwise each transform them again. Stages a caller does not need are
+    skipped, and the wall time of every stage is returned with the result
+    and kept for the metrics endpoint.
+
+    Prediction, anomaly score, explanation and counterfactuals are cached
+    per applicant, keyed by a hash of the extracted feature rows, the model
+    version and the cached stages requested. A repeated transaction history
+    skips the model, SHAP and counterfactual work; only the rows that miss
+    are scored. The pipeline, and so its cache, belongs to one model
+    version's registry, so a version swap starts from an empty cache.
+    """
+
+    # Recent per-stage timings kept for percentile metrics
+    TIMING_SAMPLES = 2048
+
+    def __init__(self, registry=None):
+        """
+        Initialize the pipeline from the components of one model version.
+
+        Args:
+            registry: ModelRegistry to read artifacts from (default: active one)
+        """
+        registry = registry or get_model_registry()
+        self.extractor = FeatureExtractor()
+        self.predictor = registry.consumer('predictor', CreditScorePredictor)
+        self.explainer = registry.consumer('explainer', CreditScoreExplainer)
+        self.counterfactual = registry.consumer('counterfactual', CounterfactualGenerator)
+        self.anomaly_scorer = registry.consumer('anomaly', AnomalyScorer)
+        self.recommender = get_recommendation_engine()
+        self.cache = LRUCache(Config.RESULT_CACHE_SIZE, Config.RESULT_CACHE_TTL_SECONDS)
+
+        self._lock = Lock()
+        self._runs = 0
+        self._rows = 0
+        self._stage_ms = {stage: deque(maxlen=self.TIMING_SAMPLES) for stage in STAGES}
+
+    @property
+    def model_version(self) -> str:
+        """Version of the model this pipeline scores with."""
+        return self.predictor.model_version
+
+    # Stages
+
+    def extract(self, applicants: List[List[Dict[str, Any]]]) -> FeatureBatch:
+        """Extract model and raw feature rows for every applicant."""
+        if len(applicants) == 1:
+            # One applicant: the per-list path skips building the block offsets
+            features = self.extractor.extract_features(applicants[0])
+            raw = features['_raw_features']
+            return FeatureBatch(
+                np.array([[features[name] for name in self.extractor.MODEL_FEATURES]], dtype=np.float64),
+                np.array([[raw.get(name, 0) for name in self.extractor.RAW_FEATURES]], dtype=np.float64),
+            )
+        columns, offsets = transactions_to_block(applicants)
+        feature_matrix, raw_matrix = self.extractor.extract_features_many(columns, offsets)
+        return FeatureBatch(feature_matrix, raw_matrix)
+
+    def predict(self, features: FeatureBatch) -> PredictionBatch:
+        """Score the batch, keeping the scaled matrix for later stages."""
+        scaled = self.predictor.scale(features.feature_matrix)
+        predictions = self.predictor.predict_many(features.feature_matrix, features.raw_matrix,
+                                                  scaled=scaled, dispatch=True)
+        return PredictionBatch(
+            score=predictions['score'],
+            category=predictions['category'],
+            probability_of_default=predictions['probability_of_default'],
+            rules_fired=predictions['rules_fired'],
+            scaled_matrix=predictions['scaled_matrix'],
+            model_version=predictions['model_version'],
+        )
+
+    def score_anomalies(self, features: FeatureBatch,
+                        prediction: PredictionBatch) -> Optional[List[Dict[str, Any]]]:
+        """Score every row against the anomaly detector (None if unavailable)."""
+        anomalies = self.anomaly_scorer.score_many(features.feature_matrix, prediction.scaled_matrix)
+        if anomalies is None:
+            return None
+        return [{'anomaly_score': float(score), 'is_anomaly': bool(flag)}
+                for score, flag in zip(anomalies['anomaly_score'], anomalies['is_anomaly'])]
+
+    def explain(self, results: List[ApplicantResult], features: FeatureBatch,
+                prediction: PredictionBatch):
+        """Explain the whole batch with one contribution call on the scaled matrix."""
+        explanations = self.explainer.explain_many(
+            features.feature_matrix,
+            [result.features for result in results],
+            [result.raw_features for result in results],
+            scaled=prediction.scaled_matrix)
+        for result, explanation in zip(results, explanations):
+            result.explanations = explanation
+
+    def suggest_improvements(self, result: ApplicantResult):
+        """Attach counterfactual improvement suggestions."""
+        result.improvements = self.counterfactual.generate_improvements(
+            result.features, result.raw_features, result.score)
+
+    def recommend(self, result: ApplicantResult, audience: str):
+        """Attach citizen or bank recommendations."""
+        explanations = result.explanations or {}
+        if audience == 'bank':
+            result.recommendations = self.recommender.generate_bank_recommendations(
+                result.score, result.category, result.probability_of_default,
+                explanations, result.raw_features)
+        else:
+            result.recommendations = self.recommender.generate_citizen_recommendations(
+                result.score, result.category, explanations, result.improvements or [])
+
+    def cache_key(self, feature_row: np.ndarray, raw_row: np.ndarray, stages: Iterable[str]) -> str:
+        """Stable hash of one applicant's feature rows, the model version and the cached stages."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(feature_row, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(raw_row, dtype=np.float64).tobytes())
+        digest.update(f"{self.model_version}|{','.join(sorted(stages))}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def lookup(self, features: FeatureBatch, stages: Iterable[str]):
+        """Return (keys, cached entries or None) for every row."""
+        keys = [self.cache_key(feature_row, raw_row, stages)
+                for feature_row, raw_row in zip(features.feature_matrix, features.raw_matrix)]
+        return keys, [self.cache.get(key) for key in keys]
+
+    # Driver
+
+    def run(self, applicants: List[List[Dict[str, Any]]], audience: str = 'citizen',
+            stages: Iterable[str] = None,
+            audit: Callable[[ApplicantResult], None] = None,
+            applicant_ids: List[str] = None,
+            row_errors: bool = False) -> PipelineResult:
+        """
+        Score applicants through the pipeline.
+
+        Args:
+            applicants: One non-empty transaction list per applicant
+            audience: 'citizen' or 'bank'; picks the default stages and the
+                recommendations built by the recommend stage
+            stages: Optional stages to run (default: AUDIENCE_STAGES[audience]);
+                extract and predict always run
+            audit: Called with each scored applicant in the audit stage
+            applicant_ids: Optional IDs, copied onto the matching results
+            row_errors: Record a failure in a per-applicant stage on that
+                applicant's result instead of raising
+
+        Returns:
+            PipelineResult with results in input order and per-stage timings
+        """
+        if audience not in AUDIENCE_STAGES:
+            raise ValueError(f"Unknown audience '{audience}', expected one of {tuple(AUDIENCE_STAGES)}")
+        stages = AUDIENCE_STAGES[audience] if stages is None else frozenset(stages)
+        unknown = stages - OPTIONAL_STAGES - {'extract', 'predict'}
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages {sorted(unknown)}")
+        if audit is None:
+            stages = stages - {'audit'}
+
+        timings = {}
+
+        def timed(stage, fn, *args):
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+        if not applicants:
+            return PipelineResult([], self.model_version, timings)
+
+        features = timed('extract', self.extract, applicants)
+
+        cached_stages = stages & CACHED_STAGES
+        keys, cached = None, [None] * len(applicants)
+        if self.cache.enabled:
+            keys, cached = timed('cache', self.lookup, features, cached_stages)
+
+        names = self.extractor.MODEL_FEATURES
+        raw_names = self.extractor.RAW_FEATURES
+        feature_rows = features.feature_matrix.tolist()
+        raw_rows = features.raw_matrix.tolist()
+
+        def new_result(row, **outputs):
+            return ApplicantResult(
+                features=dict(zip(names, feature_rows[row])),
+                raw_features=dict(zip(raw_names, raw_rows[row])),
+                applicant_id=applicant_ids[row] if applicant_ids else None,
+                **outputs
+            )
+
+        results = [None if entry is None else new_result(row, **entry) for row, entry in enumerate(cached)]
+        misses = [row for row, entry in enumerate(cached) if entry is None]
+        model_version = self.model_version
+
+        if misses:
+            if len(misses) < len(applicants):
+                features = FeatureBatch(features.feature_matrix[misses], features.raw_matrix[misses])
+            prediction = timed('predict', self.predict, features)
+            anomalies = timed('anomaly', self.score_anomalies, features, prediction) if 'anomaly' in stages else None
+            model_version = prediction.model_version
+
+            for i, row in enumerate(misses):
+                results[row] = new_result(
+                    row,
+                    score=int(prediction.score[i]),
+                    category=str(prediction.category[i]),
+                    probability_of_default=float(prediction.probability_of_default[i]),
+                    model_version=prediction.model_version,
+                    anomaly=anomalies[i] if anomalies is not None else None,
+                )
+            fresh = [results[row] for row in misses]
+
+            if 'explain' in stages:
+                try:
+                    timed('explain', self.explain, fresh, features, prediction)
+                except Exception as e:
+                    if not row_errors:
+                        raise
+                    for result in fresh:
+                        result.error = str(e)
+
+            for row, result in zip(misses, fresh):
+                if result.error is not None:
+                    continue
+                try:
+                    if 'counterfactual' in stages:
+                        timed('counterfactual', self.suggest_improvements, result)
+                except Exception as e:
+                    if not row_errors:
+                        raise
+                    result.error = str(e)
+                    continue
+                if keys is not None:
+                    self.cache.put(keys[row], {
+                        'score': result.score,
+                        'category': result.category,
+                        'probability_of_default': result.probability_of_default,
+                        'model_version': result.model_version,
+                        'anomaly': result.anomaly,
+                        'explanations': result.explanations,
+                        'improvements': result.improvements,
+                    })
+
+        for result in results:
+            if result.error is not None:
+                continue
+            try:
+                if 'recommend' in stages:
+                    timed('recommend', self.recommend, result, audience)
+                if 'audit' in stages:
+                    timed('audit', audit, result)
+            except Exception as e:
+                if not row_errors:
+                    raise
+                result.error = str(e)
+
+        self._record(len(applicants), timings)
+        return PipelineResult(results, model_version,
+                              {stage: round(ms, 3) for stage, ms in timings.items()})
+
+    def _record(self, rows: int, timings: Dict[str, float]):
+        with self._lock:
+            self._runs += 1
+            self._rows += rows
+            for stage, ms in timings.items():
+                self._stage_ms[stage].append(ms)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return run counts and per-stage latency percentiles for this worker."""
+        stages = {}
+        for stage in STAGES:
+            samples = np.array(self._stage_ms[stage])
+            if samples.size:
+                stages[stage] = {
+                    'samples': int(samples.size),
+                    'p50': round(float(np.percentile(samples, 50)), 3),
+                    'p99': round(float(np.percentile(samples, 99)), 3),
+                }
+        return {
+            'model_version': self.model_version,
+            'runs': self._runs,
+            'rows': self._rows,
+            'stage_ms': stages,
+            'cache': self.cache.metrics(),
+        }
+
+
+def get_scoring_pipeline() -> ScoringPipeline:
+    """Get or create the scoring pipeline for the current model version."""
+    return get_model_registry().consumer('pipeline', ScoringPipeline)
@@ -1,43 +1,154 @@
 """Credit score prediction module."""
 import os
-import pickle
+import json
 import numpy as np
 from typing import Dict, Any, Tuple
 
 from config import Config
+from ml.dispatcher import get_dispatcher
+from ml.registry import get_model_registry
+from ml.score_rules import ScoreCapRules
+from ml.tree_ensemble import CompiledTreeEnsemble
+
+
+class XGBoostBackend:
+    """Inference backend using the pickled StandardScaler and XGBClassifier."""
+
+    name = 'xgboost'
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+        # StandardScaler.transform is (X - mean_) / scale_ in float64; doing the
+        # arithmetic directly skips sklearn's per-call input validation
+        self.mean = getattr(scaler, 'mean_', None)
+        self.scale = getattr(scaler, 'scale_', None)
+
+    def transform(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Scale an unscaled feature matrix the way the model was trained."""
+        if self.mean is None or self.scale is None:
+            return self.scaler.transform(feature_matrix)
+        return (np.asarray(feature_matrix, dtype=np.float64) - self.mean) / self.scale
+
+    def predict_proba_scaled(self, scaled: np.ndarray) -> np.ndarray:
+        """Return P(default) for each row of an already scaled feature matrix."""
+        return self.model.predict_proba(scaled)[:, 1].astype(np.float64)
+
+    def predict_proba(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Return P(default) for each row of an unscaled feature matrix."""
+        return self.predict_proba_scaled(self.transform(feature_matrix))
+
+
+class OnnxBackend:
+    """
+    Inference backend using one shared ONNX Runtime InferenceSession.
+
+    The scaler is applied outside the graph from precomputed mean/scale
+    arrays. Scaling is done in float64 and cast to float32 once, which is
+    exactly what sklearn + XGBoost do, so split decisions match the
+    pickled model.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path: str, scaler_params_path: str,
+                 intra_op_threads: int = 1):
+        import onnxruntime as ort
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(model_path)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        output_names = [output.name for output in self.session.get_outputs()]
+        self.output_name = 'probabilities' if 'probabilities' in output_names else output_names[-1]
+
+        with open(scaler_params_path, 'r') as f:
+            params = json.load(f)
+        self.mean = np.array(params['mean'], dtype=np.float64)
+        self.scale = np.array(params['scale'], dtype=np.float64)
+
+    def transform(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Scale an unscaled feature matrix (float64, like the StandardScaler)."""
+        return (np.asarray(feature_matrix, dtype=np.float64) - self.mean) / self.scale
+
+    def predict_proba_scaled(self, scaled: np.ndarray) -> np.ndarray:
+        """Return P(default) for each row of an already scaled feature matrix."""
+        probabilities = self.session.run([self.output_name], {self.input_name: scaled.astype(np.float32)})[0]
+        return np.asarray(probabilities)[:, 1].astype(np.float64)
+
+    def predict_proba(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Return P(default) for each row of an unscaled feature matrix."""
+        return self.predict_proba_scaled(self.transform(feature_matrix))
 
 
 class CreditScorePredictor:
     """Predicts credit score from features."""
 
-    def __init__(self):
-        """Initialize the predictor with trained model and scaler."""
+    def __init__(self, registry=None):
+        """
+        Initialize the predictor with trained model and scaler.
+
+        Args:
+            registry: ModelRegistry to read artifacts from (default: active one)
+        """
+        self.registry = registry or get_model_registry()
+        self.model_version = self.registry.version
         self.model = None
         self.scaler = None
         self.feature_names = None
-        self._load_model()
+        self.backend = self._load_trees() if Config.INFERENCE_BACKEND == 'trees' else None
+        if self.backend is not None:
+            # The compiled trees carry the scaler's mean/scale and the feature
+            # order, so the pickled booster (and xgboost) is never loaded
+            self.feature_names = list(self.backend.feature_names)
+        else:
+            self._load_model()
+            self.backend = self._create_backend(Config.INFERENCE_BACKEND)
+        self.rules = ScoreCapRules(feature_names=self.feature_names)
+
+    def _create_backend(self, name: str):
+        """Create the configured inference backend, falling back to XGBoost."""
+        if name == 'onnx':
+            try:
+                return OnnxBackend(self.registry.path('onnx_model'), self.registry.path('scaler_params'),
+                                   Config.ONNX_INTRA_OP_THREADS)
+            except (ImportError, FileNotFoundError) as e:
+                print(f"ONNX backend unavailable ({e}), falling back to xgboost.")
+                print("Install onnxruntime and run ml/export_onnx.py to enable it.")
+        elif name not in ('xgboost', 'trees'):
+            print(f"Unknown inference backend '{name}', using xgboost.")
 
-    def _load_model(self):
-        """Load the trained model and scaler from disk."""
-        try:
-            with open(Config.MODEL_PATH, 'rb') as f:
-                self.model = pickle.load(f)
+        if self.model is None:
+            return None
+        return XGBoostBackend(self.model, self.scaler)
 
-            with open(Config.SCALER_PATH, 'rb') as f:
-                self.scaler = pickle.load(f)
+    def _load_trees(self):
+        """Load the compiled trees, or None to fall back to the pickled model."""
+        try:
+            return CompiledTreeEnsemble.load(self.registry.path('trees'))
+        except FileNotFoundError as e:
+            print(f"Compiled trees unavailable ({e}), falling back to xgboost.")
+            print("Run ml/compile_trees.py to enable it.")
+            return None
 
-            feature_names_path = Config.MODEL_PATH.replace('model.pkl', 'feature_names.pkl')
-            with open(feature_names_path, 'rb') as f:
-                self.feature_names = pickle.load(f)
+    def _load_model(self):
+        """Fetch the trained model, scaler and feature names from the registry."""
+        self.model = self.registry.get('model')
+        self.scaler = self.registry.get('scaler')
+        self.feature_names = self.registry.get('feature_names')
 
-        except FileNotFoundError as e:
-            print(f"Model files not found: {e}")
+        if self.model is None or self.scaler is None or self.feature_names is None:
             print("Please run train_model.py first.")
             self.model = None
             self.scaler = None
             self.feature_names = ['LIMIT_BAL', 'AGE', 'PAY_0', 'PAY_2', 'PAY_3',
-                                   'BILL_AMT1', 'BILL_AMT2', 'BILL_AMT3',
-                                   'PAY_AMT1', 'PAY_AMT2', 'PAY_AMT3']
+                                  'BILL_AMT1', 'BILL_AMT2', 'BILL_AMT3',
+                                  'PAY_AMT1', 'PAY_AMT2', 'PAY_AMT3']
 
     def predict(self, features: Dict[str, float]) -> Dict[str, Any]:
         """
@@ -59,71 +170,143 @@ class CreditScorePredictor:
         # Prepare feature vector
         feature_vector = self._prepare_feature_vector(features)
 
-        if self.model is None:
+        if self.backend is None:
             # Return mock prediction if model not loaded
             return self._mock_prediction(features, raw_features)
 
-        # Scale features
-        feature_vector_scaled = self.scaler.transform([feature_vector])
-
-        # Get default probability
-        default_prob = float(self.model.predict_proba(feature_vector_scaled)[0][1])
+        # Get default probability (the backend scales features itself);
+        # concurrent requests can share one batched call through the dispatcher
+        if Config.BATCH_DISPATCH:
+            default_prob = get_dispatcher().predict_proba(self.backend, feature_vector)
+        else:
+            default_prob = float(self.backend.predict_proba(np.array([feature_vector], dtype=np.float64))[0])
 
         # Convert to credit score (inverse of default probability)
         score = self._probability_to_score(default_prob)
 
-        # Business Logic Overrides:
-        # Ensure logical consistency - Late payments should prevent "Good" scores
-        pay_status = features.get('PAY_0', 0)
-        
-        if pay_status > 0:
-            # If late (status 1+), cap at 660 (Start of Good range is 670)
-            score = min(score, 660)
-            
-        if pay_status >= 2:
-            # If 2+ months late, cap at 579 (End of Poor range is 579)
-            score = min(score, 579)
-
-        # Determine risk category
-        category = self._get_risk_category(score)
+        # Business Logic Overrides (rule table in ml/score_rules.py)
+        score, rules_fired = self.rules.apply_one(score, features, raw_features)
 
         # Convert all numpy types to Python native types for JSON serialization
         clean_features = {k: float(v) if hasattr(v, 'item') else v for k, v in features.items()}
         clean_raw = {k: float(v) if hasattr(v, 'item') else v for k, v in raw_features.items()}
         clean_vector = [float(x) if hasattr(x, 'item') else x for x in feature_vector]
 
-        if pay_status >= 2:
-            # If 2+ months late, cap at 579 (End of Poor range is 579)
-            score = min(score, 579)
-
-        # Overdraft Penalties
-        overdraft_freq = raw_features.get('overdraft_frequency', 0)
-        if overdraft_freq > 0.2:
-            score = min(score, 550) # Very high risk
-        elif overdraft_freq > 0.1:
-            score = min(score, 620) # Fair only
-        elif overdraft_freq > 0:
-            score = min(score, 740) # Cannot be Excellent
-
-        # Volatility Penalties
-        volatility = raw_features.get('transaction_volatility', 0)
-        if volatility > 1.0:
-            score = min(score, 720) # Stable income is preferred
-
-        # Expense Ratio Penalties
-        expense_ratio = raw_features.get('expense_ratio', 0)
-        if expense_ratio > 0.95:
-             score = min(score, 650) # Living paycheck to paycheck
-
         return {
             'score': int(score),
             'category': self._get_risk_category(score),
             'probability_of_default': round(float(default_prob), 4),
             'feature_values': clean_features,
             'raw_features': clean_raw,
-            'feature_vector': clean_vector
+            'feature_vector': clean_vector,
+            'rules_fired': rules_fired,
+            'model_version': self.model_version
         }
 
+    def scale(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """
+        Scale a feature matrix with the active backend's scaler.
+
+        Returns:
+            (n, n_features) float64 scaled matrix, or None without a model
+        """
+        if self.backend is None:
+            return None
+        return self.backend.transform(np.asarray(feature_matrix, dtype=np.float64))
+
+    def predict_many(self, feature_matrix: np.ndarray,
+                     raw_matrix: np.ndarray,
+                     scaled: np.ndarray = None,
+                     dispatch: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Predict credit scores for many applicants at once.
+
+        Runs one scaler transform and one backend inference call over the whole
+        matrix and applies the business-rule caps in one vectorized pass.
+
+        Args:
+            feature_matrix: (n, n_features) model features in feature_names order
+            raw_matrix: (n, n_raw) raw features in FeatureExtractor.RAW_FEATURES order
+            scaled: The matrix already passed through scale(), if the caller has it
+            dispatch: Send a single row through the micro-batch dispatcher
+                (when BATCH_DISPATCH is on) so concurrent requests share a call
+
+        Returns:
+            Dictionary of columnar results:
+                - score: int array of credit scores (300-850)
+                - category: object array of risk categories
+                - probability_of_default: float array rounded to 4 decimals
+                - rules_fired: (n, n_rules) boolean matrix, columns in rules.names order
+                - feature_matrix / raw_matrix: the inputs, as float arrays
+                - scaled_matrix: the scaled features (None without a model)
+                - model_version: version of the model that scored the batch
+        """
+        feature_matrix = np.asarray(feature_matrix, dtype=np.float64)
+        raw_matrix = np.asarray(raw_matrix, dtype=np.float64)
+
+        if self.backend is None:
+            default_prob = self._mock_probability_many(feature_matrix)
+        elif dispatch and Config.BATCH_DISPATCH and len(feature_matrix) == 1:
+            default_prob = np.array([get_dispatcher().predict_proba(self.backend, feature_matrix[0].tolist())])
+            if scaled is None:
+                scaled = self.backend.transform(feature_matrix)
+        else:
+            if scaled is None:
+                scaled = self.backend.transform(feature_matrix)
+            default_prob = self.backend.predict_proba_scaled(scaled)
+
+        scores, categories, rules_fired = self.score_probabilities(default_prob, feature_matrix, raw_matrix)
+
+        return {
+            'score': scores,
+            'category': categories,
+            'probability_of_default': np.round(default_prob, 4),
+            'rules_fired': rules_fired,
+            'feature_matrix': feature_matrix,
+            'raw_matrix': raw_matrix,
+            'scaled_matrix': scaled,
+            'model_version': self.model_version
+        }
+
+    def score_probabilities(self, default_prob: np.ndarray, feature_matrix: np.ndarray,
+                            raw_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Turn default probabilities into capped scores and risk categories.
+
+        Args:
+            default_prob: (n,) probabilities of default from any backend
+            feature_matrix: (n, n_features) model features the rules read
+            raw_matrix: (n, n_raw) raw features the rules read
+
+        Returns:
+            Tuple of (scores, categories, (n, n_rules) fired matrix)
+        """
+        scores = self._probability_to_score_many(np.asarray(default_prob))
+        scores, rules_fired = self.rules.apply(scores, feature_matrix, raw_matrix)
+        return scores, self._get_risk_category_many(scores), rules_fired
+
+    def _probability_to_score_many(self, default_prob: np.ndarray) -> np.ndarray:
+        """Vectorized _probability_to_score (round half to even, like round())."""
+        scores = Config.SCORE_MIN + (1 - default_prob) * (Config.SCORE_MAX - Config.SCORE_MIN)
+        return np.rint(scores).astype(np.int64)
+
+    def _get_risk_category_many(self, scores: np.ndarray) -> np.ndarray:
+        """Map scores to risk categories with a binary search over range floors."""
+        ranges = sorted(Config.RISK_CATEGORIES.items(), key=lambda item: item[1][0])
+        floors = np.array([min_score for _, (min_score, _) in ranges])
+        names = np.array([name for name, _ in ranges], dtype=object)
+        idx = np.searchsorted(floors, scores, side='right') - 1
+        return names[np.clip(idx, 0, len(names) - 1)]
+
+    def _mock_probability_many(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Vectorized default probability heuristic used by _mock_prediction."""
+        col = {name: feature_matrix[:, i] for i, name in enumerate(self.feature_names)}
+        pay_risk = np.maximum(0, col['PAY_0']) / 6
+        utilization = col['BILL_AMT1'] / (col['LIMIT_BAL'] + 1)
+        payment_ratio = col['PAY_AMT1'] / (col['BILL_AMT1'] + 1)
+        default_prob = (pay_risk * 0.4 + utilization * 0.3 + (1 - np.minimum(payment_ratio, 1)) * 0.3)
+        return np.clip(default_prob, 0.05, 0.95)
+
     def _prepare_feature_vector(self, features: Dict[str, float]) -> list:
         """Prepare feature vector in correct order for model."""
         return [features.get(name, 0) for name in self.feature_names]
@@ -172,6 +355,7 @@ class CreditScorePredictor:
         default_prob = min(max(default_prob, 0.05), 0.95)
 
         score = self._probability_to_score(default_prob)
+        score, rules_fired = self.rules.apply_one(score, features, raw_features)
         category = self._get_risk_category(score)
 
         return {
@@ -180,17 +364,12 @@ class CreditScorePredictor:
             'probability_of_default': round(default_prob, 4),
             'feature_values': features,
             'raw_features': raw_features,
-            'feature_vector': self._prepare_feature_vector(features)
+            'feature_vector': self._prepare_feature_vector(features),
+            'rules_fired': rules_fired,
+            'model_version': self.model_version
         }
 
 
-# Singleton instance
-_predictor = None
-
-
 def get_predictor() -> CreditScorePredictor:
-    """Get or create the singleton predictor instance."""
-    global _predictor
-    if _predictor is None:
-        _predictor = CreditScorePredictor()
-    return _predictor
+    """Get or create the predictor for the current model version."""
+    return get_model_registry().consumer('predictor', CreditScorePredictor)
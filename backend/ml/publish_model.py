@@ -0,0 +1,83 @@
+"""
+Publish trained artifacts as a new model version.
+
+Copies model.pkl, scaler.pkl, feature_names.pkl and anomaly_detector.pkl
+(plus model.onnx, scaler_params.json and model_trees.npz when present) from
+data/ into Config.MODEL_ARTIFACTS_DIR/<version>/ and records the version,
+with file checksums, in the manifest. With --activate the manifest's active
+version is switched too; running workers pick it up through their model
+watcher, or immediately via POST /api/admin/models/reload.
+
+Usage (from the backend directory):
+    python ml/publish_model.py [--version NAME] [--activate]
+"""
+import argparse
+import os
+import shutil
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from ml.registry import ModelRegistry, file_sha256, read_manifest, write_manifest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+
+def publish(version: str = None, activate: bool = False, source_dir: str = DATA_DIR,
+            artifacts_dir: str = None) -> str:
+    """
+    Copy the artifacts in `source_dir` into a new version directory.
+
+    Returns:
+        The published version name
+    """
+    artifacts_dir = artifacts_dir or Config.MODEL_ARTIFACTS_DIR
+    version = version or datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    version_dir = os.path.join(artifacts_dir, version)
+    if os.path.exists(version_dir):
+        raise SystemExit(f"Version already exists: {version_dir}")
+
+    required = list(ModelRegistry.ARTIFACT_FILES.values())
+    optional = list(ModelRegistry.EXTRA_FILES.values())
+    missing = [f for f in required if not os.path.exists(os.path.join(source_dir, f))]
+    if missing:
+        raise SystemExit(f"Missing artifacts in {source_dir}: {', '.join(missing)}")
+
+    # Copy into a temporary directory first so a version never appears half-written
+    tmp_dir = version_dir + '.tmp'
+    os.makedirs(tmp_dir)
+    files = {}
+    for filename in required + optional:
+        source = os.path.join(source_dir, filename)
+        if os.path.exists(source):
+            shutil.copy2(source, os.path.join(tmp_dir, filename))
+            files[filename] = file_sha256(source)
+    os.replace(tmp_dir, version_dir)
+
+    manifest = read_manifest(artifacts_dir)
+    manifest.setdefault('versions', {})[version] = {
+        'created_at': datetime.utcnow().isoformat(),
+        'files': files,
+    }
+    if activate or not manifest.get('active'):
+        manifest['active'] = version
+    write_manifest(manifest, artifacts_dir)
+
+    print(f"Published model version {version} to {version_dir}")
+    if manifest['active'] == version:
+        print(f"Active version is now {version}")
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish trained artifacts as a model version')
+    parser.add_argument('--version', help='Version name (default: UTC timestamp)')
+    parser.add_argument('--activate', action='store_true', help='Make it the active version')
+    args = parser.parse_args()
+    publish(args.version, args.activate)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""Shared registry of trained model artifacts."""
+import hashlib
+import json
+import os
+import pickle
+import time
+from contextvars import ContextVar
+from threading import Lock, RLock
+from typing import Dict, Any, Callable, Set
+
+from config import Config
+
+
+def _rss_bytes() -> int:
+    """Return the current resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        # No procfs (e.g. macOS): fall back to peak RSS, reported in bytes there
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return 0
+
+
+class ModelRegistry:
+    """
+    Loads each pickled artifact once and hands out the same object.
+
+    The predictor, explainer, counterfactual generator and anomaly scorer
+    all read from one registry, so a worker holds a single copy of the
+    booster and scaler. Load time and RSS growth are recorded per artifact.
+
+    A registry is bound to one model version. Reloading builds a new
+    registry (and new consumers on top of it) and swaps the active pointer;
+    requests already holding the old registry finish on it.
+    """
+
+    # Pickled artifacts, by registry name
+    ARTIFACT_FILES = {
+        'model': 'model.pkl',
+        'scaler': 'scaler.pkl',
+        'feature_names': 'feature_names.pkl',
+        'anomaly_detector': 'anomaly_detector.pkl',
+    }
+
+    # Derived (non-pickle) artifacts used by alternative inference backends
+    EXTRA_FILES = {
+        'onnx_model': 'model.onnx',
+        'scaler_params': 'scaler_params.json',
+        'trees': 'model_trees.npz',
+    }
+
+    def __init__(self, paths: Dict[str, str] = None, version: str = None,
+                 files: Dict[str, str] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            paths: Mapping of artifact name to pickle path
+            version: Model version label (derived from model.pkl if omitted)
+            files: Mapping of derived artifact name to path
+        """
+        self.paths = paths or {
+            'model': Config.MODEL_PATH,
+            'scaler': Config.SCALER_PATH,
+            'feature_names': Config.FEATURE_NAMES_PATH,
+            'anomaly_detector': Config.ANOMALY_DETECTOR_PATH,
+        }
+        self.files = files or {
+            'onnx_model': Config.ONNX_MODEL_PATH,
+            'scaler_params': Config.SCALER_PARAMS_PATH,
+            'trees': Config.TREES_MODEL_PATH,
+        }
+        self.version = version or self._legacy_version()
+        self._artifacts = {}
+        self._stats = {}
+        self._consumers = {}
+        self._lock = Lock()
+        # Reentrant: a consumer (the scoring pipeline) may build other consumers
+        self._consumer_lock = RLock()
+
+    @classmethod
+    def for_version(cls, version: str, artifacts_dir: str = None) -> 'ModelRegistry':
+        """Create a registry for one version directory under the artifacts dir."""
+        version_dir = os.path.join(artifacts_dir or Config.MODEL_ARTIFACTS_DIR, version)
+        if not os.path.isdir(version_dir):
+            raise FileNotFoundError(f"Model version directory not found: {version_dir}")
+        return cls(
+            paths={name: os.path.join(version_dir, f) for name, f in cls.ARTIFACT_FILES.items()},
+            version=version,
+            files={name: os.path.join(version_dir, f) for name, f in cls.EXTRA_FILES.items()},
+        )
+
+    @classmethod
+    def from_manifest(cls, artifacts_dir: str = None) -> 'ModelRegistry':
+        """
+        Create a registry for the manifest's active version.
+
+        Falls back to the flat files in data/ when there is no manifest.
+        """
+        manifest = read_manifest(artifacts_dir)
+        if manifest.get('active'):
+            return cls.for_version(manifest['active'], artifacts_dir)
+        return cls()
+
+    def _legacy_version(self) -> str:
+        """Label unversioned artifacts by a hash of the model file."""
+        try:
+            return 'legacy-' + file_sha256(self.paths['model'])[:12]
+        except (OSError, KeyError):
+            return 'untrained'
+
+    def get(self, name: str) -> Any:
+        """
+        Return an artifact, loading it on first use.
+
+        Returns:
+            The unpickled object, or None if the file does not exist
+        """
+        if name in self._artifacts:
+            return self._artifacts[name]
+
+        with self._lock:
+            if name not in self._artifacts:
+                self._artifacts[name] = self._load(name)
+            return self._artifacts[name]
+
+    def path(self, name: str) -> str:
+        """Return the path of a derived artifact (ONNX model, compiled trees, ...)."""
+        return self.files[name]
+
+    def consumer(self, name: str, factory: Callable[['ModelRegistry'], Any]) -> Any:
+        """
+        Return the object built on this registry under `name`, creating it once.
+
+        Args:
+            name: Consumer key (e.g. 'predictor')
+            factory: Called with this registry to build the consumer
+        """
+        if name in self._consumers:
+            return self._consumers[name]
+
+        with self._consumer_lock:
+            if name not in self._consumers:
+                self._consumers[name] = factory(self)
+            return self._consumers[name]
+
+    def _load(self, name: str) -> Any:
+        """Unpickle one artifact and record its load time and memory."""
+        path = self.paths[name]
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                artifact = pickle.load(f)
+        except FileNotFoundError:
+            print(f"Model artifact not found: {path}")
+            self._stats[name] = {'status': 'not_found', 'file': os.path.basename(path)}
+            return None
+
+        self._stats[name] = {
+            'status': 'loaded',
+            'file': os.path.basename(path),
+            'file_size_mb': round(os.path.getsize(path) / 2**20, 3),
+            'load_ms': round((time.perf_counter() - start) * 1000, 2),
+            'rss_delta_mb': round(max(_rss_bytes() - rss_before, 0) / 2**20, 3),
+        }
+        return artifact
+
+    def unused(self) -> Set[str]:
+        """
+        Return the pickled artifacts no configured backend reads.
+
+        With INFERENCE_BACKEND=trees the predictor scores from the compiled
+        trees alone, so the booster is only needed by the native or SHAP
+        explainer. Skipping it keeps xgboost out of the process.
+        """
+        if (Config.INFERENCE_BACKEND == 'trees' and Config.EXPLAINER_BACKEND == 'heuristic'
+                and os.path.exists(self.files['trees'])):
+            return {'model'}
+        return set()
+
+    def load_all(self) -> 'ModelRegistry':
+        """Eagerly load every artifact the backends use (e.g. before serving traffic)."""
+        unused = self.unused()
+        for name in self.paths:
+            if name in unused and name not in self._artifacts:
+                self._stats[name] = {'status': 'skipped', 'file': os.path.basename(self.paths[name])}
+            else:
+                self.get(name)
+        return self
+
+    def status(self, name: str) -> str:
+        """Return 'loaded', 'not_found', 'skipped' or 'not_loaded' for an artifact."""
+        return self._stats.get(name, {}).get('status', 'not_loaded')
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-artifact load statistics."""
+        return {name: dict(self._stats.get(name, {'status': 'not_loaded'}))
+                for name in self.paths}
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_checksums(version: str, artifacts_dir: str = None):
+    """
+    Check the files of a published version against the manifest's checksums.
+
+    Raises:
+        ValueError: If a listed file is missing or its SHA-256 differs
+    """
+    artifacts_dir = artifacts_dir or Config.MODEL_ARTIFACTS_DIR
+    files = read_manifest(artifacts_dir).get('versions', {}).get(version, {}).get('files', {})
+    for filename, expected in files.items():
+        path = os.path.join(artifacts_dir, version, filename)
+        if not os.path.exists(path):
+            raise ValueError(f"Model version {version} is missing {filename} listed in the manifest")
+        actual = file_sha256(path)
+        if actual != expected:
+            raise ValueError(f"Checksum mismatch for {filename} in model version {version}: "
+                             f"manifest has {expected[:12]}, file has {actual[:12]}")
+
+
+def manifest_path(artifacts_dir: str = None) -> str:
+    """Return the path of the versioned-artifact manifest."""
+    return os.path.join(artifacts_dir or Config.MODEL_ARTIFACTS_DIR, 'manifest.json')
+
+
+def read_manifest(artifacts_dir: str = None) -> Dict[str, Any]:
+    """Read the manifest, or return an empty one if it does not exist."""
+    try:
+        with open(manifest_path(artifacts_dir), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'active': None, 'versions': {}}
+
+
+def write_manifest(manifest: Dict[str, Any], artifacts_dir: str = None):
+    """Atomically replace the manifest."""
+    path = manifest_path(artifacts_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# Active registry, swapped atomically on reload
+_registry = None
+_registry_lock = Lock()
+
+# Registry pinned for the duration of one request
+_pinned_registry = ContextVar('pinned_registry', default=None)
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Return the registry pinned to the current request, or the active one.
+
+    The active registry is created from the manifest on first use.
+    """
+    pinned = _pinned_registry.get()
+    if pinned is not None:
+        return pinned
+
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry.from_manifest()
+    return _registry
+
+
+def swap_model_registry(registry: ModelRegistry) -> ModelRegistry:
+    """Make `registry` the active one and return the previous registry."""
+    global _registry
+    with _registry_lock:
+        previous, _registry = _registry, registry
+    return previous
+
+
+def pin_model_registry():
+    """Pin the active registry for the current request; returns a reset token."""
+    return _pinned_registry.set(get_model_registry())
+
+
+def unpin_model_registry(token):
+    """Release a registry pinned with pin_model_registry()."""
+    _pinned_registry.reset(token)
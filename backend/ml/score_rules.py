@@ -0,0 +1,144 @@
+"""Declarative business-rule overrides that cap credit scores."""
+import numpy as np
+from typing import Dict, List, Any, Tuple
+
+from config import Config
+from ml.feature_extractor import FeatureExtractor
+
+
+class ScoreCapRules:
+    """
+    Compiled table of score caps.
+
+    Each rule is (name, feature, comparator, threshold, cap): when the
+    feature satisfies the comparison the score is capped at `cap`. Rules are
+    compiled once into NumPy arrays, so one row or a million rows are
+    evaluated in a single pass. Because every rule is a cap, all matching
+    rules can fire together and the lowest cap wins.
+    """
+
+    # Default policy: keeps scores logically consistent with risk signals
+    DEFAULT_RULES = [
+        # Late payments should prevent "Good" scores (Good starts at 670)
+        ('late_payment', 'PAY_0', '>', 0, 660),
+        # 2+ months late caps at the top of the Poor range
+        ('late_payment_2_months', 'PAY_0', '>=', 2, 579),
+        # Overdraft penalties
+        ('overdraft_very_frequent', 'overdraft_frequency', '>', 0.2, 550),
+        ('overdraft_frequent', 'overdraft_frequency', '>', 0.1, 620),
+        ('overdraft_any', 'overdraft_frequency', '>', 0, 740),
+        # Stable income is preferred
+        ('high_volatility', 'transaction_volatility', '>', 1.0, 720),
+        # Living paycheck to paycheck
+        ('high_expense_ratio', 'expense_ratio', '>', 0.95, 650),
+    ]
+
+    # comparator -> (sign, strict); '<' and '<=' are evaluated as negated '>' / '>='
+    COMPARATORS = {
+        '>': (1.0, True),
+        '>=': (1.0, False),
+        '<': (-1.0, True),
+        '<=': (-1.0, False),
+    }
+
+    def __init__(self, rules: List[Tuple[str, str, str, float, int]] = None,
+                 feature_names: List[str] = None,
+                 raw_feature_names: List[str] = None):
+        """
+        Compile the rule table.
+
+        Args:
+            rules: Rule tuples (name, feature, comparator, threshold, cap)
+            feature_names: Column order of the model feature matrix
+            raw_feature_names: Column order of the raw feature matrix
+        """
+        self.rules = list(rules if rules is not None else self.DEFAULT_RULES)
+        self.feature_names = list(feature_names or FeatureExtractor.MODEL_FEATURES)
+        self.raw_feature_names = list(raw_feature_names or FeatureExtractor.RAW_FEATURES)
+        self._compile()
+
+    def _compile(self):
+        """Compile rules into column index, threshold and cap arrays."""
+        n_rules = len(self.rules)
+        self.names = [rule[0] for rule in self.rules]
+        self._features = [rule[1] for rule in self.rules]
+        self._from_model = np.zeros(n_rules, dtype=bool)
+        self._columns = np.zeros(n_rules, dtype=np.int64)
+        self._sign = np.ones(n_rules)
+        self._strict = np.ones(n_rules, dtype=bool)
+        self._thresholds = np.zeros(n_rules)
+        self._caps = np.zeros(n_rules, dtype=np.int64)
+
+        for i, (name, feature, comparator, threshold, cap) in enumerate(self.rules):
+            if comparator not in self.COMPARATORS:
+                raise ValueError(f"Rule '{name}' has unknown comparator '{comparator}'")
+            if feature in self.feature_names:
+                self._from_model[i] = True
+                self._columns[i] = self.feature_names.index(feature)
+            elif feature in self.raw_feature_names:
+                self._columns[i] = self.raw_feature_names.index(feature)
+            else:
+                raise ValueError(f"Rule '{name}' references unknown feature '{feature}'")
+            self._sign[i], self._strict[i] = self.COMPARATORS[comparator]
+            self._thresholds[i] = threshold
+            self._caps[i] = cap
+
+        self._model_rules = np.flatnonzero(self._from_model)
+        self._raw_rules = np.flatnonzero(~self._from_model)
+
+    def evaluate(self, feature_matrix: np.ndarray, raw_matrix: np.ndarray) -> np.ndarray:
+        """
+        Evaluate every rule on every row.
+
+        Returns:
+            (n_rows, n_rules) boolean matrix of fired rules
+        """
+        feature_matrix = np.asarray(feature_matrix, dtype=np.float64)
+        raw_matrix = np.asarray(raw_matrix, dtype=np.float64)
+
+        values = np.empty((len(feature_matrix), len(self.rules)))
+        values[:, self._model_rules] = feature_matrix[:, self._columns[self._model_rules]]
+        values[:, self._raw_rules] = raw_matrix[:, self._columns[self._raw_rules]]
+
+        lhs = values * self._sign
+        rhs = self._thresholds * self._sign
+        return np.where(self._strict, lhs > rhs, lhs >= rhs)
+
+    def apply(self, scores: np.ndarray, feature_matrix: np.ndarray,
+              raw_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cap an array of scores.
+
+        Returns:
+            Tuple of (capped scores, (n_rows, n_rules) fired matrix)
+        """
+        fired = self.evaluate(feature_matrix, raw_matrix)
+        row_caps = np.where(fired, self._caps, Config.SCORE_MAX).min(axis=1, initial=Config.SCORE_MAX)
+        return np.minimum(scores, row_caps), fired
+
+    def apply_one(self, score: int, features: Dict[str, float],
+                  raw_features: Dict[str, float]) -> Tuple[int, List[str]]:
+        """
+        Cap a single score given feature dictionaries.
+
+        Missing features default to 0.
+
+        Returns:
+            Tuple of (capped score, names of fired rules)
+        """
+        feature_row = [[features.get(name, 0) for name in self.feature_names]]
+        raw_row = [[raw_features.get(name, 0) for name in self.raw_feature_names]]
+        capped, fired = self.apply(np.array([score]), feature_row, raw_row)
+        return int(capped[0]), self.fired_names(fired[0])
+
+    def fired_names(self, fired_row: np.ndarray) -> List[str]:
+        """Return the names of the rules that fired for one row."""
+        return [name for name, hit in zip(self.names, fired_row) if hit]
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Return the rule table as JSON-serializable dictionaries."""
+        return [
+            {'name': name, 'feature': feature, 'comparator': comparator,
+             'threshold': threshold, 'cap': cap}
+            for name, feature, comparator, threshold, cap in self.rules
+        ]
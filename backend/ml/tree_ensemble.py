@@ -0,0 +1,210 @@
+"""Pure-NumPy evaluator for a compiled XGBoost tree ensemble."""
+import numpy as np
+from typing import Dict, List, Any
+
+
+class CompiledTreeEnsemble:
+    """
+    Gradient-boosted trees flattened into NumPy arrays.
+
+    All trees share one flat node table (feature, threshold, left, right,
+    default_left, value) indexed by global node id; `roots` holds the id of
+    each tree's root. Leaves point to themselves, so every tree can be walked
+    for exactly `max_depth` levels for a whole batch at once without
+    tracking which rows have finished.
+
+    The artifact also stores the StandardScaler mean/scale, so scoring needs
+    only NumPy: no xgboost, sklearn, or pickle.
+    """
+
+    name = 'trees'
+
+    ARRAYS = ['feature', 'threshold', 'left', 'right', 'default_left', 'value',
+              'roots', 'mean', 'scale']
+
+    def __init__(self, arrays: Dict[str, np.ndarray], base_margin: float,
+                 max_depth: int, feature_names: List[str]):
+        self.feature = arrays['feature'].astype(np.int32)
+        self.threshold = arrays['threshold'].astype(np.float32)
+        self.left = arrays['left'].astype(np.int32)
+        self.right = arrays['right'].astype(np.int32)
+        self.default_left = arrays['default_left'].astype(bool)
+        self.value = arrays['value'].astype(np.float32)
+        self.roots = arrays['roots'].astype(np.int32)
+        self.mean = arrays['mean'].astype(np.float64)
+        self.scale = arrays['scale'].astype(np.float64)
+        # children[2 * node] is the left child, children[2 * node + 1] the right
+        self.children = np.column_stack([self.left, self.right]).ravel()
+        self.base_margin = float(base_margin)
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names)
+        # Feature tested at each node, -1 at leaves
+        self.split_feature = np.where(self.left == np.arange(len(self.left)), -1, self.feature)
+
+    @classmethod
+    def from_booster_json(cls, model_json: Dict[str, Any], mean: np.ndarray,
+                          scale: np.ndarray, feature_names: List[str]) -> 'CompiledTreeEnsemble':
+        """
+        Compile a binary:logistic gbtree model from Booster.save_raw('json').
+
+        Args:
+            model_json: Parsed booster JSON
+            mean: StandardScaler mean_
+            scale: StandardScaler scale_
+            feature_names: Model feature order
+        """
+        learner = model_json['learner']
+        objective = learner['objective']['name']
+        if objective != 'binary:logistic':
+            raise ValueError(f"Unsupported objective '{objective}'")
+        booster = learner['gradient_booster']
+        if booster['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster '{booster['name']}'")
+
+        trees = booster['model']['trees']
+        sizes = [len(tree['left_children']) for tree in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+
+        left = np.concatenate([np.array(t['left_children'], dtype=np.int64) for t in trees])
+        right = np.concatenate([np.array(t['right_children'], dtype=np.int64) for t in trees])
+        node_ids = np.arange(offsets[-1], dtype=np.int64)
+        tree_offset = np.repeat(offsets[:-1], sizes)
+        is_leaf = left == -1
+        # Shift child ids into the flat table; leaves loop back to themselves
+        left = np.where(is_leaf, node_ids, left + tree_offset)
+        right = np.where(is_leaf, node_ids, right + tree_offset)
+
+        conditions = np.concatenate([np.array(t['split_conditions'], dtype=np.float32) for t in trees])
+        arrays = {
+            'feature': np.where(is_leaf, 0, np.concatenate([t['split_indices'] for t in trees])),
+            'threshold': np.where(is_leaf, np.float32(0), conditions),
+            'left': left,
+            'right': right,
+            'default_left': np.concatenate([t['default_left'] for t in trees]).astype(bool),
+            # XGBoost stores leaf values (learning rate applied) in split_conditions
+            'value': np.where(is_leaf, conditions, np.float32(0)),
+            'roots': offsets[:-1],
+            'mean': np.asarray(mean, dtype=np.float64),
+            'scale': np.asarray(scale, dtype=np.float64),
+        }
+
+        base_score = float(learner['learner_model_param']['base_score'])
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+        max_depth = max(cls._tree_depth(t['left_children'], t['right_children']) for t in trees)
+        return cls(arrays, base_margin, max_depth, feature_names)
+
+    @staticmethod
+    def _tree_depth(left_children: List[int], right_children: List[int]) -> int:
+        """Return the number of splits on the longest root-to-leaf path."""
+        depth = 0
+        frontier = [0]
+        while True:
+            children = [c for n in frontier for c in (left_children[n], right_children[n]) if c != -1]
+            if not children:
+                return depth
+            frontier = children
+            depth += 1
+
+    def save(self, path: str):
+        """Save the compiled ensemble as a single .npz file."""
+        np.savez(path, **{name: getattr(self, name) for name in self.ARRAYS},
+                 base_margin=self.base_margin, max_depth=self.max_depth,
+                 feature_names=np.array(self.feature_names))
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledTreeEnsemble':
+        """Load a compiled ensemble saved with save()."""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS}
+            return cls(arrays, float(data['base_margin']), int(data['max_depth']),
+                       data['feature_names'].tolist())
+
+    # Rows walked per block; keeps the (rows x trees) node arrays cache-sized
+    BLOCK_ROWS = 1024
+
+    def predict_margin(self, scaled: np.ndarray) -> np.ndarray:
+        """
+        Sum leaf values over all trees for a batch of scaled float32 rows.
+
+        Walks every (row, tree) pair one level at a time with vectorized
+        gathers: x < threshold goes left, NaN follows default_left.
+        """
+        scaled = np.ascontiguousarray(scaled, dtype=np.float32)
+        margins = np.empty(len(scaled), dtype=np.float64)
+        for start in range(0, len(scaled), self.BLOCK_ROWS):
+            block = scaled[start:start + self.BLOCK_ROWS]
+            margins[start:start + len(block)] = self._walk(block)
+        return margins + self.base_margin
+
+    def _walk(self, scaled: np.ndarray) -> np.ndarray:
+        """Return the summed leaf value of every tree for one block of rows."""
+        nodes = self._leaves(scaled, self.roots)
+        return self.value.take(nodes).sum(axis=1, dtype=np.float64)
+
+    def _leaves(self, scaled: np.ndarray, roots: np.ndarray, path: np.ndarray = None) -> np.ndarray:
+        """
+        Walk the trees starting at `roots` and return each row's leaf ids.
+
+        If given, path[:, :, level] receives the node visited at each level.
+        """
+        n_rows, n_features = scaled.shape
+        flat = scaled.ravel()
+        has_missing = bool(np.isnan(flat).any())
+        row_base = (np.arange(n_rows, dtype=np.int32) * n_features)[:, None]
+        nodes = np.broadcast_to(roots, (n_rows, len(roots))).copy()
+
+        for level in range(self.max_depth):
+            if path is not None:
+                path[:, :, level] = nodes
+            x = flat.take(row_base + self.feature.take(nodes))
+            go_right = ~(x < self.threshold.take(nodes))
+            if has_missing:
+                go_right &= ~(np.isnan(x) & self.default_left.take(nodes))
+            nodes = self.children.take(2 * nodes + go_right)
+        return nodes
+
+    def decision_paths(self, scaled: np.ndarray):
+        """
+        Walk every tree and record each row's path through it.
+
+        Returns:
+            Tuple of (leaves, path): (n, n_trees) leaf node ids and
+            (n, n_trees, max_depth) node visited at each level (a leaf
+            repeats once the path has reached it)
+        """
+        scaled = np.ascontiguousarray(scaled, dtype=np.float32)
+        path = np.empty((len(scaled), len(self.roots), self.max_depth), dtype=np.int32)
+        leaves = self._leaves(scaled, self.roots, path)
+        return leaves, path
+
+    def walk_from(self, scaled_row: np.ndarray, nodes: np.ndarray, levels: int) -> np.ndarray:
+        """
+        Continue walking one scaled row from `nodes` for `levels` levels.
+
+        Used to resume paths part-way down: decisions above a node that
+        only test unchanged features do not need repeating.
+
+        Returns:
+            Leaf node ids, one per start node
+        """
+        scaled_row = np.asarray(scaled_row, dtype=np.float32)
+        has_missing = bool(np.isnan(scaled_row).any())
+        for _ in range(levels):
+            x = scaled_row.take(self.feature.take(nodes))
+            go_right = ~(x < self.threshold.take(nodes))
+            if has_missing:
+                go_right &= ~(np.isnan(x) & self.default_left.take(nodes))
+            nodes = self.children.take(2 * nodes + go_right)
+        return nodes
+
+    def transform(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Scale an unscaled feature matrix (float64, like the StandardScaler)."""
+        return (np.asarray(feature_matrix, dtype=np.float64) - self.mean) / self.scale
+
+    def predict_proba_scaled(self, scaled: np.ndarray) -> np.ndarray:
+        """Return P(default) for each row of an already scaled feature matrix."""
+        return 1.0 / (1.0 + np.exp(-self.predict_margin(scaled)))
+
+    def predict_proba(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Return P(default) for each row of an unscaled feature matrix."""
+        return self.predict_proba_scaled(self.transform(feature_matrix))
@@ -0,0 +1,255 @@
+"""Interactive what-if rescoring over cached tree decision paths."""
+import json
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Any, Optional, Tuple
+
+import jwt
+import numpy as np
+
+from config import Config
+from ml.predictor import CreditScorePredictor
+from ml.registry import get_model_registry
+from ml.tree_ensemble import CompiledTreeEnsemble
+from utils.lru_cache import LRUCache
+
+
+@dataclass
+class WhatIfSession:
+    """A citizen's base profile with every tree's leaf and decision path."""
+    owner: str
+    feature_row: np.ndarray
+    raw_row: np.ndarray
+    scaled_row: Optional[np.ndarray]
+    leaf_values: Optional[np.ndarray]      # (n_trees,) leaf value reached in each tree
+    path_nodes: Optional[np.ndarray]       # (n_trees, max_depth) node visited at each level
+    first_test: Optional[np.ndarray]       # (n_features, n_trees) first level testing the
+                                           # feature, max_depth if the path never does
+    base: Dict[str, Any]
+    expires_at: float = 0.0                # time.time() after which the session id is invalid
+
+
+class WhatIfEngine:
+    """
+    Rescore one applicant under changed model features without a full pass.
+
+    Starting a session walks every tree of the compiled ensemble once and
+    keeps, per tree, the leaf value reached and the path taken. A what-if
+    then rescales only the changed columns and walks again only the trees
+    whose path tests one of them (the others reach the same leaf), resuming
+    each at the first node that does. Those leaf values are patched into the
+    cached ones and the margin is summed. The probability goes through the predictor's score conversion
+    and business-rule caps, so results match predict_many on the compiled
+    trees.
+
+    With the XGBoost or ONNX backend the trees are compiled from the pickled
+    booster once per model version; without a model every what-if falls
+    back to predict_many.
+
+    The session id is a signed token carrying the owner, model version and
+    base features, so any worker process can rebuild a session it has not
+    seen (serve.py workers share one socket); each worker keeps the
+    sessions it has built in a local LRU cache.
+    """
+
+    def __init__(self, registry=None):
+        """
+        Initialize the engine for one model version.
+
+        Args:
+            registry: ModelRegistry to read artifacts from (default: active one)
+        """
+        self.registry = registry or get_model_registry()
+        self.predictor = self.registry.consumer('predictor', CreditScorePredictor)
+        self.model_version = self.predictor.model_version
+        self.feature_names = list(self.predictor.feature_names)
+        self._columns = {name: i for i, name in enumerate(self.feature_names)}
+        self.ensemble = self._load_ensemble()
+        self.sessions = LRUCache(Config.WHAT_IF_SESSIONS, Config.WHAT_IF_SESSION_TTL_SECONDS)
+        self._lock = Lock()
+        self.evaluations = 0
+        self.trees_walked = 0
+        self.restored = 0
+
+    def _load_ensemble(self) -> Optional[CompiledTreeEnsemble]:
+        """Reuse the compiled-trees backend or compile the pickled booster."""
+        if isinstance(self.predictor.backend, CompiledTreeEnsemble):
+            return self.predictor.backend
+        model, scaler = self.predictor.model, self.predictor.scaler
+        if model is None or scaler is None:
+            return None
+        try:
+            model_json = json.loads(model.get_booster().save_raw('json'))
+            return CompiledTreeEnsemble.from_booster_json(model_json, scaler.mean_, scaler.scale_,
+                                                          self.feature_names)
+        except (AttributeError, KeyError, ValueError) as e:
+            print(f"What-if trees unavailable ({e}), rescoring with predict_many.")
+            return None
+
+    def start(self, feature_row: np.ndarray, raw_row: np.ndarray,
+              owner: str) -> Tuple[str, WhatIfSession]:
+        """
+        Open a session for one applicant.
+
+        Args:
+            feature_row: (n_features,) model features in feature_names order
+            raw_row: (n_raw,) raw features in FeatureExtractor.RAW_FEATURES order
+            owner: User the session belongs to; other users cannot read it
+
+        Returns:
+            Tuple of (session id for session(), the session); the id is valid
+            for WHAT_IF_SESSION_TTL_SECONDS in every worker
+        """
+        expires_at = int(time.time() + Config.WHAT_IF_SESSION_TTL_SECONDS)
+        session = self._build(owner, feature_row, raw_row, expires_at)
+        session_id = jwt.encode({
+            'sub': owner,
+            'ver': self.model_version,
+            'features': session.feature_row.tolist(),
+            'raw': session.raw_row.tolist(),
+            'exp': expires_at,
+        }, Config.SECRET_KEY, algorithm=Config.JWT_ALGORITHM)
+        self.sessions.put(session_id, session)
+        return session_id, session
+
+    def _build(self, owner: str, feature_row, raw_row, expires_at: float) -> WhatIfSession:
+        """Walk every tree once for the base profile and score it."""
+        feature_row = np.array(feature_row, dtype=np.float64)
+        raw_row = np.array(raw_row, dtype=np.float64)
+        scaled_row = leaf_values = path_nodes = first_test = None
+        if self.ensemble is not None:
+            scaled_row = self.ensemble.transform(feature_row[None, :]).astype(np.float32)[0]
+            leaves, paths = self.ensemble.decision_paths(scaled_row[None, :])
+            leaf_values = self.ensemble.value.take(leaves[0])
+            path_nodes = paths[0]
+            tests = (self.ensemble.split_feature.take(path_nodes)[None, :, :]
+                     == np.arange(len(self.feature_names))[:, None, None])
+            first_test = np.where(tests.any(axis=2), tests.argmax(axis=2), self.ensemble.max_depth)
+
+        session = WhatIfSession(owner, feature_row, raw_row, scaled_row, leaf_values,
+                                path_nodes, first_test, base={}, expires_at=expires_at)
+        session.base = self._score(session, feature_row, leaf_values)
+        return session
+
+    def session(self, session_id: str, owner: str) -> Optional[WhatIfSession]:
+        """
+        Return the session, or None if it expired or belongs to someone else.
+
+        A session opened by another worker (or evicted from this one) is
+        rebuilt from its signed id.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self._restore(session_id)
+            if session is None:
+                return None
+            self.sessions.put(session_id, session)
+        if session.owner != owner or time.time() >= session.expires_at:
+            return None
+        return session
+
+    def _restore(self, session_id: str) -> Optional[WhatIfSession]:
+        """Rebuild a session from its id, or None if invalid, expired or for another model."""
+        try:
+            claims = jwt.decode(session_id, Config.SECRET_KEY, algorithms=[Config.JWT_ALGORITHM])
+        except jwt.InvalidTokenError:
+            return None
+        if claims.get('ver') != self.model_version:
+            return None
+        with self._lock:
+            self.restored += 1
+        return self._build(claims['sub'], claims['features'], claims['raw'], claims['exp'])
+
+    def evaluate(self, session: WhatIfSession, changes: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Score the session's profile with some model features replaced.
+
+        Args:
+            session: Session from session()
+            changes: Model feature name -> new value; changes replace the
+                base values, they do not stack across calls
+
+        Returns:
+            Score, category, probability_of_default and rules_fired of the
+            changed profile, its score delta from the base and the number of
+            trees walked again
+
+        Raises:
+            ValueError: If a feature is unknown or a value is not a finite number
+        """
+        columns, values = [], []
+        for name, value in changes.items():
+            if name not in self._columns:
+                raise ValueError(f"Unknown feature '{name}'. Use one of: {', '.join(self.feature_names)}")
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Value for '{name}' must be a number")
+            if not np.isfinite(value):
+                raise ValueError(f"Value for '{name}' must be a finite number")
+            columns.append(self._columns[name])
+            values.append(value)
+
+        feature_row = session.feature_row.copy()
+        feature_row[columns] = values
+        changed = np.flatnonzero(feature_row != session.feature_row)
+
+        leaf_values = session.leaf_values
+        trees = np.empty(0, dtype=np.int64)
+        if self.ensemble is not None and len(changed):
+            scaled_row = session.scaled_row.copy()
+            scaled_row[changed] = ((feature_row[changed] - self.ensemble.mean[changed])
+                                   / self.ensemble.scale[changed])
+            start = session.first_test[changed].min(axis=0)
+            trees = np.flatnonzero(start < self.ensemble.max_depth)
+            if len(trees):
+                start = start[trees]
+                nodes = session.path_nodes[trees, start]
+                leaves = self.ensemble.walk_from(scaled_row, nodes, self.ensemble.max_depth - int(start.min()))
+                leaf_values = leaf_values.copy()
+                leaf_values[trees] = self.ensemble.value.take(leaves)
+
+        result = self._score(session, feature_row, leaf_values)
+        result['score_change'] = result['score'] - session.base['score']
+        result['trees_evaluated'] = int(len(trees))
+        with self._lock:
+            self.evaluations += 1
+            self.trees_walked += int(len(trees))
+        return result
+
+    def _score(self, session: WhatIfSession, feature_row: np.ndarray,
+               leaf_values: Optional[np.ndarray]) -> Dict[str, Any]:
+        """Convert summed leaf values (or a predict_many call) into a score."""
+        if leaf_values is None:
+            predictions = self.predictor.predict_many(feature_row[None, :], session.raw_row[None, :])
+            scores, categories, fired = (predictions['score'], predictions['category'],
+                                         predictions['rules_fired'])
+            default_prob = predictions['probability_of_default']
+        else:
+            margin = leaf_values.sum(dtype=np.float64) + self.ensemble.base_margin
+            default_prob = np.array([1.0 / (1.0 + np.exp(-margin))])
+            scores, categories, fired = self.predictor.score_probabilities(
+                default_prob, feature_row[None, :], session.raw_row[None, :])
+        return {
+            'score': int(scores[0]),
+            'category': str(categories[0]),
+            'probability_of_default': round(float(default_prob[0]), 4),
+            'rules_fired': self.predictor.rules.fired_names(fired[0]),
+            'model_version': self.model_version,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return session cache counters, sessions rebuilt from their id and the average trees walked per what-if."""
+        return {
+            'sessions': self.sessions.metrics(),
+            'evaluations': self.evaluations,
+            'restored': self.restored,
+            'trees': len(self.ensemble.roots) if self.ensemble is not None else 0,
+            'avg_trees_evaluated': round(self.trees_walked / self.evaluations, 2) if self.evaluations else 0.0,
+        }
+
+
+def get_what_if_engine() -> WhatIfEngine:
+    """Get or create the what-if engine for the current model version."""
+    return get_model_registry().consumer('what_if', WhatIfEngine)
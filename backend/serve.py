@@ -0,0 +1,209 @@
+"""
+Production entry point: preload the models, then fork worker processes.
+
+The parent process builds every singleton (model registry, predictor,
+explainer, counterfactual generator, anomaly scorer, recommendation engine,
+audit logger), runs one warm-up assessment so shap and the model are fully
+initialized, freezes the GC, and then forks N workers that all accept on
+one shared listening socket. Model pages stay shared copy-on-write, and no
+worker pays the cold-start cost on its first request.
+
+Usage (from the backend directory; POSIX only):
+    python serve.py --workers 4 --port 5000
+"""
+import argparse
+import gc
+import glob
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+from werkzeug.serving import make_server
+
+from config import Config
+
+
+def preload():
+    """Create the app and every model singleton, then run one warm-up request."""
+    from app import create_app
+    from ml.registry import get_model_registry
+    from ml.feature_extractor import FeatureExtractor, parse_csv_transactions
+    from ml.predictor import get_predictor
+    from ml.explainer import get_explainer
+    from ml.counterfactual import get_counterfactual_generator
+    from ml.anomaly import get_anomaly_scorer
+    from utils.audit_logger import get_audit_logger
+    from utils.recommendations import get_recommendation_engine
+    from utils.narrative import get_narrative_cache
+
+    app = create_app()
+    get_model_registry().load_all()
+    predictor = get_predictor()
+    explainer = get_explainer()
+    generator = get_counterfactual_generator()
+    anomaly_scorer = get_anomaly_scorer()
+    recommender = get_recommendation_engine()
+    get_audit_logger()
+    # Load (and compact) the narrative cache file once; workers inherit it and only append
+    get_narrative_cache()
+
+    # Warm-up: one full assessment touches every lazy code path
+    sample_paths = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'data', 'samples', '*.csv')))
+    if sample_paths:
+        with open(sample_paths[0], 'r') as f:
+            transactions = parse_csv_transactions(f.read())
+        features = FeatureExtractor().extract_features(transactions)
+        prediction = predictor.predict(features.copy())
+        explanations = explainer.explain(prediction['feature_vector'], prediction['feature_values'],
+                                         prediction['raw_features'])
+        generator.generate_improvements(prediction['feature_values'], prediction['raw_features'],
+                                        prediction['score'])
+        anomaly_scorer.score(prediction['feature_vector'])
+        recommender.generate_bank_recommendations(prediction['score'], prediction['category'],
+                                                  prediction['probability_of_default'],
+                                                  explanations, prediction['raw_features'])
+
+    return app
+
+
+def worker_memory(pid: int) -> Dict[str, float]:
+    """
+    Return a process's memory breakdown in MB from /proc/<pid>/smaps_rollup.
+
+    Private memory is what the worker does not share with the parent or its
+    siblings; with copy-on-write it should stay far below RSS.
+    """
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return {}
+
+    return {
+        'rss_mb': round(fields.get('Rss', 0), 1),
+        'pss_mb': round(fields.get('Pss', 0), 1),
+        'shared_mb': round(fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0), 1),
+        'private_mb': round(fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0), 1),
+    }
+
+
+def run_worker(app, listener: socket.socket, ready_fd: int):
+    """Serve requests on the shared socket until terminated."""
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, app, threaded=Config.SERVE_THREADED, fd=listener.fileno())
+
+    os.write(ready_fd, f'{os.getpid()}\n'.encode())
+    os.close(ready_fd)
+    try:
+        server.serve_forever()
+    finally:
+        # atexit handlers do not run after os._exit(); flush queued audit events here
+        from utils.audit_logger import get_audit_logger
+        get_audit_logger().close()
+
+
+def spawn_worker(app, listener: socket.socket) -> int:
+    """Fork one worker and return its pid once it is ready to accept."""
+    ready_read, ready_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(ready_read)
+        try:
+            run_worker(app, listener, ready_write)
+        finally:
+            os._exit(0)
+
+    os.close(ready_write)
+    with os.fdopen(ready_read, 'r') as ready:
+        ready.readline()
+    return pid
+
+
+def serve(host: str, port: int, workers: int):
+    """Preload, fork workers, and supervise them until interrupted."""
+    start = time.perf_counter()
+    app = preload()
+    preload_seconds = time.perf_counter() - start
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(Config.SERVE_BACKLOG)
+    listener.set_inheritable(True)
+
+    # Keep preloaded objects out of the collector so it never writes to
+    # (and un-shares) their pages in the workers
+    gc.collect()
+    gc.freeze()
+
+    pids = []
+    for i in range(workers):
+        pids.append(spawn_worker(app, listener))
+        if i == 0:
+            first_ready_seconds = time.perf_counter() - start
+
+    print(f"Preloaded models in {preload_seconds * 1000:.0f} ms; "
+          f"first worker ready after {first_ready_seconds * 1000:.0f} ms")
+    print(f"Serving on http://{host}:{listener.getsockname()[1]} with {workers} workers")
+    for pid in pids:
+        memory = worker_memory(pid)
+        if memory:
+            print(f"  worker {pid}: private {memory['private_mb']} MB, "
+                  f"shared {memory['shared_mb']} MB, rss {memory['rss_mb']} MB")
+    sys.stdout.flush()
+
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Supervise: replace workers that exit unexpectedly
+    while pids:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid in pids:
+            pids.remove(pid)
+            if not stopping:
+                print(f"Worker {pid} exited, starting a replacement")
+                pids.append(spawn_worker(app, listener))
+
+    listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Preload-and-fork Credit Score API server')
+    parser.add_argument('--host', default=Config.SERVE_HOST)
+    parser.add_argument('--port', type=int, default=Config.SERVE_PORT)
+    parser.add_argument('--workers', type=int, default=Config.SERVE_WORKERS)
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        raise SystemExit("serve.py needs os.fork(); use python app.py on this platform")
+
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Streaming serializers for audit log exports."""
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Any, Callable, Iterable, Iterator
+
+# Format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/json', 'json'),
+}
+
+CSV_FIELDS = ['timestamp', 'user', 'role', 'action', 'score', 'risk_category',
+              'applicant_id', 'model_version', 'additional_data']
+
+# Bytes buffered before a chunk is sent
+CHUNK_BYTES = 64 * 1024
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _serialize(logs: Iterable[Dict[str, Any]], fmt: str,
+               trailer: Callable[[int], Dict[str, Any]]) -> Iterator[str]:
+    """Yield the export as text pieces: a header, one piece per log, a footer."""
+    if fmt == 'csv':
+        yield _csv_line(CSV_FIELDS)
+        for log in logs:
+            extra = log.get('additional_data')
+            yield _csv_line([log.get(field) for field in CSV_FIELDS[:-1]]
+                            + [json.dumps(extra, default=str) if extra is not None else ''])
+    elif fmt == 'ndjson':
+        for log in logs:
+            yield json.dumps(log, default=str) + '\n'
+    else:
+        # Same document shape as the old in-memory export, written incrementally
+        yield '{"logs": ['
+        count = 0
+        for log in logs:
+            yield (',\n' if count else '\n') + json.dumps(log, default=str)
+            count += 1
+        yield '\n], "stats": ' + json.dumps(trailer(count), default=str) + '}\n'
+
+
+def export_chunks(logs: Iterable[Dict[str, Any]], fmt: str = 'ndjson',
+                  trailer: Callable[[int], Dict[str, Any]] = None,
+                  chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Serialize logs into response chunks of about `chunk_bytes`.
+
+    The first piece (CSV header, JSON opening or first NDJSON row) is sent
+    on its own so the client gets its first byte before the store has been
+    read any further.
+
+    Args:
+        logs: Log entries (typically a generator over the store)
+        fmt: 'ndjson', 'csv' or 'json'
+        trailer: For 'json', builds the closing stats from the row count
+        chunk_bytes: Buffer size per chunk
+
+    Yields:
+        UTF-8 encoded chunks
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    trailer = trailer or (lambda count: {'total_filtered': count})
+
+    pieces = _serialize(logs, fmt, trailer)
+    for piece in pieces:
+        yield piece.encode('utf-8')
+        break
+
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a chunk stream incrementally, flushing the first chunk right away."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    first = True
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if first:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,47 +1,32 @@
 """Audit logging utility for tracking all scoring requests."""
-import json
-import os
+import atexit
 from datetime import datetime
-from typing import Dict, Any, List
-from threading import Lock
+from typing import Dict, Any, Iterator, List, Tuple
 
 from config import Config
+from utils.audit_storage import create_audit_storage
 
 
 class AuditLogger:
     """Thread-safe audit logger for credit score requests."""
 
-    def __init__(self, log_path: str = None):
-        """Initialize the audit logger."""
+    def __init__(self, log_path: str = None, storage=None):
+        """
+        Initialize the audit logger.
+
+        Args:
+            log_path: Legacy audit_log.json path
+            storage: Storage backend (default: per Config.AUDIT_STORAGE)
+        """
         self.log_path = log_path or Config.AUDIT_LOG_PATH
-        self._lock = Lock()
-        self._ensure_log_file()
-
-    def _ensure_log_file(self):
-        """Ensure the log file exists."""
-        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
-        if not os.path.exists(self.log_path):
-            with open(self.log_path, 'w') as f:
-                json.dump({'logs': [], 'stats': {'total_requests': 0, 'total_scores': 0}}, f)
-
-    def _read_logs(self) -> Dict[str, Any]:
-        """Read current logs from file."""
-        try:
-            with open(self.log_path, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {'logs': [], 'stats': {'total_requests': 0, 'total_scores': 0}}
-
-    def _write_logs(self, data: Dict[str, Any]):
-        """Write logs to file."""
-        with open(self.log_path, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        self.storage = storage or create_audit_storage(log_path=self.log_path)
 
     def log_score_request(self, user_email: str, user_role: str,
                           action: str, score: int = None,
                           risk_category: str = None,
                           applicant_id: str = None,
-                          additional_data: Dict[str, Any] = None):
+                          additional_data: Dict[str, Any] = None,
+                          model_version: str = None):
         """
         Log a credit score request.
 
@@ -53,43 +38,33 @@ class AuditLogger:
             risk_category: Risk category (if applicable)
             applicant_id: Applicant ID for bank requests
             additional_data: Any additional data to log
+            model_version: Version of the model that produced the score
         """
-        with self._lock:
-            data = self._read_logs()
-
-            log_entry = {
-                'timestamp': datetime.utcnow().isoformat(),
-                'user': user_email,
-                'role': user_role,
-                'action': action,
-                'score': score,
-                'risk_category': risk_category,
-                'applicant_id': applicant_id,
-            }
-
-            if additional_data:
-                log_entry['additional_data'] = additional_data
-
-            data['logs'].append(log_entry)
-
-            # Update stats
-            data['stats']['total_requests'] += 1
-            if score is not None:
-                data['stats']['total_scores'] += score
-                data['stats']['avg_score'] = round(
-                    data['stats']['total_scores'] / data['stats']['total_requests']
-                )
-
-            # Keep only last 1000 logs
-            if len(data['logs']) > 1000:
-                data['logs'] = data['logs'][-1000:]
-
-            self._write_logs(data)
+        log_entry = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'user': user_email,
+            'role': user_role,
+            'action': action,
+            'score': score,
+            'risk_category': risk_category,
+            'applicant_id': applicant_id,
+        }
+
+        if model_version:
+            log_entry['model_version'] = model_version
+
+        if additional_data:
+            log_entry['additional_data'] = additional_data
+
+        self.storage.append(log_entry)
 
     def get_logs(self, limit: int = 100, offset: int = 0,
                  user_filter: str = None,
                  role_filter: str = None,
-                 action_filter: str = None) -> Dict[str, Any]:
+                 action_filter: str = None,
+                 applicant_filter: str = None,
+                 risk_filter: str = None,
+                 cursor: str = None) -> Dict[str, Any]:
         """
         Retrieve audit logs with optional filtering.
 
@@ -99,90 +74,141 @@ class AuditLogger:
             user_filter: Filter by user email
             role_filter: Filter by role
             action_filter: Filter by action type
+            applicant_filter: Filter by applicant ID
+            risk_filter: Filter by risk category
+            cursor: next_cursor from the previous page (indexed storage only;
+                replaces offset)
 
         Returns:
-            Dictionary with logs and stats
+            Dictionary with logs, stats and next_cursor
         """
-        with self._lock:
-            data = self._read_logs()
-
-        logs = data['logs']
-
-        # Apply filters
-        if user_filter:
-            logs = [l for l in logs if user_filter.lower() in l.get('user', '').lower()]
-        if role_filter:
-            logs = [l for l in logs if l.get('role') == role_filter]
-        if action_filter:
-            logs = [l for l in logs if l.get('action') == action_filter]
-
-        # Sort by timestamp (newest first)
-        logs = sorted(logs, key=lambda x: x.get('timestamp', ''), reverse=True)
-
-        # Apply pagination
-        total = len(logs)
-        logs = logs[offset:offset + limit]
+        if self.storage.indexed:
+            page = self.storage.query(limit=limit, offset=offset, cursor=cursor,
+                                      user=user_filter, role=role_filter, action=action_filter,
+                                      applicant_id=applicant_filter, risk_category=risk_filter)
+            logs, total, next_cursor = page['logs'], page['total'], page['next_cursor']
+        else:
+            logs, total = self._newest_page(limit, offset, user_filter, role_filter, action_filter,
+                                            applicant_filter, risk_filter)
+            next_cursor = None
 
         # Calculate filtered stats
         filtered_stats = {
             'total_filtered': total,
             'showing': len(logs),
-            'offset': offset
+            'offset': 0 if cursor and self.storage.indexed else offset
         }
 
         return {
             'logs': logs,
-            'stats': {**data['stats'], **filtered_stats}
+            'stats': {**self.running_totals(), **filtered_stats},
+            'next_cursor': next_cursor
         }
 
+    def _newest_page(self, limit: int, offset: int, user_filter: str, role_filter: str,
+                     action_filter: str, applicant_filter: str,
+                     risk_filter: str) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Collect one newest-first page from storage without an index.
+
+        Entries are read newest first (in write order) and filtered lazily;
+        the scan stops one match past the page, so older segments are never
+        read for early pages. Without filters the total comes from the
+        running stats; with filters it is only known up to the page, so it
+        is the number of matches found (one more than the page end if there
+        are further matches).
+
+        Returns:
+            Tuple of (page of logs, total matching entries)
+        """
+        user_filter = user_filter.lower() if user_filter else None
+        filtered = any((user_filter, role_filter, action_filter, applicant_filter, risk_filter))
+        matches = []
+        for log in self.storage.entries_newest_first():
+            if user_filter and user_filter not in (log.get('user') or '').lower():
+                continue
+            if role_filter and log.get('role') != role_filter:
+                continue
+            if action_filter and log.get('action') != action_filter:
+                continue
+            if applicant_filter and log.get('applicant_id') != applicant_filter:
+                continue
+            if risk_filter and log.get('risk_category') != risk_filter:
+                continue
+            matches.append(log)
+            if len(matches) > offset + limit:
+                break
+
+        total = len(matches)
+        if not filtered:
+            total = max(total, self.storage.stats().get('total_requests', total))
+        return matches[offset:offset + limit], total
+
+    def iter_logs(self, user_filter: str = None,
+                  role_filter: str = None,
+                  action_filter: str = None,
+                  applicant_filter: str = None,
+                  risk_filter: str = None,
+                  since: str = None,
+                  until: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream audit logs, oldest first, without loading them all.
+
+        Args:
+            user_filter: Filter by user email (substring)
+            role_filter: Filter by role
+            action_filter: Filter by action type
+            applicant_filter: Filter by applicant ID
+            risk_filter: Filter by risk category
+            since: Earliest timestamp (inclusive, ISO format)
+            until: Latest timestamp (exclusive, ISO format)
+
+        Yields:
+            Matching log entries
+        """
+        if self.storage.indexed:
+            yield from self.storage.scan(since=since, until=until, user=user_filter,
+                                         role=role_filter, action=action_filter,
+                                         applicant_id=applicant_filter, risk_category=risk_filter)
+            return
+
+        user_filter = user_filter.lower() if user_filter else None
+        for log in self.storage.entries():
+            timestamp = log.get('timestamp', '')
+            if since and timestamp < since:
+                continue
+            if until and timestamp >= until:
+                continue
+            if user_filter and user_filter not in (log.get('user') or '').lower():
+                continue
+            if role_filter and log.get('role') != role_filter:
+                continue
+            if action_filter and log.get('action') != action_filter:
+                continue
+            if applicant_filter and log.get('applicant_id') != applicant_filter:
+                continue
+            if risk_filter and log.get('risk_category') != risk_filter:
+                continue
+            yield log
+
+    def running_totals(self) -> Dict[str, Any]:
+        """Get the lifetime request and score totals."""
+        stats = self.storage.stats()
+        return {key: stats[key] for key in ('total_requests', 'total_scores', 'avg_score') if key in stats}
+
     def get_stats(self) -> Dict[str, Any]:
-        """Get overall statistics."""
-        with self._lock:
-            data = self._read_logs()
-
-        stats = data['stats'].copy()
-
-        # Calculate additional stats
-        logs = data['logs']
-        if logs:
-            # Score distribution
-            scores = [l['score'] for l in logs if l.get('score') is not None]
-            if scores:
-                stats['min_score'] = min(scores)
-                stats['max_score'] = max(scores)
-                stats['score_count'] = len(scores)
-
-            # Role distribution
-            role_counts = {}
-            # Score distribution by category
-            risk_distribution = {
-                'Excellent': 0,
-                'Very Good': 0,
-                'Good': 0,
-                'Fair': 0,
-                'Poor': 0
-            }
-
-            for log in logs:
-                role = log.get('role', 'unknown')
-                role_counts[role] = role_counts.get(role, 0) + 1
-                
-                # Count risk categories
-                category = log.get('risk_category')
-                if category and category in risk_distribution:
-                    risk_distribution[category] += 1
-
-            stats['requests_by_role'] = role_counts
-            stats['risk_distribution'] = risk_distribution
-
-            # Recent activity (last 24 hours)
-            now = datetime.utcnow()
-            recent = [l for l in logs
-                     if 'timestamp' in l and
-                     (now - datetime.fromisoformat(l['timestamp'])).days < 1]
-            stats['requests_last_24h'] = len(recent)
-
-        return stats
+        """Get overall statistics (maintained incrementally by the storage)."""
+        return self.storage.stats()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get write-path metrics (queue depth, flush latency) if writes are asynchronous."""
+        if hasattr(self.storage, 'metrics'):
+            return self.storage.metrics()
+        return {'storage': self.storage.name, 'asynchronous': False}
+
+    def close(self):
+        """Write out any queued events and close the storage."""
+        self.storage.close()
 
 
 # Singleton instance
@@ -194,4 +220,5 @@ def get_audit_logger() -> AuditLogger:
     global _logger
     if _logger is None:
         _logger = AuditLogger()
+        atexit.register(_logger.close)
     return _logger
@@ -0,0 +1,219 @@
+"""Incrementally maintained audit statistics."""
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable
+
+import numpy as np
+
+from config import Config
+
+RISK_CATEGORIES = ['Excellent', 'Very Good', 'Good', 'Fair', 'Poor']
+
+
+def entry_minute(entry: Dict[str, Any]) -> int:
+    """Return the UTC minute (since the epoch) of an entry's timestamp, or None."""
+    try:
+        moment = datetime.fromisoformat(entry['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() // 60)
+
+
+class AuditStats:
+    """
+    Running audit aggregates, updated once per event.
+
+    Keeps lifetime counters (requests, scored requests, score sum, min/max,
+    requests by role, risk distribution, score histogram) and per-minute
+    ring buffers covering the last RING_MINUTES minutes, from which the 1h,
+    24h and 7d sliding windows are summed. Reading the summary therefore
+    costs the same no matter how many events have been logged.
+
+    The state round-trips through to_dict()/from_dict() so storages can
+    persist it next to the log.
+    """
+
+    # Sliding windows reported by summary(), in minutes
+    WINDOWS = {'1h': 60, '24h': 24 * 60, '7d': 7 * 24 * 60}
+    RING_MINUTES = 7 * 24 * 60
+
+    # Score histogram bucket width
+    BIN_WIDTH = 50
+
+    def __init__(self):
+        self.total_requests = 0
+        self.total_scores = 0
+        self.scored_requests = 0
+        self.min_score = None
+        self.max_score = None
+        self.requests_by_role = {}
+        self.risk_distribution = {category: 0 for category in RISK_CATEGORIES}
+        self.histogram = [0] * self._bin_count()
+
+        # Ring buffers: slot = minute % RING_MINUTES, stamped with the minute it holds
+        self.minute_stamps = np.full(self.RING_MINUTES, -1, dtype=np.int64)
+        self.minute_requests = np.zeros(self.RING_MINUTES, dtype=np.int64)
+        self.minute_scored = np.zeros(self.RING_MINUTES, dtype=np.int64)
+        self.minute_scores = np.zeros(self.RING_MINUTES, dtype=np.int64)
+
+    @classmethod
+    def _bin_count(cls) -> int:
+        return -(-(Config.SCORE_MAX - Config.SCORE_MIN) // cls.BIN_WIDTH)
+
+    @classmethod
+    def bin_labels(cls):
+        """Histogram bucket labels; the last bucket includes SCORE_MAX."""
+        count = cls._bin_count()
+        labels = []
+        for i in range(count):
+            low = Config.SCORE_MIN + i * cls.BIN_WIDTH
+            high = Config.SCORE_MAX if i == count - 1 else low + cls.BIN_WIDTH - 1
+            labels.append(f'{low}-{high}')
+        return labels
+
+    def add(self, entry: Dict[str, Any]):
+        """Fold one log entry into the aggregates."""
+        self.total_requests += 1
+        role = entry.get('role') or 'unknown'
+        self.requests_by_role[role] = self.requests_by_role.get(role, 0) + 1
+
+        category = entry.get('risk_category')
+        if category in self.risk_distribution:
+            self.risk_distribution[category] += 1
+
+        score = entry.get('score')
+        if score is not None:
+            self.total_scores += score
+            self.scored_requests += 1
+            self.min_score = score if self.min_score is None else min(self.min_score, score)
+            self.max_score = score if self.max_score is None else max(self.max_score, score)
+            index = (score - Config.SCORE_MIN) // self.BIN_WIDTH
+            self.histogram[min(max(index, 0), len(self.histogram) - 1)] += 1
+
+        minute = entry_minute(entry)
+        if minute is not None:
+            self._add_minute(minute, 1, int(score is not None), score or 0)
+
+    def _add_minute(self, minute: int, requests: int, scored: int, scores: int):
+        slot = minute % self.RING_MINUTES
+        stamp = self.minute_stamps[slot]
+        if stamp > minute:
+            return  # older than the ring covers
+        if stamp < minute:
+            self.minute_stamps[slot] = minute
+            self.minute_requests[slot] = 0
+            self.minute_scored[slot] = 0
+            self.minute_scores[slot] = 0
+        self.minute_requests[slot] += requests
+        self.minute_scored[slot] += scored
+        self.minute_scores[slot] += scores
+
+    def load_minutes(self, minutes: np.ndarray):
+        """Load saved (minute, requests, scored, scores) rows into the ring buffers."""
+        slots = minutes[:, 0] % self.RING_MINUTES
+        self.minute_stamps[slots] = minutes[:, 0]
+        self.minute_requests[slots] = minutes[:, 1]
+        self.minute_scored[slots] = minutes[:, 2]
+        self.minute_scores[slots] = minutes[:, 3]
+
+    def windows(self, now: float = None) -> Dict[str, Dict[str, Any]]:
+        """Return request counts and average score for each sliding window."""
+        now_minute = int((time.time() if now is None else now) // 60)
+        result = {}
+        for name, minutes in self.WINDOWS.items():
+            mask = self.minute_stamps > now_minute - minutes
+            scored = int(self.minute_scored[mask].sum())
+            result[name] = {
+                'requests': int(self.minute_requests[mask].sum()),
+                'scored': scored,
+                'avg_score': round(int(self.minute_scores[mask].sum()) / scored) if scored else None,
+            }
+        return result
+
+    def summary(self, now: float = None) -> Dict[str, Any]:
+        """Return the stats reported by the admin API."""
+        stats = {
+            'total_requests': self.total_requests,
+            'total_scores': self.total_scores,
+            'score_count': self.scored_requests,
+        }
+        if self.scored_requests:
+            stats['avg_score'] = round(self.total_scores / self.scored_requests)
+            stats['min_score'] = self.min_score
+            stats['max_score'] = self.max_score
+        windows = self.windows(now)
+        stats.update({
+            'requests_by_role': dict(self.requests_by_role),
+            'risk_distribution': dict(self.risk_distribution),
+            'score_histogram': dict(zip(self.bin_labels(), self.histogram)),
+            'requests_last_24h': windows['24h']['requests'],
+            'windows': windows,
+        })
+        return stats
+
+    # Persistence
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the aggregates (ring buffers as sparse minute lists)."""
+        used = np.nonzero(self.minute_stamps >= 0)[0]
+        return {
+            'total_requests': self.total_requests,
+            'total_scores': self.total_scores,
+            'scored_requests': self.scored_requests,
+            'min_score': self.min_score,
+            'max_score': self.max_score,
+            'requests_by_role': self.requests_by_role,
+            'risk_distribution': self.risk_distribution,
+            'histogram': self.histogram,
+            'minutes': [[int(self.minute_stamps[slot]), int(self.minute_requests[slot]),
+                         int(self.minute_scored[slot]), int(self.minute_scores[slot])]
+                        for slot in used],
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any], entries: Iterable[Dict[str, Any]] = ()) -> 'AuditStats':
+        """
+        Restore aggregates saved by to_dict().
+
+        Args:
+            state: Saved state, or the {total_requests, total_scores} stats
+                of a legacy audit_log.json
+            entries: Retained entries, used only to rebuild a legacy state
+        """
+        if 'scored_requests' not in state:
+            return cls.from_legacy(state, entries)
+
+        stats = cls()
+        stats.total_requests = state['total_requests']
+        stats.total_scores = state['total_scores']
+        stats.scored_requests = state['scored_requests']
+        stats.min_score = state.get('min_score')
+        stats.max_score = state.get('max_score')
+        stats.requests_by_role = dict(state.get('requests_by_role', {}))
+        stats.risk_distribution.update(state.get('risk_distribution', {}))
+        histogram = state.get('histogram', [])
+        if len(histogram) == len(stats.histogram):
+            stats.histogram = list(histogram)
+        stats.load_minutes(np.array(state.get('minutes', []), dtype=np.int64).reshape(-1, 4))
+        return stats
+
+    @classmethod
+    def from_legacy(cls, state: Dict[str, Any], entries: Iterable[Dict[str, Any]]) -> 'AuditStats':
+        """
+        Rebuild aggregates from retained entries, keeping the legacy request total.
+
+        Legacy stats can count more events than are still retained. The
+        extra events count as requests, but since the legacy stats do not say
+        which of them carried a score, the score counters come only from
+        retained entries whose score is not None.
+        """
+        stats = cls()
+        for entry in entries:
+            stats.add(entry)
+
+        extra_requests = state.get('total_requests', 0) - stats.total_requests
+        if extra_requests > 0:
+            stats.total_requests += extra_requests
+        return stats
@@ -0,0 +1,828 @@
+"""Storage backends for the audit log."""
+import glob
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from threading import Lock, Thread
+from typing import Dict, Any, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+from config import Config
+from utils.audit_stats import AuditStats
+
+
+class ProcessLock:
+    """
+    Exclusive lock shared by this process's threads and by every other
+    process that opens the same lock file.
+
+    Uses fcntl.flock. flock locks belong to an open file description, which
+    a forked child shares with its parent, so each process opens the lock
+    file itself. Where fcntl is unavailable this is a plain thread lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = Lock()
+        self._fd = None
+        self._pid = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            if self._pid != os.getpid():
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+class JsonAuditStorage:
+    """
+    Legacy storage: one JSON document rewritten on every event.
+
+    Keeps only the newest MAX_ENTRIES entries. Every read-modify-write
+    holds a ProcessLock, so worker processes sharing the file cannot lose
+    each other's entries.
+    """
+
+    name = 'json'
+    indexed = False
+    MAX_ENTRIES = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = ProcessLock(f'{self.path}.lock')
+        with self._lock:
+            if not os.path.exists(self.path):
+                self._write({'logs': [], 'stats': AuditStats().to_dict()})
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {'logs': [], 'stats': AuditStats().to_dict()}
+
+    def _write(self, data: Dict[str, Any]):
+        tmp_path = f'{self.path}.tmp.{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
+
+    def append(self, entry: Dict[str, Any]):
+        """Append one entry (rewrites the whole file)."""
+        self.append_many([entry])
+
+    def append_many(self, entries: List[Dict[str, Any]]):
+        """Append several entries with one rewrite."""
+        with self._lock:
+            data = self._read()
+            stats = AuditStats.from_dict(data['stats'], data['logs'])
+            for entry in entries:
+                data['logs'].append(entry)
+                stats.add(entry)
+            data['stats'] = stats.to_dict()
+
+            if len(data['logs']) > self.MAX_ENTRIES:
+                data['logs'] = data['logs'][-self.MAX_ENTRIES:]
+
+            self._write(data)
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Yield stored entries, oldest first."""
+        with self._lock:
+            data = self._read()
+        return iter(data['logs'])
+
+    def entries_newest_first(self) -> Iterator[Dict[str, Any]]:
+        """Yield stored entries, newest first."""
+        with self._lock:
+            data = self._read()
+        return reversed(data['logs'])
+
+    def aggregates(self) -> AuditStats:
+        """Return the running aggregates."""
+        with self._lock:
+            data = self._read()
+        return AuditStats.from_dict(data['stats'], data['logs'])
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the running stats."""
+        return self.aggregates().summary()
+
+    def close(self):
+        pass
+
+
+class JsonlAuditStorage:
+    """
+    Append-only JSON-lines storage.
+
+    Each event is one line appended to the active segment
+    (audit-000001.jsonl, ...), so a write costs O(1) regardless of how much
+    history is kept. When the active segment exceeds `segment_bytes` it is
+    closed and a background thread gzips it. Running stats live in a small
+    stats.json sidecar that records how far into the log they are current;
+    on startup only the lines after that point are re-read.
+
+    Retention is unlimited unless `max_segments` is set, in which case the
+    oldest compacted segments are deleted.
+
+    Several worker processes can share one directory. Writes, rotation and
+    sidecar updates hold a ProcessLock, and each write first follows any
+    rotation another process made, so all processes append to the same
+    active segment. Stats are not updated on the write path: they record
+    how far into the log they are current, and when they are read (or the
+    sidecar is saved) they fold in every line written since, by any
+    process.
+    """
+
+    name = 'jsonl'
+    indexed = False
+    SEGMENT_PATTERN = re.compile(r'^audit-(\d{6})\.jsonl(\.gz)?$')
+    STATS_FILE = 'stats.json'
+
+    # Stats further behind than this try the sidecar another process saved
+    # before re-reading the log themselves
+    SIDECAR_ADOPT_BYTES = 64 * 1024
+
+    def __init__(self, directory: str, segment_bytes: int = None, max_segments: int = None,
+                 stats_flush_interval: float = 1.0, legacy_path: str = None,
+                 fsync: bool = None):
+        """
+        Open (or create) a segment directory.
+
+        Args:
+            directory: Directory holding the segments and stats sidecar
+            segment_bytes: Rotate the active segment once it reaches this size
+            max_segments: Keep at most this many segments (0 keeps everything)
+            stats_flush_interval: Minimum seconds between sidecar writes
+            legacy_path: audit_log.json to import when the directory is new
+            fsync: fsync the segment after every write (default: Config.AUDIT_FSYNC)
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes or Config.AUDIT_SEGMENT_BYTES
+        self.max_segments = Config.AUDIT_MAX_SEGMENTS if max_segments is None else max_segments
+        self.stats_flush_interval = stats_flush_interval
+        self.fsync = Config.AUDIT_FSYNC if fsync is None else fsync
+        self._compactor = None
+        self._stats_written_at = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = ProcessLock(os.path.join(self.directory, '.lock'))
+
+        with self._lock:
+            if not self._segment_numbers() and legacy_path and os.path.exists(legacy_path):
+                self._import_legacy(legacy_path)
+
+            numbers = self._segment_numbers()
+            self._segment = numbers[-1] if numbers else 1
+            if self._is_compacted(self._segment):
+                self._segment += 1
+            self._fd = self._open_segment(self._segment)
+            self._stats = self._recover_stats()
+            self._stats_segment, self._stats_offset = self._segment, os.fstat(self._fd).st_size
+            self._flush_stats(force=True)
+
+    # Segment files
+
+    def _segment_path(self, number: int, compressed: bool = False) -> str:
+        suffix = '.jsonl.gz' if compressed else '.jsonl'
+        return os.path.join(self.directory, f'audit-{number:06d}{suffix}')
+
+    def _segment_numbers(self) -> List[int]:
+        numbers = set()
+        for name in os.listdir(self.directory):
+            match = self.SEGMENT_PATTERN.match(name)
+            if match:
+                numbers.add(int(match.group(1)))
+        return sorted(numbers)
+
+    def _segment_exists(self, number: int) -> bool:
+        return (os.path.exists(self._segment_path(number))
+                or os.path.exists(self._segment_path(number, compressed=True)))
+
+    def _is_compacted(self, number: int) -> bool:
+        return (os.path.exists(self._segment_path(number, compressed=True))
+                and not os.path.exists(self._segment_path(number)))
+
+    def _open_segment(self, number: int) -> int:
+        return os.open(self._segment_path(number), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _read_segment(self, number: int, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yield the entries of one segment, starting at a byte offset."""
+        path = self._segment_path(number)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            # Compacted since it was listed
+            try:
+                f = gzip.open(self._segment_path(number, compressed=True), 'rb')
+            except FileNotFoundError:
+                return
+        with f:
+            if offset:
+                f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partially written last line
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _import_legacy(self, legacy_path: str):
+        """Copy entries from a legacy audit_log.json into the first segment."""
+        legacy = JsonAuditStorage(legacy_path)
+        with open(self._segment_path(1), 'w') as f:
+            for entry in legacy.entries():
+                f.write(json.dumps(entry, default=str, separators=(',', ':')) + '\n')
+
+        # Legacy stats count events beyond the 1,000 retained entries
+        with open(os.path.join(self.directory, self.STATS_FILE), 'w') as f:
+            json.dump({'segment': 1, 'offset': os.path.getsize(self._segment_path(1)),
+                       'stats': legacy.aggregates().to_dict()}, f)
+
+    # Stats sidecar
+
+    def _recover_stats(self) -> AuditStats:
+        """Load the sidecar and replay any lines written after it was saved."""
+        try:
+            with open(os.path.join(self.directory, self.STATS_FILE), 'r') as f:
+                sidecar = json.load(f)
+            state = sidecar['stats']
+            start_segment, start_offset = sidecar['segment'], sidecar['offset']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            state, start_segment, start_offset = AuditStats().to_dict(), 0, 0
+
+        stats = AuditStats.from_dict(state)
+        for number in self._segment_numbers():
+            if number < start_segment:
+                continue
+            offset = start_offset if number == start_segment else 0
+            for entry in self._read_segment(number, offset):
+                stats.add(entry)
+        return stats
+
+    def _flush_stats(self, force: bool = False):
+        """Write the sidecar if it is older than stats_flush_interval (lock held)."""
+        now = time.monotonic()
+        if not force and now - self._stats_written_at < self.stats_flush_interval:
+            return
+        self._catch_up()
+        path = os.path.join(self.directory, self.STATS_FILE)
+        tmp_path = f'{path}.tmp.{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            json.dump({'segment': self._stats_segment, 'offset': self._stats_offset,
+                       'stats': self._stats.to_dict()}, f)
+        os.replace(tmp_path, path)
+        self._stats_written_at = now
+
+    # Writes
+
+    def append(self, entry: Dict[str, Any]):
+        """Append one entry as a single line."""
+        self.append_many([entry])
+
+    def append_many(self, entries: List[Dict[str, Any]]):
+        """Append several entries with one write (and one fsync if enabled)."""
+        data = ''.join(json.dumps(entry, default=str, separators=(',', ':')) + '\n'
+                       for entry in entries).encode('utf-8')
+        with self._lock:
+            self._follow_rotation()
+            os.write(self._fd, data)
+            if self.fsync:
+                os.fsync(self._fd)
+
+            if os.fstat(self._fd).st_size >= self.segment_bytes:
+                self._rotate()
+            self._flush_stats()
+
+    def _follow_rotation(self):
+        """Switch to the newest segment if another process rotated (lock held)."""
+        if self._segment_exists(self._segment + 1):
+            os.close(self._fd)
+            self._segment = self._segment_numbers()[-1]
+            self._fd = self._open_segment(self._segment)
+
+    def _catch_up(self):
+        """Fold lines written since the stats were last current into them (lock held)."""
+        if self._fd is None:
+            return  # closed
+        self._follow_rotation()
+        if (self._stats_segment != self._segment
+                or os.fstat(self._fd).st_size - self._stats_offset > self.SIDECAR_ADOPT_BYTES):
+            self._adopt_sidecar()
+        for number in range(self._stats_segment, self._segment + 1):
+            offset = self._stats_offset if number == self._stats_segment else 0
+            for entry in self._read_segment(number, offset):
+                self._stats.add(entry)
+        self._stats_segment, self._stats_offset = self._segment, os.fstat(self._fd).st_size
+
+    def _adopt_sidecar(self):
+        """Take over the sidecar's stats if they are current further into the log."""
+        try:
+            with open(os.path.join(self.directory, self.STATS_FILE), 'r') as f:
+                sidecar = json.load(f)
+            position = (sidecar['segment'], sidecar['offset'])
+            state = sidecar['stats']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return
+        if position > (self._stats_segment, self._stats_offset) and 'scored_requests' in state:
+            self._stats = AuditStats.from_dict(state)
+            self._stats_segment, self._stats_offset = position
+
+    def _rotate(self):
+        """Start a new segment and compact the finished one in the background."""
+        os.close(self._fd)
+        finished = self._segment
+        self._segment += 1
+        self._fd = self._open_segment(self._segment)
+        self._flush_stats(force=True)
+
+        self._compactor = Thread(target=self._compact, args=(finished,), name='audit-compactor', daemon=True)
+        self._compactor.start()
+
+    def _compact(self, number: int):
+        """Gzip a finished segment and apply the retention limit."""
+        source = self._segment_path(number)
+        target = self._segment_path(number, compressed=True)
+        tmp_target = f'{target}.tmp'
+        try:
+            with open(source, 'rb') as src, gzip.open(tmp_target, 'wb') as dst:
+                while True:
+                    chunk = src.read(1 << 20)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+            os.replace(tmp_target, target)
+            os.remove(source)
+        except OSError as e:
+            print(f"Audit segment compaction failed for {source}: {e}")
+            return
+
+        if self.max_segments:
+            with self._lock:
+                finished = [n for n in self._segment_numbers() if n != self._segment]
+            expired = finished[:max(len(finished) - (self.max_segments - 1), 0)]
+            for old in expired:
+                for path in glob.glob(self._segment_path(old) + '*'):
+                    os.remove(path)
+
+    # Reads
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Yield every retained entry, oldest first."""
+        with self._lock:
+            numbers = self._segment_numbers()
+        for number in numbers:
+            yield from self._read_segment(number)
+
+    def entries_newest_first(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every retained entry, newest first, one segment at a time.
+
+        Only the segment being read is held in memory, so a consumer that
+        stops early (a page of the audit view) never opens older segments.
+        """
+        with self._lock:
+            numbers = self._segment_numbers()
+        for number in reversed(numbers):
+            yield from reversed(list(self._read_segment(number)))
+
+    def aggregates(self) -> AuditStats:
+        """Return the running aggregates."""
+        with self._lock:
+            self._catch_up()
+            return self._stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the running stats."""
+        with self._lock:
+            self._catch_up()
+            return self._stats.summary()
+
+    def close(self):
+        """Flush the stats sidecar and close the active segment."""
+        with self._lock:
+            if self._fd is None:
+                return
+            self._flush_stats(force=True)
+            os.close(self._fd)
+            self._fd = None
+        if self._compactor is not None:
+            self._compactor.join()
+
+
+class SqliteAuditStorage:
+    """
+    Indexed SQLite storage for large audit histories.
+
+    Every event is a row with the filterable fields in their own columns and
+    the full entry as JSON. Each filter column has an index ending in
+    (timestamp, id), so a filtered, newest-first page is an index range scan
+    that stops after `limit` rows instead of a pass over the whole history.
+    Pages can be walked with an opaque keyset cursor (the last row's
+    timestamp and id), which costs the same on page 1,000 as on page 1.
+
+    The database runs in WAL mode, so admin reads never block writers.
+    Running aggregates (totals, role/risk/score-bin counters and the
+    per-minute ring buffer) live in small tables updated in the same
+    transaction as the insert, so every worker process sees the same stats.
+    Connections are per thread and per process.
+    """
+
+    name = 'sqlite'
+    indexed = True
+
+    # Filter name -> column; each has an index on (column, timestamp, id)
+    FILTER_COLUMNS = {
+        'user': 'user',
+        'role': 'role',
+        'action': 'action',
+        'applicant_id': 'applicant_id',
+        'risk_category': 'risk_category',
+    }
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            user TEXT,
+            role TEXT,
+            action TEXT,
+            score INTEGER,
+            risk_category TEXT,
+            applicant_id TEXT,
+            entry TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_log (timestamp, id);
+        CREATE INDEX IF NOT EXISTS idx_audit_user ON audit_log (user, timestamp, id);
+        CREATE INDEX IF NOT EXISTS idx_audit_role ON audit_log (role, timestamp, id);
+        CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log (action, timestamp, id);
+        CREATE INDEX IF NOT EXISTS idx_audit_applicant ON audit_log (applicant_id, timestamp, id);
+        CREATE INDEX IF NOT EXISTS idx_audit_risk ON audit_log (risk_category, timestamp, id);
+        CREATE TABLE IF NOT EXISTS audit_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_requests INTEGER NOT NULL,
+            total_scores INTEGER NOT NULL,
+            row_count INTEGER NOT NULL,
+            scored_requests INTEGER NOT NULL DEFAULT 0,
+            min_score INTEGER,
+            max_score INTEGER
+        );
+        INSERT OR IGNORE INTO audit_stats (id, total_requests, total_scores, row_count)
+            VALUES (1, 0, 0, 0);
+        CREATE TABLE IF NOT EXISTS audit_counters (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (kind, key)
+        );
+        CREATE TABLE IF NOT EXISTS audit_minutes (
+            slot INTEGER PRIMARY KEY,
+            minute INTEGER NOT NULL,
+            requests INTEGER NOT NULL,
+            scored INTEGER NOT NULL,
+            scores INTEGER NOT NULL
+        );
+    """
+
+    INSERT_SQL = ('INSERT INTO audit_log (timestamp, user, role, action, score, risk_category, '
+                  'applicant_id, entry) VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+    UPDATE_STATS_SQL = """
+        UPDATE audit_stats SET
+            total_requests = total_requests + ?1,
+            total_scores = total_scores + ?2,
+            scored_requests = scored_requests + ?3,
+            row_count = row_count + ?4,
+            min_score = min(coalesce(min_score, ?5), coalesce(?5, min_score)),
+            max_score = max(coalesce(max_score, ?6), coalesce(?6, max_score))
+        WHERE id = 1
+    """
+    UPSERT_COUNTER_SQL = """
+        INSERT INTO audit_counters VALUES (?, ?, ?)
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count
+    """
+    # A ring slot is reset when a newer minute claims it; older minutes are ignored
+    UPSERT_MINUTE_SQL = """
+        INSERT INTO audit_minutes VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (slot) DO UPDATE SET
+            requests = CASE WHEN minute = excluded.minute THEN requests + excluded.requests
+                            WHEN minute < excluded.minute THEN excluded.requests ELSE requests END,
+            scored = CASE WHEN minute = excluded.minute THEN scored + excluded.scored
+                          WHEN minute < excluded.minute THEN excluded.scored ELSE scored END,
+            scores = CASE WHEN minute = excluded.minute THEN scores + excluded.scores
+                          WHEN minute < excluded.minute THEN excluded.scores ELSE scores END,
+            minute = max(minute, excluded.minute)
+    """
+
+    def __init__(self, path: str, legacy_path: str = None, legacy_dir: str = None,
+                 fsync: bool = None):
+        """
+        Open (or create) the database.
+
+        Args:
+            path: SQLite database file
+            legacy_path: audit_log.json to import when the database is new
+            legacy_dir: JSONL segment directory to import when the database is new
+                (preferred over legacy_path when it holds segments)
+            fsync: Sync the WAL on every commit (default: Config.AUDIT_FSYNC)
+        """
+        self.path = path
+        self.fsync = Config.AUDIT_FSYNC if fsync is None else fsync
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        is_new = not os.path.exists(self.path)
+        self._connection().executescript(self.SCHEMA)
+        if is_new:
+            self._import_legacy(legacy_path, legacy_dir)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening one if needed (also after fork)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f"PRAGMA synchronous = {'FULL' if self.fsync else 'NORMAL'}")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        with self._connections_lock:
+            self._connections.append((os.getpid(), conn))
+        return conn
+
+    def _import_legacy(self, legacy_path: str, legacy_dir: str):
+        """Copy entries and stats from the JSONL or JSON store this one replaces."""
+        legacy = None
+        if legacy_dir and os.path.isdir(legacy_dir) and any(
+                JsonlAuditStorage.SEGMENT_PATTERN.match(name) for name in os.listdir(legacy_dir)):
+            legacy = JsonlAuditStorage(legacy_dir)
+        elif legacy_path and os.path.exists(legacy_path):
+            legacy = JsonAuditStorage(legacy_path)
+        if legacy is None:
+            return
+
+        conn = self._connection()
+        batch = []
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for entry in legacy.entries():
+                batch.append(entry)
+                if len(batch) >= 10000:
+                    conn.executemany(self.INSERT_SQL, self._rows(batch))
+                    batch = []
+            conn.executemany(self.INSERT_SQL, self._rows(batch))
+            conn.execute('UPDATE audit_stats SET row_count = (SELECT COUNT(*) FROM audit_log)')
+
+            # Legacy stats may count events the legacy store no longer retains
+            self._write_aggregates(conn, legacy.aggregates())
+        legacy.close()
+
+    def _write_aggregates(self, conn: sqlite3.Connection, stats: AuditStats):
+        """Replace the stored aggregates (inside the caller's transaction)."""
+        conn.execute('UPDATE audit_stats SET total_requests = ?, total_scores = ?, scored_requests = ?, '
+                     'min_score = ?, max_score = ? WHERE id = 1',
+                     (stats.total_requests, stats.total_scores, stats.scored_requests,
+                      stats.min_score, stats.max_score))
+        conn.execute('DELETE FROM audit_counters')
+        conn.execute('DELETE FROM audit_minutes')
+        self._add_aggregates(conn, stats.to_dict())
+
+    def _add_aggregates(self, conn: sqlite3.Connection, state: Dict[str, Any]):
+        """Add the counters and ring buffer of an AuditStats state to the stored ones."""
+        counters = [('role', role, count) for role, count in state['requests_by_role'].items()]
+        counters += [('risk', category, count) for category, count in state['risk_distribution'].items()
+                     if count]
+        counters += [('bin', str(index), count) for index, count in enumerate(state['histogram'])
+                     if count]
+        conn.executemany(self.UPSERT_COUNTER_SQL, counters)
+        conn.executemany(self.UPSERT_MINUTE_SQL,
+                         [(minute % AuditStats.RING_MINUTES, minute, requests, scored, scores)
+                          for minute, requests, scored, scores in state['minutes']])
+
+    # Writes
+
+    def append(self, entry: Dict[str, Any]):
+        """Insert one entry."""
+        self.append_many([entry])
+
+    @staticmethod
+    def _rows(entries: List[Dict[str, Any]]) -> List[tuple]:
+        return [(entry.get('timestamp', ''), entry.get('user'), entry.get('role'),
+                 entry.get('action'), entry.get('score'), entry.get('risk_category'),
+                 entry.get('applicant_id'), json.dumps(entry, default=str, separators=(',', ':')))
+                for entry in entries]
+
+    def append_many(self, entries: List[Dict[str, Any]]):
+        """Insert several entries and update the aggregates in one transaction."""
+        delta = AuditStats()
+        for entry in entries:
+            delta.add(entry)
+        state = delta.to_dict()
+
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(self.INSERT_SQL, self._rows(entries))
+            conn.execute(self.UPDATE_STATS_SQL, (
+                delta.total_requests, delta.total_scores, delta.scored_requests, len(entries),
+                delta.min_score, delta.max_score))
+            self._add_aggregates(conn, state)
+
+    # Reads
+
+    def _where(self, filters: Dict[str, Any]):
+        """Build the WHERE clause and parameters for the given filters."""
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is None or value == '':
+                continue
+            if name == 'user':
+                # Case-insensitive substring match, as in the list-based stores
+                clauses.append('instr(lower(user), ?) > 0')
+                params.append(value.lower())
+            else:
+                clauses.append(f'{self.FILTER_COLUMNS[name]} = ?')
+                params.append(value)
+        return clauses, params
+
+    def query(self, limit: int = 100, offset: int = 0, cursor: str = None,
+              **filters) -> Dict[str, Any]:
+        """
+        Return one newest-first page of filtered entries.
+
+        Args:
+            limit: Page size
+            offset: Rows to skip (ignored when a cursor is given)
+            cursor: next_cursor of the previous page
+            **filters: user (substring), role, action, applicant_id, risk_category
+
+        Returns:
+            Dictionary with 'logs', 'total' (matching rows) and 'next_cursor'
+            (None on the last page)
+        """
+        clauses, params = self._where(filters)
+        conn = self._connection()
+
+        if clauses:
+            total = conn.execute(f"SELECT COUNT(*) FROM audit_log WHERE {' AND '.join(clauses)}",
+                                 params).fetchone()[0]
+        else:
+            total = conn.execute('SELECT row_count FROM audit_stats WHERE id = 1').fetchone()[0]
+
+        page_clauses, page_params = list(clauses), list(params)
+        if cursor:
+            timestamp, row_id = self._decode_cursor(cursor)
+            page_clauses.append('(timestamp, id) < (?, ?)')
+            page_params.extend([timestamp, row_id])
+            offset = 0
+
+        where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ''
+        rows = conn.execute(
+            f'SELECT id, timestamp, entry FROM audit_log {where} '
+            f'ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?',
+            page_params + [limit, offset]).fetchall()
+
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = self._encode_cursor(rows[-1][1], rows[-1][0])
+        return {
+            'logs': [json.loads(row[2]) for row in rows],
+            'total': total,
+            'next_cursor': next_cursor,
+        }
+
+    def scan(self, since: str = None, until: str = None, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Yield filtered entries oldest first, streaming from the database.
+
+        Args:
+            since: Earliest timestamp (inclusive, ISO format)
+            until: Latest timestamp (exclusive, ISO format)
+            **filters: user (substring), role, action, applicant_id, risk_category
+        """
+        clauses, params = self._where(filters)
+        if since:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        rows = self._connection().execute(
+            f'SELECT entry FROM audit_log {where} ORDER BY timestamp, id', params)
+        while True:
+            batch = rows.fetchmany(1000)
+            if not batch:
+                return
+            for (entry,) in batch:
+                yield json.loads(entry)
+
+    @staticmethod
+    def _encode_cursor(timestamp: str, row_id: int) -> str:
+        return f'{timestamp}|{row_id}'
+
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        timestamp, _, row_id = cursor.rpartition('|')
+        try:
+            return timestamp, int(row_id)
+        except ValueError:
+            raise ValueError(f"Invalid audit cursor '{cursor}'")
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Yield every entry, oldest first."""
+        for (entry,) in self._connection().execute('SELECT entry FROM audit_log ORDER BY id'):
+            yield json.loads(entry)
+
+    def aggregates(self) -> AuditStats:
+        """Load the running aggregates (a fixed number of small rows)."""
+        conn = self._connection()
+        total_requests, total_scores, scored_requests, min_score, max_score = conn.execute(
+            'SELECT total_requests, total_scores, scored_requests, min_score, max_score '
+            'FROM audit_stats WHERE id = 1').fetchone()
+        state = {
+            'total_requests': total_requests,
+            'total_scores': total_scores,
+            'scored_requests': scored_requests,
+            'min_score': min_score,
+            'max_score': max_score,
+            'requests_by_role': {},
+            'risk_distribution': {},
+            'histogram': [0] * len(AuditStats.bin_labels()),
+        }
+        for kind, key, count in conn.execute('SELECT kind, key, count FROM audit_counters'):
+            if kind == 'role':
+                state['requests_by_role'][key] = count
+            elif kind == 'risk':
+                state['risk_distribution'][key] = count
+            elif kind == 'bin' and int(key) < len(state['histogram']):
+                state['histogram'][int(key)] = count
+        state['minutes'] = conn.execute(
+            'SELECT minute, requests, scored, scores FROM audit_minutes').fetchall()
+        return AuditStats.from_dict(state)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the running stats."""
+        return self.aggregates().summary()
+
+    def close(self):
+        """Close this process's connections."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for pid, conn in connections:
+            if pid == os.getpid():
+                conn.close()
+        self._local = threading.local()
+
+
+def create_audit_storage(kind: str = None, log_path: str = None, asynchronous: bool = None):
+    """
+    Create the configured audit storage backend.
+
+    Args:
+        kind: 'jsonl' (append-only segments), 'sqlite' (indexed database)
+            or 'json' (legacy single file)
+        log_path: Path of the legacy audit_log.json
+        asynchronous: Wrap it in a background group-commit writer
+            (default: Config.AUDIT_ASYNC)
+    """
+    kind = (kind or Config.AUDIT_STORAGE).lower()
+    log_path = log_path or Config.AUDIT_LOG_PATH
+    if kind == 'json':
+        storage = JsonAuditStorage(log_path)
+    elif kind == 'jsonl':
+        storage = JsonlAuditStorage(Config.AUDIT_LOG_DIR, legacy_path=log_path)
+    elif kind == 'sqlite':
+        storage = SqliteAuditStorage(Config.AUDIT_DB_PATH, legacy_path=log_path,
+                                     legacy_dir=Config.AUDIT_LOG_DIR)
+    else:
+        raise ValueError(f"Unknown audit storage '{kind}'")
+
+    if Config.AUDIT_ASYNC if asynchronous is None else asynchronous:
+        from utils.audit_writer import AsyncAuditWriter
+        spill_dir = {'jsonl': Config.AUDIT_LOG_DIR,
+                     'sqlite': os.path.dirname(Config.AUDIT_DB_PATH)}.get(kind, os.path.dirname(log_path))
+        storage = AsyncAuditWriter(storage, spill_path=os.path.join(spill_dir, 'spill.jsonl'))
+    return storage
@@ -0,0 +1,341 @@
+"""Background group-commit writer for audit events."""
+import json
+import os
+import queue
+import time
+from collections import deque
+from threading import Lock, Thread
+from typing import Dict, Any, Iterator, List
+
+import numpy as np
+
+from config import Config
+
+
+class AsyncAuditWriter:
+    """
+    Takes audit events off the request path.
+
+    Requests only put the event on a bounded queue. A writer thread
+    collects events for up to `flush_interval_ms` after the first one (or
+    until `flush_rows` are waiting) and hands the group to the underlying
+    storage's append_many(), i.e. one write and at most one fsync per group.
+
+    When the queue is full the `full_policy` applies:
+        - block: the request waits for space
+        - drop:  the event is discarded and counted
+        - spill: the event is appended to a spill file and replayed into
+                 the storage once the queue has drained
+
+    A group the storage fails to write is spilled as well and replayed on
+    the next idle pass; it only counts as dropped if spilling fails too.
+    Spill files left by an earlier process are replayed when the writer
+    thread starts.
+
+    Reads (entries/stats) first wait for queued events to be written, so an
+    admin always sees its own and earlier requests.
+    """
+
+    POLICIES = ('block', 'drop', 'spill')
+
+    # Recent flushes kept for latency metrics
+    FLUSH_SAMPLES = 1024
+
+    def __init__(self, storage, max_queue: int = None, flush_rows: int = None,
+                 flush_interval_ms: float = None, full_policy: str = None,
+                 spill_path: str = None):
+        """
+        Initialize the writer.
+
+        Args:
+            storage: Storage backend with append_many/entries/stats/close
+            max_queue: Queue capacity
+            flush_rows: Largest group written at once
+            flush_interval_ms: Longest wait for more events after the first
+            full_policy: 'block', 'drop' or 'spill'
+            spill_path: Spill file for the 'spill' policy and for groups
+                the storage fails to write
+        """
+        self.storage = storage
+        self.name = storage.name
+        self.indexed = storage.indexed
+        self.max_queue = max_queue or Config.AUDIT_QUEUE_SIZE
+        self.flush_rows = flush_rows or Config.AUDIT_FLUSH_ROWS
+        self.flush_interval_ms = Config.AUDIT_FLUSH_INTERVAL_MS if flush_interval_ms is None else flush_interval_ms
+        self.full_policy = (full_policy or Config.AUDIT_FULL_POLICY).lower()
+        if self.full_policy not in self.POLICIES:
+            raise ValueError(f"Unknown audit queue policy '{self.full_policy}'")
+        self.spill_path = spill_path
+        if self.full_policy == 'spill' and not spill_path:
+            raise ValueError("The 'spill' policy needs a spill_path")
+
+        self._lock = Lock()
+        self._spill_lock = Lock()
+        self._pid = None
+        self._closed = False
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._dropped = 0
+        self._spilled = 0
+        self._replay_pending = False
+        self._flushes = 0
+        self._events = 0
+        self._errors = 0
+        self._max_queue_depth = 0
+        self._flush_ms = deque(maxlen=self.FLUSH_SAMPLES)
+
+    def _ensure_worker(self):
+        """Start the writer thread (again, after a fork) if needed."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads do not survive fork(): every process gets its own queue and thread
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._reset_metrics()
+            self._closed = False
+            self._thread = Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    # Writes
+
+    def append(self, entry: Dict[str, Any]):
+        """Queue one event according to the full-queue policy."""
+        self._ensure_worker()
+        if self._closed:
+            self.storage.append(entry)
+            return
+
+        if self.full_policy == 'block':
+            self._queue.put(entry)
+        else:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                if self.full_policy == 'drop':
+                    self._dropped += 1
+                else:
+                    self._spill(entry)
+
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+
+    def append_many(self, entries: List[Dict[str, Any]]):
+        for entry in entries:
+            self.append(entry)
+
+    def _spill(self, entry: Dict[str, Any]):
+        self._spill_many([entry])
+
+    def _spill_many(self, entries: List[Dict[str, Any]]):
+        lines = ''.join(json.dumps(entry, default=str, separators=(',', ':')) + '\n' for entry in entries)
+        with self._spill_lock:
+            with open(self.spill_path, 'a') as f:
+                f.write(lines)
+            self._spilled += len(entries)
+
+    def _orphaned_replays(self) -> List[str]:
+        """Replay files of processes that exited before finishing them."""
+        prefix = os.path.basename(self.spill_path) + '.replay.'
+        orphans = []
+        for name in os.listdir(os.path.dirname(self.spill_path) or '.'):
+            pid = name[len(prefix):]
+            if not name.startswith(prefix) or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                orphans.append(os.path.join(os.path.dirname(self.spill_path), name))
+            except PermissionError:
+                pass
+        return orphans
+
+    def _replay_startup(self):
+        """Replay spill files left by an earlier (or crashed) process."""
+        if not self.spill_path:
+            return
+        replay_path = f'{self.spill_path}.replay.{os.getpid()}'
+        for orphan in self._orphaned_replays():
+            if os.path.exists(replay_path) and not self._replay_file(replay_path):
+                break
+            try:
+                os.replace(orphan, replay_path)
+            except FileNotFoundError:
+                # Another worker adopted it first
+                continue
+        self._replay_pending = not self._replay_spill()
+
+    def _replay_spill(self) -> bool:
+        """
+        Move spilled events into the storage once the queue is idle.
+
+        A replay file left by a failed pass is retried first; new spills wait
+        in the spill file until it is gone. On a write error the events not
+        yet written stay in the replay file for the next idle pass.
+
+        Returns:
+            False if events are still waiting in the replay file
+        """
+        if not self.spill_path:
+            return True
+        replay_path = f'{self.spill_path}.replay.{os.getpid()}'
+        if os.path.exists(replay_path) and not self._replay_file(replay_path):
+            return False
+        with self._spill_lock:
+            try:
+                os.replace(self.spill_path, replay_path)
+            except FileNotFoundError:
+                return True
+        return self._replay_file(replay_path)
+
+    def _replay_file(self, replay_path: str) -> bool:
+        entries = []
+        with open(replay_path, 'r') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print(f"Skipping unreadable audit spill line in {replay_path}")
+        for start in range(0, len(entries), self.flush_rows):
+            try:
+                self.storage.append_many(entries[start:start + self.flush_rows])
+            except Exception as e:
+                self._errors += 1
+                print(f"Audit writer failed to replay {len(entries) - start} spilled events: {e}")
+                remaining = ''.join(json.dumps(entry, default=str, separators=(',', ':')) + '\n'
+                                    for entry in entries[start:])
+                with open(f'{replay_path}.tmp', 'w') as f:
+                    f.write(remaining)
+                os.replace(f'{replay_path}.tmp', replay_path)
+                return False
+        os.remove(replay_path)
+        return True
+
+    def _run(self):
+        """Writer loop: collect a group, write it, mark it done."""
+        try:
+            self._replay_startup()
+        except Exception as e:
+            self._errors += 1
+            self._replay_pending = True
+            print(f"Audit writer failed to replay spilled events: {e}")
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                return
+            group = [first]
+            deadline = time.perf_counter() + self.flush_interval_ms / 1000
+            stop = False
+            while len(group) < self.flush_rows:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                group.append(item)
+
+            self._write_group(group)
+            # Replay before marking the group done, so flush() also waits for it
+            if not stop and self._queue.empty() and (self._spilled or self._replay_pending):
+                try:
+                    self._replay_pending = not self._replay_spill()
+                except Exception as e:
+                    self._errors += 1
+                    self._replay_pending = True
+                    print(f"Audit writer failed to replay spilled events: {e}")
+            for _ in range(len(group) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write_group(self, group: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        try:
+            self.storage.append_many(group)
+        except Exception as e:
+            self._errors += 1
+            if not self.spill_path:
+                self._dropped += len(group)
+                print(f"Audit writer failed to write {len(group)} events, dropped them: {e}")
+                return
+            print(f"Audit writer failed to write {len(group)} events, spilling them for replay: {e}")
+            try:
+                self._spill_many(group)
+            except Exception as spill_error:
+                self._dropped += len(group)
+                print(f"Audit writer failed to spill {len(group)} events, dropped them: {spill_error}")
+            return
+        self._flush_ms.append((time.perf_counter() - start) * 1000)
+        self._flushes += 1
+        self._events += len(group)
+
+    def flush(self):
+        """Block until every queued event has been written."""
+        if self._pid == os.getpid() and not self._closed:
+            self._queue.join()
+
+    def close(self):
+        """Flush queued and spilled events, stop the thread, close the storage."""
+        if self._pid == os.getpid() and not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        try:
+            self._replay_spill()
+        except Exception as e:
+            self._errors += 1
+            print(f"Audit writer failed to replay spilled events: {e}")
+        self.storage.close()
+
+    # Reads
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        self.flush()
+        return self.storage.entries()
+
+    def entries_newest_first(self) -> Iterator[Dict[str, Any]]:
+        self.flush()
+        return self.storage.entries_newest_first()
+
+    def stats(self) -> Dict[str, Any]:
+        self.flush()
+        return self.storage.stats()
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        self.flush()
+        return self.storage.query(**kwargs)
+
+    def scan(self, **kwargs) -> Iterator[Dict[str, Any]]:
+        self.flush()
+        return self.storage.scan(**kwargs)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue depth, drop/spill counters and flush latency."""
+        flush_ms = np.array(self._flush_ms) if self._flush_ms else np.zeros(1)
+        running = self._pid == os.getpid() and not self._closed
+        return {
+            'storage': self.name,
+            'policy': self.full_policy,
+            'queue_depth': self._queue.qsize() if running else 0,
+            'max_queue_depth': self._max_queue_depth,
+            'queue_capacity': self.max_queue,
+            'events_written': self._events,
+            'flushes': self._flushes,
+            'avg_group_size': round(self._events / self._flushes, 2) if self._flushes else 0,
+            'dropped': self._dropped,
+            'spilled': self._spilled,
+            'write_errors': self._errors,
+            'flush_ms': {
+                'p50': round(float(np.percentile(flush_ms, 50)), 3),
+                'p99': round(float(np.percentile(flush_ms, 99)), 3),
+                'max': round(float(flush_ms.max()), 3),
+            },
+        }
@@ -0,0 +1,101 @@
+"""Thread-safe LRU cache with a time-to-live."""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry when full and
+    treats entries older than `ttl_seconds` as missing.
+
+    Values are returned as stored, so callers must not mutate them.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Largest number of entries kept (0 disables the cache)
+            ttl_seconds: Age after which an entry expires (0 or less: never)
+        """
+        self.max_entries = max(int(max_entries), 0)
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything."""
+        return self.max_entries > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the live value for `key`, marking it recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            stored_at, value = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, age_seconds: float = 0.0):
+        """
+        Store `value`, evicting least recently used entries beyond max_entries.
+
+        Args:
+            key: Entry key
+            value: Entry value
+            age_seconds: How old the value already is (when restoring saved entries)
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() - age_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """Return (key, value, age in seconds) for every live entry, least recent first."""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value, now - stored_at) for key, (stored_at, value) in self._entries.items()
+                    if self.ttl_seconds <= 0 or now - stored_at <= self.ttl_seconds]
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return size, hit/miss/eviction counters and the hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
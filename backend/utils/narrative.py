@@ -0,0 +1,497 @@
+"""Off-request narrative generation with a latency budget, circuit breaker and cache."""
+import json
+import os
+import re
+import secrets
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import Lock
+from typing import Dict, Any, Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from utils.audit_storage import ProcessLock
+from utils.lru_cache import LRUCache
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for a while.
+
+    Closed: calls go through. After `failures` consecutive failures the
+    breaker opens and rejects calls for `reset_seconds`; then it lets a
+    single trial call through (half-open), which closes it on success or
+    opens it again on failure.
+    """
+
+    def __init__(self, failures: int, reset_seconds: float):
+        self.failures = max(int(failures), 1)
+        self.reset_seconds = reset_seconds
+        self._lock = Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half_open'."""
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._trial or time.monotonic() - self._opened_at >= self.reset_seconds:
+                return 'half_open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the trial call when half-open)."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or self._consecutive >= self.failures:
+                if self._opened_at is None or self._trial:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+class NarrativeClient:
+    """
+    Calls the narrative model without holding up score requests.
+
+    Calls run on a small dedicated thread pool and share one pooled
+    requests.Session, so connections are reused. The request thread waits
+    at most `budget_ms` for the text; after that the caller falls back to
+    the template narrative and gets a narrative id. The call carries on in
+    the background and its text can be fetched with result(id) until it
+    expires. Late results are also written to `results_dir`, one file per
+    id, so any worker process can answer for them. A circuit breaker skips the service after repeated failures,
+    and at most `max_pending` calls are in flight at once.
+    """
+
+    # Recent in-budget call latencies kept for metrics
+    LATENCY_SAMPLES = 1024
+
+    # Narrative ids are secrets.token_urlsafe() strings; anything else is never a file name
+    ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+    # Result files written between sweeps of expired ones
+    SWEEP_EVERY = 256
+
+    def __init__(self, url: str = None, api_key: str = None, workers: int = None,
+                 budget_ms: float = None, timeout_seconds: float = None,
+                 max_pending: int = None, breaker_failures: int = None,
+                 breaker_reset_seconds: float = None, results_dir: str = None):
+        """
+        Initialize the client.
+
+        Args:
+            url: Text-generation endpoint (HuggingFace Inference API format)
+            api_key: Bearer token sent with each call
+            workers: Threads (and pooled connections) for outbound calls
+            budget_ms: Longest a request waits for the text
+            timeout_seconds: HTTP timeout of one background call
+            max_pending: Most calls queued or in flight; more are skipped
+            breaker_failures: Consecutive failures that open the breaker
+            breaker_reset_seconds: How long the breaker stays open
+            results_dir: Directory shared by the workers for late results
+                ('' keeps them in this process only)
+        """
+        self.url = url or Config.HUGGINGFACE_API_URL
+        self.api_key = Config.HUGGINGFACE_API_KEY if api_key is None else api_key
+        self.workers = workers or Config.NARRATIVE_WORKERS
+        self.budget_ms = Config.NARRATIVE_BUDGET_MS if budget_ms is None else budget_ms
+        self.timeout_seconds = timeout_seconds or Config.NARRATIVE_TIMEOUT_SECONDS
+        self.max_pending = max_pending or Config.NARRATIVE_MAX_PENDING
+        self.breaker = CircuitBreaker(breaker_failures or Config.NARRATIVE_BREAKER_FAILURES,
+                                      Config.NARRATIVE_BREAKER_RESET_SECONDS
+                                      if breaker_reset_seconds is None else breaker_reset_seconds)
+        self.results = LRUCache(Config.NARRATIVE_RESULTS, Config.NARRATIVE_RESULT_TTL_SECONDS)
+        self.results_dir = Config.NARRATIVE_RESULTS_DIR if results_dir is None else results_dir
+        self._late = set()  # ids answered as pending whose outcome goes to results_dir
+        self._stored = 0
+        self._lock = Lock()
+        self._pid = None
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._pending = 0
+        self._inflight = {}  # key -> (narrative_id, future) of calls in flight
+        self._counts = {'calls': 0, 'joined': 0, 'in_budget': 0, 'late': 0, 'failed': 0,
+                        'circuit_open': 0, 'overloaded': 0}
+        self._latency_ms = deque(maxlen=self.LATENCY_SAMPLES)
+
+    def _ensure_pool(self):
+        """Create the executor and session (again, after a fork) if needed."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads and sockets do not survive fork(): every process gets its own
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='narrative')
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+            self._session.headers.update({'Authorization': f'Bearer {self.api_key}',
+                                          'Content-Type': 'application/json'})
+            self._reset_metrics()
+            self._pid = os.getpid()
+
+    def generate(self, prompt: str, key: Hashable = None,
+                 on_result: Callable[[str], None] = None) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Ask for a narrative, waiting at most the latency budget.
+
+        Args:
+            prompt: Prompt sent to the model
+            key: Identifies equivalent prompts; while a call for the same key
+                is in flight, later requests wait on it instead of calling again
+            on_result: Called with the text when the call succeeds, even after
+                the budget has run out
+
+        Returns:
+            Tuple of (text or None, status): status has 'narrative_status' -
+            'ready', 'pending' (with 'narrative_id' for result()), 'failed',
+            'circuit_open' or 'overloaded'
+        """
+        self._ensure_pool()
+        with self._lock:
+            inflight = self._inflight.get(key) if key is not None else None
+            if inflight is not None:
+                self._counts['joined'] += 1
+            elif self._pending >= self.max_pending:
+                self._counts['overloaded'] += 1
+                return None, {'narrative_status': 'overloaded'}
+            elif not self.breaker.allow():
+                self._counts['circuit_open'] += 1
+                return None, {'narrative_status': 'circuit_open'}
+            else:
+                self._pending += 1
+                self._counts['calls'] += 1
+                narrative_id = secrets.token_urlsafe(16)
+                self.results.put(narrative_id, {'status': 'pending'})
+                # _run removes the key under this lock, so it cannot finish before it is added
+                inflight = (narrative_id, self._executor.submit(self._run, narrative_id, prompt, key, on_result))
+                if key is not None:
+                    self._inflight[key] = inflight
+        return self._wait(*inflight)
+
+    def _wait(self, narrative_id: str, future) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Wait for a call within the budget."""
+        start = time.perf_counter()
+        try:
+            text = future.result(timeout=self.budget_ms / 1000)
+        except FutureTimeoutError:
+            with self._lock:
+                self._counts['late'] += 1
+                # Under the lock _run cannot record the outcome in between, so the
+                # file ends up with the final status whichever finishes first
+                self._late.add(narrative_id)
+                self._store(narrative_id, self.results.get(narrative_id))
+            return None, {'narrative_status': 'pending', 'narrative_id': narrative_id}
+        except Exception:
+            return None, {'narrative_status': 'failed'}
+
+        with self._lock:
+            self._counts['in_budget'] += 1
+            self._latency_ms.append((time.perf_counter() - start) * 1000)
+        return text, {'narrative_status': 'ready'}
+
+    def _call(self, prompt: str) -> str:
+        """POST the prompt and return the generated text (raises on any failure)."""
+        response = self._session.post(self.url, json={'inputs': prompt, 'parameters': {'max_new_tokens': 150}},
+                                      timeout=self.timeout_seconds)
+        response.raise_for_status()
+        result = response.json()
+        if not isinstance(result, list) or not result or not result[0].get('generated_text'):
+            raise ValueError(f"Unexpected narrative response: {str(result)[:200]}")
+        text = result[0]['generated_text']
+        # Extract only the generated part (after the prompt)
+        if prompt in text:
+            text = text[len(prompt):].strip()
+        return text
+
+    def _run(self, narrative_id: str, prompt: str, key: Hashable,
+             on_result: Optional[Callable[[str], None]]) -> str:
+        """Make one call and record its outcome on the breaker and in the results."""
+        try:
+            text = self._call(prompt)
+        except Exception as e:
+            self.breaker.record_failure()
+            self._record(narrative_id, {'status': 'failed'})
+            print(f"AI narrative generation failed: {e}")
+            self._done(key, failed=True)
+            raise
+        self.breaker.record_success()
+        self._record(narrative_id, {'status': 'ready', 'narrative': text})
+        if on_result is not None:
+            try:
+                on_result(text)
+            except Exception as e:
+                print(f"Narrative result callback failed: {e}")
+        self._done(key)
+        return text
+
+    def _record(self, narrative_id: str, result: Dict[str, Any]):
+        """Keep a call's outcome, and share it with the other workers if it was late."""
+        with self._lock:
+            self.results.put(narrative_id, result)
+            if narrative_id in self._late:
+                self._late.discard(narrative_id)
+                self._store(narrative_id, result)
+
+    def _path(self, narrative_id: str) -> str:
+        return os.path.join(self.results_dir, f'{narrative_id}.json')
+
+    def _store(self, narrative_id: str, result: Optional[Dict[str, Any]]):
+        """Atomically write a result file for the other workers."""
+        if not self.results_dir or result is None:
+            return
+        path = self._path(narrative_id)
+        tmp_path = f'{path}.tmp.{os.getpid()}'
+        try:
+            os.makedirs(self.results_dir, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(dict(result, saved_at=time.time()), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not save narrative result to {self.results_dir}: {e}")
+            return
+        self._stored += 1
+        if self._stored % self.SWEEP_EVERY == 0:
+            self._sweep()
+
+    def _sweep(self):
+        """Delete result files older than the result TTL."""
+        cutoff = time.time() - self.results.ttl_seconds
+        try:
+            with os.scandir(self.results_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError:
+            pass  # another worker swept the same file
+
+    def _load(self, narrative_id: str) -> Optional[Dict[str, Any]]:
+        """Read a result another worker stored, or None if missing or expired."""
+        if not self.results_dir or not self.ID_PATTERN.match(narrative_id):
+            return None
+        try:
+            with open(self._path(narrative_id), 'r') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        saved_at = result.pop('saved_at', 0)
+        if self.results.ttl_seconds > 0 and time.time() - saved_at > self.results.ttl_seconds:
+            return None
+        return result
+
+    def _done(self, key: Hashable, failed: bool = False):
+        with self._lock:
+            self._pending -= 1
+            if failed:
+                self._counts['failed'] += 1
+            if key is not None:
+                self._inflight.pop(key, None)
+
+    def result(self, narrative_id: str) -> Optional[Dict[str, Any]]:
+        """Return {'status', 'narrative'} for a narrative id, or None if unknown or expired."""
+        result = self.results.get(narrative_id)
+        if result is None:
+            result = self._load(narrative_id)
+        return result
+
+    def close(self):
+        """Wait for calls in flight and release the threads and connections."""
+        if self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._session.close()
+            self._pid = None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return call outcome counters, breaker state and in-budget latency percentiles."""
+        with self._lock:
+            latencies = np.array(self._latency_ms)
+            metrics = dict(self._counts, pending=self._pending)
+        metrics['breaker'] = {'state': self.breaker.state, 'opened': self.breaker.opened}
+        metrics['budget_ms'] = self.budget_ms
+        metrics['latency_ms'] = {
+            'p50': round(float(np.percentile(latencies, 50)), 2),
+            'p99': round(float(np.percentile(latencies, 99)), 2),
+            'max': round(float(latencies.max()), 2),
+        } if len(latencies) else {}
+        metrics['results'] = dict(self.results.metrics(), shared_dir=self.results_dir or None)
+        return metrics
+
+
+class NarrativeCache:
+    """
+    AI narratives keyed by the assessment signature that shaped their prompt.
+
+    The signature is (score bucket, category, positive factors, negative
+    factors, top improvement action), with factor strings stripped and
+    lowercased. The exact score is stored as a placeholder, so a narrative
+    generated for 683 reads 687 when reused for 687. Entries live in a
+    bounded LRU with a TTL; with a path, each new entry is also appended to
+    a JSONL file that is read back (and compacted) on startup. Appends and
+    compaction hold a ProcessLock, so worker processes sharing the file do
+    not lose each other's entries.
+    """
+
+    SCORE_PLACEHOLDER = '{score}'
+
+    # The score as a number of its own: not part of 7000, 1,700 or 3.700
+    SCORE_TOKEN = r'(?<![\w$.,]){score}(?![\w]|[.,]\d)'
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None,
+                 path: str = None, score_bucket: int = None):
+        """
+        Initialize the cache, loading saved entries if a path is set.
+
+        Args:
+            max_entries: Largest number of narratives kept (0 disables the cache)
+            ttl_seconds: Age after which a narrative is generated again
+            path: JSONL file to persist narratives to ('' keeps them in memory only)
+            score_bucket: Width of the score ranges sharing a narrative
+        """
+        self.cache = LRUCache(Config.NARRATIVE_CACHE_SIZE if max_entries is None else max_entries,
+                              Config.NARRATIVE_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds)
+        self.path = Config.NARRATIVE_CACHE_PATH if path is None else path
+        self.score_bucket = max(int(score_bucket or Config.NARRATIVE_SCORE_BUCKET), 1)
+        self._file_lock = ProcessLock(f'{self.path}.lock') if self.path else Lock()
+        self.loaded = 0
+        if self.path and self.cache.enabled:
+            self._load()
+
+    def signature(self, score: int, category: str, explanations: Dict[str, List[str]],
+                  improvements: List[Dict[str, Any]]) -> Tuple:
+        """Normalize everything the narrative prompt depends on into a hashable key."""
+        def normalize(factors):
+            return tuple(factor.strip().lower() for factor in factors)
+
+        return (
+            int(score) // self.score_bucket * self.score_bucket,
+            category,
+            normalize(explanations.get('positive', ['Good standing'])),
+            normalize(explanations.get('negative', ['None significant'])),
+            (improvements[0]['action'] if improvements else 'Maintain current habits').strip().lower(),
+        )
+
+    def get(self, signature: Tuple, score: int) -> Optional[str]:
+        """Return the cached narrative for the signature, worded for `score`."""
+        text = self.cache.get(signature)
+        if text is None:
+            return None
+        try:
+            return text.format(score=int(score))
+        except (IndexError, KeyError, ValueError):
+            return None  # saved before braces were escaped; generate it again
+
+    def put(self, signature: Tuple, score: int, text: str):
+        """Store a narrative generated for `score` (and append it to the file)."""
+        if not self.cache.enabled:
+            return
+        # Escape literal braces so only the placeholder is filled in by get()
+        text = text.replace('{', '{{').replace('}', '}}')
+        text = re.sub(self.SCORE_TOKEN.format(score=int(score)), self.SCORE_PLACEHOLDER, text)
+        self.cache.put(signature, text)
+        if self.path:
+            self._append([{'signature': signature, 'narrative': text, 'saved_at': time.time()}])
+
+    @staticmethod
+    def _lines(records: List[Dict[str, Any]]) -> str:
+        return ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+
+    def _append(self, records: List[Dict[str, Any]]):
+        try:
+            with self._file_lock:
+                with open(self.path, 'a') as f:
+                    f.write(self._lines(records))
+        except OSError as e:
+            print(f"Could not save narrative cache to {self.path}: {e}")
+
+    def _load(self):
+        """Restore unexpired narratives and compact the file, holding the file lock."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with self._file_lock:
+                self._read_and_compact()
+        except OSError as e:
+            print(f"Could not load narrative cache from {self.path}: {e}")
+
+    def _read_and_compact(self):
+        """Read the file; rewrite it without stale or corrupt lines if it has any."""
+        now = time.time()
+        lines = 0
+        with open(self.path, 'r') as f:
+            for line in f:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                    signature = tuple(tuple(part) if isinstance(part, list) else part
+                                      for part in record['signature'])
+                    age = now - float(record['saved_at'])
+                    narrative = record['narrative']
+                except (ValueError, KeyError, TypeError):
+                    continue  # partial or corrupt line
+                if self.cache.ttl_seconds <= 0 or age <= self.cache.ttl_seconds:
+                    self.cache.put(signature, narrative, age_seconds=max(age, 0.0))
+        self.loaded = len(self.cache)
+
+        if lines > len(self.cache):
+            # Keep only the live entries (oldest first, so ages survive the next load);
+            # the lock keeps other workers from appending between the read and the replace
+            tmp_path = f'{self.path}.tmp.{os.getpid()}'
+            with open(tmp_path, 'w') as f:
+                f.write(self._lines([{'signature': signature, 'narrative': narrative, 'saved_at': now - age}
+                                     for signature, narrative, age in self.cache.items()]))
+            os.replace(tmp_path, self.path)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the LRU counters plus the persistence settings."""
+        return dict(self.cache.metrics(), path=self.path or None, loaded=self.loaded,
+                    score_bucket=self.score_bucket)
+
+
+# Singleton instance
+_client = None
+
+
+def get_narrative_client() -> NarrativeClient:
+    """Get or create the singleton narrative client instance."""
+    global _client
+    if _client is None:
+        _client = NarrativeClient()
+    return _client
+
+
+_cache = None
+
+
+def get_narrative_cache() -> NarrativeCache:
+    """Get or create the singleton narrative cache instance."""
+    global _cache
+    if _cache is None:
+        _cache = NarrativeCache()
+    return _cache
@@ -1,9 +1,9 @@
 """Role-based recommendation engine."""
 import os
-import requests
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 from config import Config
+from utils.narrative import get_narrative_cache, get_narrative_client
 
 
 class RecommendationEngine:
@@ -52,7 +52,7 @@ class RecommendationEngine:
             Citizen-focused recommendations
         """
         # Generate narrative explanation
-        narrative = self._generate_narrative(score, category, explanations, improvements)
+        narrative, narrative_status = self._generate_narrative(score, category, explanations, improvements)
 
         # Financial literacy tips based on category
         tips = self._get_financial_tips(category, explanations.get('negative', []))
@@ -62,6 +62,7 @@ class RecommendationEngine:
 
         return {
             'narrative': narrative,
+            **narrative_status,
             'tips': tips,
             'next_steps': next_steps,
             'score_context': self._get_score_context(score, category)
@@ -114,23 +115,41 @@ class RecommendationEngine:
 
     def _generate_narrative(self, score: int, category: str,
                             explanations: Dict[str, List[str]],
-                            improvements: List[Dict[str, Any]]) -> str:
-        """Generate plain-language narrative explanation."""
+                            improvements: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Generate plain-language narrative explanation.
+
+        Returns:
+            Tuple of (narrative, status fields for the response; empty
+            without a HuggingFace API key)
+        """
         # Try HuggingFace API if key is available
         if Config.HUGGINGFACE_API_KEY:
-            narrative = self._generate_ai_narrative(score, category, explanations, improvements)
+            narrative, status = self._generate_ai_narrative(score, category, explanations, improvements)
             if narrative:
-                return narrative
+                return narrative, dict(status, narrative_source='ai')
+            # Fallback to template-based narrative (a late AI one can be fetched by id)
+            return (self._generate_template_narrative(score, category, explanations, improvements),
+                    dict(status, narrative_source='template'))
 
         # Fallback to template-based narrative
-        return self._generate_template_narrative(score, category, explanations, improvements)
+        return self._generate_template_narrative(score, category, explanations, improvements), {}
 
     def _generate_ai_narrative(self, score: int, category: str,
                                 explanations: Dict[str, List[str]],
-                                improvements: List[Dict[str, Any]]) -> str:
-        """Generate narrative using HuggingFace API."""
-        try:
-            prompt = f"""Given the following credit assessment:
+                                improvements: List[Dict[str, Any]]) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Generate narrative using HuggingFace API, within the narrative latency budget.
+
+        Assessments with the same signature reuse a cached narrative without a call.
+        """
+        cache = get_narrative_cache()
+        signature = cache.signature(score, category, explanations, improvements)
+        narrative = cache.get(signature, score)
+        if narrative is not None:
+            return narrative, {'narrative_status': 'ready', 'narrative_cached': True}
+
+        prompt = f"""Given the following credit assessment:
 - Credit Score: {score}
 - Risk Category: {category}
 - Positive Factors: {', '.join(explanations.get('positive', ['Good standing']))}
@@ -139,31 +158,8 @@ class RecommendationEngine:
 
 Generate a 2-3 sentence plain-language explanation suitable for a borrower with limited financial literacy. Be encouraging but honest."""
 
-            headers = {
-                'Authorization': f'Bearer {Config.HUGGINGFACE_API_KEY}',
-                'Content-Type': 'application/json'
-            }
-
-            response = requests.post(
-                f'https://api-inference.huggingface.co/models/{Config.HUGGINGFACE_MODEL}',
-                headers=headers,
-                json={'inputs': prompt, 'parameters': {'max_new_tokens': 150}},
-                timeout=10
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    text = result[0].get('generated_text', '')
-                    # Extract only the generated part (after the prompt)
-                    if prompt in text:
-                        text = text[len(prompt):].strip()
-                    return text
-
-        except Exception as e:
-            print(f"AI narrative generation failed: {e}")
-
-        return None
+        return get_narrative_client().generate(prompt, key=signature,
+                                               on_result=lambda text: cache.put(signature, score, text))
 
     def _generate_template_narrative(self, score: int, category: str,
                                       explanations: Dict[str, List[str]],
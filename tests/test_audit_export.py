@@ -0,0 +1,105 @@
+import unittest
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from app import create_app
+from utils import audit_logger
+from utils.audit_logger import AuditLogger
+from utils.audit_storage import JsonlAuditStorage, SqliteAuditStorage
+from utils.audit_export import export_chunks
+
+
+def event(i):
+    timestamp = (datetime(2024, 1, 1) + timedelta(hours=3 * i)).isoformat()
+    return {'timestamp': timestamp, 'user': f'u{i % 3}@test.com',
+            'role': 'bank' if i % 2 else 'citizen', 'action': 'score_request', 'score': 600 + i,
+            'risk_category': 'Good', 'applicant_id': f'A{i}', 'additional_data': {'n': i}}
+
+
+class TestAuditExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.previous_logger = audit_logger._logger
+        self.client = create_app().test_client()
+        token = self.client.post('/api/auth/login', json={
+            'email': 'admin@test.com', 'password': 'password'}).get_json()['token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        if audit_logger._logger is not self.previous_logger:
+            audit_logger._logger.storage.close()
+        audit_logger._logger = self.previous_logger
+        self.tmp.cleanup()
+
+    def _use_storage(self, storage):
+        audit_logger._logger = AuditLogger(storage=storage)
+        storage.append_many([event(i) for i in range(200)])
+
+    def _export(self, query):
+        response = self.client.get(f'/api/admin/export?{query}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        return response
+
+    def test_formats_and_filters_match_on_every_storage(self):
+        """ndjson, csv and json exports return the same filtered rows from each store."""
+        stores = [lambda: JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')),
+                  lambda: SqliteAuditStorage(os.path.join(self.tmp.name, 'audit.db'))]
+        query = 'role=bank&since=2024-01-05&until=2024-01-20T00:00:00'
+        expected = [event(i) for i in range(200) if i % 2
+                    and '2024-01-05' <= event(i)['timestamp'] < '2024-01-20T00:00:00']
+
+        for factory in stores:
+            self._use_storage(factory())
+            ndjson = self._export(f'format=ndjson&{query}').get_data(as_text=True)
+            rows = [json.loads(line) for line in ndjson.splitlines()]
+            self.assertEqual(sorted(r['applicant_id'] for r in rows),
+                             sorted(e['applicant_id'] for e in expected))
+            self.assertEqual([r['timestamp'] for r in rows], sorted(r['timestamp'] for r in rows))
+
+            reader = csv.DictReader(io.StringIO(self._export(f'format=csv&{query}').get_data(as_text=True)))
+            csv_rows = list(reader)
+            self.assertEqual([r['applicant_id'] for r in csv_rows], [r['applicant_id'] for r in rows])
+            self.assertEqual(json.loads(csv_rows[0]['additional_data']), rows[0]['additional_data'])
+
+            document = json.loads(self._export(query).get_data(as_text=True))
+            self.assertEqual(document['logs'], rows)
+            self.assertEqual(document['stats']['total_filtered'], len(rows))
+            audit_logger._logger.storage.close()
+
+    def test_gzip_export(self):
+        self._use_storage(JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')))
+        response = self._export('format=ndjson&gzip=true&action=score_request')
+        self.assertIn('audit_logs.ndjson.gz', response.headers['Content-Disposition'])
+        lines = gzip.decompress(response.get_data()).decode().splitlines()
+        self.assertEqual(len(lines), 200)
+
+    def test_invalid_parameters(self):
+        self._use_storage(JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')))
+        for query in ('format=xml', 'since=yesterday'):
+            response = self.client.get(f'/api/admin/export?{query}', headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+
+
+class TestExportChunks(unittest.TestCase):
+    def test_first_chunk_is_sent_before_rows_are_read(self):
+        """The header goes out before the log generator is advanced."""
+        def logs():
+            raise AssertionError('read too early')
+            yield
+
+        chunks = export_chunks(logs(), 'csv')
+        self.assertTrue(next(chunks).startswith(b'timestamp,user,role'))
+
+
+if __name__ == '__main__':
+    unittest.main()
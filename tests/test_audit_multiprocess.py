@@ -0,0 +1,102 @@
+import unittest
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils.audit_storage import JsonAuditStorage, JsonlAuditStorage, SqliteAuditStorage
+from utils.audit_writer import AsyncAuditWriter
+
+WORKERS = 4
+
+
+def event(worker, i):
+    return {'timestamp': '2024-01-01T00:00:00', 'user': f'w{worker}@test.com', 'role': 'bank',
+            'action': 'score_request', 'score': 700, 'applicant_id': f'{worker}-{i}'}
+
+
+def write_events(storage, worker, count):
+    """Worker process body: log `count` events, then flush and close."""
+    for i in range(count):
+        storage.append(event(worker, i))
+    storage.close()
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+class TestMultiProcessAuditLogging(unittest.TestCase):
+    """Several forked workers share one storage object created before the fork, as with serve.py."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.context = multiprocessing.get_context('fork')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run_workers(self, storage, count, workers=WORKERS) -> float:
+        processes = [self.context.Process(target=write_events, args=(storage, worker, count))
+                     for worker in range(workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        return time.perf_counter() - start
+
+    def _assert_complete(self, storage, count, workers=WORKERS):
+        ids = [entry['applicant_id'] for entry in storage.entries()]
+        expected = {f'{worker}-{i}' for worker in range(workers) for i in range(count)}
+        self.assertEqual(len(ids), len(expected))
+        self.assertEqual(set(ids), expected)
+        self.assertEqual(storage.stats()['total_requests'], len(expected))
+
+    def test_jsonl_workers_lose_nothing_across_rotations(self):
+        directory = os.path.join(self.tmp.name, 'audit')
+        factory = lambda: JsonlAuditStorage(directory, segment_bytes=16 * 1024, stats_flush_interval=0)
+        parent = factory()
+        self._run_workers(AsyncAuditWriter(parent, flush_interval_ms=1), 1500)
+
+        self.assertGreater(len(os.listdir(directory)), 10)
+        # The parent's view catches up with the workers' writes and rotations ...
+        self._assert_complete(parent, 1500)
+        parent.close()
+        # ... and so does a fresh process reading the sidecar
+        reopened = factory()
+        self._assert_complete(reopened, 1500)
+        reopened.close()
+
+    def test_json_workers_lose_nothing(self):
+        storage = JsonAuditStorage(os.path.join(self.tmp.name, 'audit_log.json'))
+        self._run_workers(storage, 50)
+        self._assert_complete(storage, 50)
+
+    def test_sqlite_workers_lose_nothing(self):
+        storage = SqliteAuditStorage(os.path.join(self.tmp.name, 'audit.db'))
+        self._run_workers(AsyncAuditWriter(storage, flush_interval_ms=1), 500)
+        self._assert_complete(storage, 500)
+        storage.close()
+
+    def test_jsonl_throughput_does_not_collapse_under_contention(self):
+        """Aggregate write rate with several workers stays close to a single worker's."""
+        count = 2000
+        single = JsonlAuditStorage(os.path.join(self.tmp.name, 'single'))
+        single_seconds = self._run_workers(single, count * WORKERS, workers=1)
+        shared = JsonlAuditStorage(os.path.join(self.tmp.name, 'shared'))
+        shared_seconds = self._run_workers(shared, count)
+
+        self._assert_complete(shared, count)
+        speedup = single_seconds / shared_seconds
+        print(f"\n{WORKERS} workers: {count * WORKERS / shared_seconds:.0f} events/s "
+              f"({speedup:.2f}x one worker on {os.cpu_count()} CPUs)")
+        self.assertGreater(speedup, 0.5)
+        single.close()
+        shared.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
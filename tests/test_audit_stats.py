@@ -0,0 +1,114 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils.audit_stats import AuditStats
+from utils.audit_storage import JsonAuditStorage, JsonlAuditStorage, SqliteAuditStorage
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+NOW_TS = NOW.replace(tzinfo=timezone.utc).timestamp()
+
+
+def event(minutes_ago, score=None, role='citizen', category=None):
+    return {'timestamp': (NOW - timedelta(minutes=minutes_ago)).isoformat(), 'user': 'u@test.com',
+            'role': role, 'action': 'score_request', 'score': score, 'risk_category': category}
+
+
+EVENTS = [
+    event(5, 700, category='Good'),
+    event(30),  # not scored (e.g. an audit view)
+    event(120, 820, role='bank', category='Excellent'),
+    event(60 * 30, 400, role='bank', category='Poor'),
+    event(60 * 24 * 10, 600),  # older than every window
+]
+
+
+class TestAuditStats(unittest.TestCase):
+    def test_average_counts_only_scored_events(self):
+        stats = AuditStats()
+        for entry in EVENTS:
+            stats.add(entry)
+        summary = stats.summary(now=NOW_TS)
+
+        self.assertEqual(summary['total_requests'], 5)
+        self.assertEqual(summary['score_count'], 4)
+        self.assertEqual(summary['avg_score'], round((700 + 820 + 400 + 600) / 4))
+        self.assertEqual((summary['min_score'], summary['max_score']), (400, 820))
+        self.assertEqual(summary['requests_by_role'], {'citizen': 3, 'bank': 2})
+        self.assertEqual(summary['risk_distribution']['Good'], 1)
+        self.assertEqual(summary['score_histogram']['800-850'], 1)
+
+    def test_sliding_windows(self):
+        stats = AuditStats()
+        for entry in EVENTS:
+            stats.add(entry)
+        windows = stats.windows(now=NOW_TS)
+
+        self.assertEqual(windows['1h'], {'requests': 2, 'scored': 1, 'avg_score': 700})
+        self.assertEqual(windows['24h']['requests'], 3)
+        self.assertEqual(windows['7d']['requests'], 4)
+        self.assertEqual(stats.summary(now=NOW_TS)['requests_last_24h'], 3)
+
+        # An hour later the first two events have left the 1h window
+        self.assertEqual(stats.windows(now=NOW_TS + 3600)['1h']['requests'], 0)
+
+    def test_state_round_trip(self):
+        stats = AuditStats()
+        for entry in EVENTS:
+            stats.add(entry)
+        restored = AuditStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+        self.assertEqual(restored.summary(now=NOW_TS), stats.summary(now=NOW_TS))
+
+    def test_legacy_totals_are_kept(self):
+        """Legacy stats keep their request total; only scored entries count as scored."""
+        legacy = {'total_requests': 100, 'total_scores': 70000, 'avg_score': 700}
+        stats = AuditStats.from_dict(legacy, [event(5, 700), event(6), event(7, 500)])
+        summary = stats.summary()
+        self.assertEqual(summary['total_requests'], 100)
+        self.assertEqual((summary['score_count'], summary['total_scores']), (2, 1200))
+        self.assertEqual(summary['avg_score'], 600)
+        self.assertEqual(summary['requests_by_role'], {'citizen': 3})
+
+
+class TestStorageAggregates(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _storages(self):
+        return [
+            lambda: JsonAuditStorage(os.path.join(self.tmp.name, 'audit_log.json')),
+            lambda: JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')),
+            lambda: SqliteAuditStorage(os.path.join(self.tmp.name, 'audit.db')),
+        ]
+
+    def test_storages_agree_and_persist(self):
+        """Every storage reports the same stats, before and after reopening."""
+        expected = AuditStats()
+        for entry in EVENTS:
+            expected.add(entry)
+        expected = expected.summary(now=NOW_TS)
+
+        for factory in self._storages():
+            store = factory()
+            store.append_many(EVENTS[:2])
+            for entry in EVENTS[2:]:
+                store.append(entry)
+            self.assertEqual(store.aggregates().summary(now=NOW_TS), expected, store.name)
+            store.close()
+
+            reopened = factory()
+            self.assertEqual(reopened.aggregates().summary(now=NOW_TS), expected, store.name)
+            reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
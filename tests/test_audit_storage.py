@@ -0,0 +1,180 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils.audit_storage import JsonlAuditStorage, SqliteAuditStorage
+from utils.audit_logger import AuditLogger
+
+
+def event(i, score=700):
+    return {'timestamp': f'2024-01-01T00:00:{i % 60:02d}', 'user': f'u{i}@test.com',
+            'role': 'citizen', 'action': 'score_request', 'score': score}
+
+
+class TestJsonlAuditStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'audit')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rotation_and_compaction_keep_every_entry(self):
+        """Segments rotate and are gzipped, with no entry lost or capped."""
+        store = JsonlAuditStorage(self.directory, segment_bytes=2000)
+        for i in range(1500):
+            store.append(event(i))
+        store.close()
+
+        files = os.listdir(self.directory)
+        self.assertTrue(any(name.endswith('.jsonl.gz') for name in files))
+        self.assertEqual(len(list(store.entries())), 1500)
+        self.assertEqual(store.stats()['total_requests'], 1500)
+
+    def test_first_pages_do_not_read_older_segments(self):
+        """Newest-first paging stops in the newest segments."""
+        store = JsonlAuditStorage(self.directory, segment_bytes=2000)
+        for i in range(1500):
+            store.append(dict(event(i), applicant_id=str(i)))
+        logger = AuditLogger(storage=store)
+
+        read = []
+        read_segment = store._read_segment
+
+        def tracked(number, offset=0):
+            read.append(number)
+            return read_segment(number, offset)
+
+        with mock.patch.object(store, '_read_segment', tracked):
+            page = logger.get_logs(limit=20, offset=20)
+            self.assertEqual([log['applicant_id'] for log in page['logs']],
+                             [str(i) for i in range(1479, 1459, -1)])
+            self.assertEqual(page['stats']['total_filtered'], 1500)
+            newest = max(store._segment_numbers())
+            self.assertGreater(newest, 50)
+            self.assertGreaterEqual(min(read), newest - 3)
+
+            read.clear()
+            page = logger.get_logs(limit=5, role_filter='citizen')
+            self.assertEqual(len(page['logs']), 5)
+            self.assertEqual(page['stats']['total_filtered'], 6)
+            self.assertGreaterEqual(min(read), newest - 1)
+        store.close()
+
+    def test_stats_recover_from_stale_sidecar(self):
+        """Lines written after the sidecar was saved are replayed on reopen."""
+        store = JsonlAuditStorage(self.directory, stats_flush_interval=3600)
+        for i in range(10):
+            store.append(event(i, score=600))
+        # Simulate a crash: the sidecar still reflects the empty log
+        os.close(store._fd)
+
+        reopened = JsonlAuditStorage(self.directory)
+        self.assertEqual(reopened.stats()['total_requests'], 10)
+        self.assertEqual(reopened.stats()['avg_score'], 600)
+        reopened.close()
+
+    def test_legacy_log_is_imported(self):
+        """A new directory starts with the entries and stats of audit_log.json."""
+        legacy_path = os.path.join(self.tmp.name, 'audit_log.json')
+        with open(legacy_path, 'w') as f:
+            json.dump({'logs': [event(1), event(2)],
+                       'stats': {'total_requests': 5000, 'total_scores': 3500000, 'avg_score': 700}}, f)
+
+        logger = AuditLogger(storage=JsonlAuditStorage(self.directory, legacy_path=legacy_path))
+        logger.log_score_request('bank@test.com', 'bank', 'risk_assessment', score=700)
+
+        result = logger.get_logs(role_filter='citizen')
+        self.assertEqual(result['stats']['total_filtered'], 2)
+        self.assertEqual(result['stats']['total_requests'], 5001)
+        logger.storage.close()
+
+
+class TestSqliteAuditStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'audit.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _fill(self, logger):
+        roles = ['citizen', 'bank', 'admin']
+        for i in range(300):
+            logger.storage.append({
+                'timestamp': f'2024-01-01T{i // 60:02d}:{i % 60:02d}:00', 'user': f'U{i % 7}@test.com',
+                'role': roles[i % 3], 'action': 'score_request', 'score': 500 + i,
+                'risk_category': 'Good' if i % 2 else 'Fair', 'applicant_id': f'A{i % 5}'})
+
+    def test_queries_match_list_based_storage(self):
+        """Filtered pages are the same as the JSONL logger returns."""
+        sqlite_logger = AuditLogger(storage=SqliteAuditStorage(self.db_path))
+        jsonl_logger = AuditLogger(storage=JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')))
+        self._fill(sqlite_logger)
+        self._fill(jsonl_logger)
+
+        for filters in [{}, {'role_filter': 'bank'}, {'user_filter': 'u3@'},
+                        {'risk_filter': 'Good', 'applicant_filter': 'A2'}]:
+            expected = jsonl_logger.get_logs(limit=25, offset=10, **filters)
+            result = sqlite_logger.get_logs(limit=25, offset=10, **filters)
+            self.assertEqual(result['logs'], expected['logs'])
+            if filters:
+                # The JSONL scan stops one match past the page (offset 10 + limit 25)
+                self.assertEqual(expected['stats']['total_filtered'], min(result['stats']['total_filtered'], 36))
+            else:
+                self.assertEqual(result['stats'], expected['stats'])
+        sqlite_logger.storage.close()
+        jsonl_logger.storage.close()
+
+    def test_keyset_pagination_walks_every_row(self):
+        """Following next_cursor visits each matching row once, newest first."""
+        logger = AuditLogger(storage=SqliteAuditStorage(self.db_path))
+        self._fill(logger)
+
+        seen, cursor = [], None
+        while True:
+            page = logger.get_logs(limit=30, role_filter='citizen', cursor=cursor)
+            seen.extend(log['timestamp'] for log in page['logs'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 100)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        logger.storage.close()
+
+    def test_filtered_page_uses_index(self):
+        """A role-filtered page is an index range scan, not a table scan."""
+        storage = SqliteAuditStorage(self.db_path)
+        plan = storage._connection().execute(
+            'EXPLAIN QUERY PLAN SELECT id, timestamp, entry FROM audit_log WHERE role = ? '
+            'AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT 10',
+            ('bank', '2024', 10)).fetchall()
+        details = ' '.join(row[-1] for row in plan)
+        self.assertIn('idx_audit_role', details)
+        self.assertNotIn('TEMP B-TREE', details)
+        storage.close()
+
+    def test_jsonl_history_is_imported(self):
+        """A new database starts with the JSONL segments and their stats."""
+        directory = os.path.join(self.tmp.name, 'audit')
+        jsonl = JsonlAuditStorage(directory)
+        for i in range(20):
+            jsonl.append(event(i, score=650))
+        jsonl.close()
+
+        storage = SqliteAuditStorage(self.db_path, legacy_dir=directory)
+        self.assertEqual(len(list(storage.entries())), 20)
+        stats = storage.stats()
+        self.assertEqual((stats['total_requests'], stats['total_scores'], stats['avg_score']), (20, 13000, 650))
+        self.assertEqual(stats['requests_by_role'], {'citizen': 20})
+        storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
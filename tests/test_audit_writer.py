@@ -0,0 +1,186 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils.audit_storage import JsonlAuditStorage
+from utils.audit_writer import AsyncAuditWriter
+
+
+def event(i):
+    return {'timestamp': f'2024-01-01T00:00:{i % 60:02d}', 'user': f'u{i}@test.com',
+            'role': 'citizen', 'action': 'score_request', 'score': 700}
+
+
+class GatedStorage:
+    """Storage wrapper whose writes wait until the test opens the gate."""
+
+    name = 'gated'
+    indexed = False
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.gate = threading.Event()
+        self.groups = []
+
+    def append_many(self, entries):
+        self.gate.wait()
+        self.groups.append(len(entries))
+        self.storage.append_many(entries)
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def entries(self):
+        return self.storage.entries()
+
+    def stats(self):
+        return self.storage.stats()
+
+    def close(self):
+        self.storage.close()
+
+
+class TestAsyncAuditWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = GatedStorage(JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_events_are_group_committed(self):
+        """Events queued behind a slow write go out together, none lost."""
+        writer = AsyncAuditWriter(self.storage, max_queue=1000, flush_rows=64, flush_interval_ms=5)
+        for i in range(200):
+            writer.append(event(i))
+        self.storage.gate.set()
+
+        self.assertEqual(writer.stats()['total_requests'], 200)
+        self.assertLess(len(self.storage.groups), 200)
+        self.assertLessEqual(max(self.storage.groups), 64)
+        self.assertEqual(writer.metrics()['events_written'], 200)
+        writer.close()
+
+    def test_drop_policy_counts_dropped_events(self):
+        """A full queue drops events and reports how many."""
+        writer = AsyncAuditWriter(self.storage, max_queue=10, flush_rows=10, full_policy='drop')
+        for i in range(50):
+            writer.append(event(i))
+        self.storage.gate.set()
+        writer.flush()
+
+        metrics = writer.metrics()
+        self.assertGreater(metrics['dropped'], 0)
+        self.assertEqual(metrics['events_written'] + metrics['dropped'], 50)
+        self.assertEqual(len(list(writer.entries())), metrics['events_written'])
+        writer.close()
+
+    def test_spill_policy_loses_nothing(self):
+        """Events spilled to disk while the queue is full are written on close."""
+        spill_path = os.path.join(self.tmp.name, 'spill.jsonl')
+        writer = AsyncAuditWriter(self.storage, max_queue=10, flush_rows=10,
+                                  full_policy='spill', spill_path=spill_path)
+        for i in range(50):
+            writer.append(event(i))
+        self.assertGreater(writer.metrics()['spilled'], 0)
+        self.storage.gate.set()
+        writer.close()
+
+        self.assertFalse(os.path.exists(spill_path))
+        users = sorted(entry['user'] for entry in self.storage.entries())
+        self.assertEqual(users, sorted(f'u{i}@test.com' for i in range(50)))
+
+    def test_replay_failure_keeps_writer_alive(self):
+        """A storage error during replay keeps the spilled events for the next idle pass."""
+        spill_path = os.path.join(self.tmp.name, 'spill.jsonl')
+        replay_path = f'{spill_path}.replay.{os.getpid()}'
+        writer = AsyncAuditWriter(self.storage, max_queue=10, flush_rows=10,
+                                  full_policy='spill', spill_path=spill_path)
+        for i in range(30):
+            writer.append(event(i))
+        with open(spill_path, 'a') as f:
+            f.write('{"user": "torn\n')
+
+        failing = {'replay': True}
+        append_many = self.storage.append_many
+
+        def fail_replay(entries):
+            if failing['replay'] and any(entry['user'] == 'u29@test.com' for entry in entries):
+                raise OSError('disk full')
+            append_many(entries)
+
+        self.storage.append_many = fail_replay
+        self.storage.gate.set()
+        writer.flush()
+        self.assertTrue(writer._thread.is_alive())
+        self.assertTrue(os.path.exists(replay_path))
+        self.assertGreater(writer.metrics()['write_errors'], 0)
+
+        # The next idle pass retries the replay file
+        failing['replay'] = False
+        writer.append(event(30))
+        writer.flush()
+        writer.close()
+        self.assertFalse(os.path.exists(replay_path))
+        users = sorted(entry['user'] for entry in self.storage.entries())
+        self.assertEqual(users, sorted(f'u{i}@test.com' for i in range(31)))
+
+    def test_failed_group_is_spilled_and_replayed(self):
+        """A group the storage fails to write once is replayed, not dropped."""
+        spill_path = os.path.join(self.tmp.name, 'spill.jsonl')
+        writer = AsyncAuditWriter(self.storage, max_queue=100, flush_rows=10, spill_path=spill_path)
+        failures = []
+        append_many = self.storage.append_many
+
+        def fail_once(entries):
+            if not failures:
+                failures.append(len(entries))
+                raise OSError('disk full')
+            append_many(entries)
+
+        self.storage.append_many = fail_once
+        self.storage.gate.set()
+        for i in range(20):
+            writer.append(event(i))
+        writer.flush()
+
+        metrics = writer.metrics()
+        self.assertEqual(metrics['write_errors'], 1)
+        self.assertEqual(metrics['dropped'], 0)
+        self.assertEqual(metrics['spilled'], failures[0])
+        users = sorted(entry['user'] for entry in writer.entries())
+        self.assertEqual(users, sorted(f'u{i}@test.com' for i in range(20)))
+        self.assertFalse(os.path.exists(spill_path))
+        writer.close()
+
+    def test_spill_files_are_replayed_on_startup(self):
+        """Spill and replay files left by exited processes are written when the writer starts."""
+        spill_path = os.path.join(self.tmp.name, 'spill.jsonl')
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                capture_output=True, text=True, check=True)
+        orphan_path = f'{spill_path}.replay.{exited.stdout.strip()}'
+        with open(orphan_path, 'w') as f:
+            f.writelines(json.dumps(event(i)) + '\n' for i in range(5))
+        with open(spill_path, 'w') as f:
+            f.writelines(json.dumps(event(i)) + '\n' for i in range(5, 10))
+
+        writer = AsyncAuditWriter(self.storage, spill_path=spill_path)
+        self.storage.gate.set()
+        writer.append(event(10))
+        writer.flush()
+
+        users = sorted(entry['user'] for entry in writer.entries())
+        self.assertEqual(users, sorted(f'u{i}@test.com' for i in range(11)))
+        self.assertEqual(os.listdir(self.tmp.name), ['audit'])
+        writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+
+import unittest
+import glob
+import os
+import subprocess
+import sys
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import numpy as np
+
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions, transactions_to_block
+from config import Config
+from ml.predictor import get_predictor, OnnxBackend
+from ml.tree_ensemble import CompiledTreeEnsemble
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '../backend/data/samples')
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend'))
+
+
+class TestBatchPrediction(unittest.TestCase):
+    def setUp(self):
+        self.extractor = FeatureExtractor()
+        self.predictor = get_predictor()
+
+        self.applicants = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                self.applicants.append(parse_csv_transactions(f.read()))
+        # Late payer with frequent overdrafts exercises every cap
+        self.applicants.append([
+            {'date': '2024-01-01', 'amount': 1000, 'type': 'credit', 'balance': -100},
+            {'date': '2024-04-15', 'amount': 900, 'type': 'credit', 'balance': -50},
+            {'date': '2024-04-20', 'amount': 1500, 'type': 'debit', 'balance': -700},
+        ])
+
+    def test_predict_many_matches_predict(self):
+        """Vectorized scoring returns the same scores as the per-row path."""
+        columns, offsets = transactions_to_block(self.applicants)
+        feature_matrix, raw_matrix = self.extractor.extract_features_many(columns, offsets)
+        predictions = self.predictor.predict_many(feature_matrix, raw_matrix)
+
+        self.assertEqual(len(predictions['score']), len(self.applicants))
+        for i in range(len(self.applicants)):
+            features = self.extractor.to_feature_dict(feature_matrix[i], raw_matrix[i])
+            expected = self.predictor.predict(features)
+            with self.subTest(applicant=i):
+                self.assertEqual(int(predictions['score'][i]), expected['score'])
+                self.assertEqual(predictions['category'][i], expected['category'])
+                self.assertAlmostEqual(float(predictions['probability_of_default'][i]),
+                                       expected['probability_of_default'], places=4)
+
+    def test_risk_category_boundaries(self):
+        """Binary-searched categories agree with the scalar lookup on every score."""
+        scores = np.arange(300, 851)
+        categories = self.predictor._get_risk_category_many(scores)
+        for score, category in zip(scores, categories):
+            self.assertEqual(category, self.predictor._get_risk_category(int(score)))
+
+    def test_onnx_backend_matches_xgboost(self):
+        """ONNX Runtime probabilities match the pickled model on the same rows."""
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            self.skipTest('onnxruntime not installed')
+        if self.predictor.model is None or not os.path.exists(Config.ONNX_MODEL_PATH):
+            self.skipTest('model artifacts not available')
+
+        columns, offsets = transactions_to_block(self.applicants)
+        feature_matrix, _ = self.extractor.extract_features_many(columns, offsets)
+        backend = OnnxBackend(Config.ONNX_MODEL_PATH, Config.SCALER_PARAMS_PATH)
+        expected = self.predictor.model.predict_proba(self.predictor.scaler.transform(feature_matrix))[:, 1]
+        np.testing.assert_allclose(backend.predict_proba(feature_matrix), expected, atol=1e-6)
+
+    def test_compiled_trees_match_xgboost(self):
+        """The NumPy tree walker reproduces predict_proba, including missing values."""
+        if self.predictor.model is None or not os.path.exists(Config.TREES_MODEL_PATH):
+            self.skipTest('model artifacts not available')
+
+        scaler = self.predictor.scaler
+        rng = np.random.default_rng(7)
+        rows = scaler.mean_ + rng.normal(size=(500, len(scaler.mean_))) * scaler.scale_
+        rows[rng.random(rows.shape) < 0.1] = np.nan
+
+        ensemble = CompiledTreeEnsemble.load(Config.TREES_MODEL_PATH)
+        expected = self.predictor.model.predict_proba(scaler.transform(rows))[:, 1]
+        np.testing.assert_allclose(ensemble.predict_proba(rows), expected, atol=1e-6)
+
+    def test_trees_backend_does_not_import_xgboost(self):
+        """With compiled trees and heuristic explanations a worker never imports xgboost."""
+        if not os.path.exists(Config.TREES_MODEL_PATH):
+            self.skipTest('compiled trees not available')
+        script = (
+            "import sys\n"
+            "from ml.registry import get_model_registry\n"
+            "from ml.predictor import get_predictor\n"
+            "from ml.explainer import get_explainer\n"
+            "from ml.what_if import get_what_if_engine\n"
+            "get_model_registry().load_all()\n"
+            "predictor = get_predictor()\n"
+            "features = dict(zip(predictor.feature_names, [20000, 30, 0, 0, 0, 500, 400, 300, 500, 400, 300]))\n"
+            "print(predictor.backend.name, predictor.model is None, get_explainer().backend is None,\n"
+            "      get_what_if_engine().ensemble is predictor.backend, 'score' in predictor.predict(features),\n"
+            "      get_model_registry().status('model'), 'xgboost' in sys.modules)\n"
+        )
+        env = dict(os.environ, INFERENCE_BACKEND='trees', EXPLAINER_BACKEND='heuristic', BATCH_DISPATCH='false')
+        output = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env,
+                                capture_output=True, text=True, timeout=120).stdout.split()
+        self.assertEqual(output[-7:], ['trees', 'True', 'True', 'True', 'True', 'skipped', 'False'])
+
+
+if __name__ == '__main__':
+    unittest.main()
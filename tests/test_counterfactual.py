@@ -0,0 +1,249 @@
+import unittest
+import glob
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import numpy as np
+
+from app import create_app
+from config import Config
+from ml.counterfactual import CounterfactualGenerator, candidate_grid, get_counterfactual_generator
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions, transactions_to_block
+from utils import audit_logger
+from utils.audit_logger import AuditLogger
+from utils.audit_storage import JsonlAuditStorage
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '../backend/data/samples')
+
+
+class TestCounterfactualSearch(unittest.TestCase):
+    def setUp(self):
+        self.generator = get_counterfactual_generator()
+        self.predictor = self.generator.predictor
+        self.extractor = FeatureExtractor()
+
+        applicants = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                applicants.append(parse_csv_transactions(f.read()))
+        feature_matrix, raw_matrix = self.extractor.extract_features_many(*transactions_to_block(applicants))
+        self.rows = list(zip(feature_matrix, raw_matrix))
+
+        # A struggling applicant every lever applies to: 2 months late, high
+        # utilization, low payments, spending 15x income, frequent overdrafts
+        raw = np.zeros((1, len(FeatureExtractor.RAW_FEATURES)))
+        col = {name: i for i, name in enumerate(FeatureExtractor.RAW_FEATURES)}
+        raw[0, col['transaction_volatility']] = 0.8
+        raw[0, col['expense_ratio']] = 30000 / 2001
+        raw[0, col['payment_consistency']] = 70
+        raw[0, col['overdraft_frequency']] = 0.15
+        self.totals = (2000.0, 30000.0)
+        features = self.extractor.map_to_model_features_many(raw, np.array([2000.0]), np.array([30000.0]))
+        self.struggling = (features[0], raw[0])
+
+    def _score(self, feature_row, raw_row):
+        return int(self.predictor.predict_many(feature_row[None, :], raw_row[None, :])['score'][0])
+
+    def test_plan_is_cheapest_to_reach_next_category(self):
+        """The plan reaches the next category when any candidate does, at the lowest cost."""
+        for feature_row, raw_row in self.rows + [self.struggling]:
+            score = self._score(feature_row, raw_row)
+            search = self.generator.search(feature_row, raw_row, score)
+            if search is None or search['plan'] is None:
+                continue
+            plan = search['plan']
+            with self.subTest(score=score):
+                # Re-scoring the plan's profile on its own gives the plan's score
+                row = plan['row']
+                self.assertEqual(self._score(search['feature_matrix'][row], search['raw_matrix'][row]),
+                                 plan['score'])
+                self.assertGreater(plan['score'], score)
+                if search['next_category'] is None:
+                    continue
+                floor = Config.RISK_CATEGORIES[search['next_category']][0]
+                reaching = search['scores'] >= floor
+                self.assertEqual(plan['reaches_next_category'], bool(reaching.any()))
+                if reaching.any():
+                    self.assertGreaterEqual(plan['score'], floor)
+                    self.assertAlmostEqual(plan['cost'], search['costs'][reaching].min(), places=4)
+
+    def test_one_batched_call(self):
+        """Hundreds of candidates are scored with a single predict_many call."""
+        feature_row, raw_row = self.struggling
+        score = self._score(feature_row, raw_row)
+        with mock.patch.object(self.predictor, 'predict_many', wraps=self.predictor.predict_many) as predict:
+            search = self.generator.search(feature_row, raw_row, score)
+            improvements = self.generator.generate_improvements(
+                dict(zip(self.predictor.feature_names, feature_row)),
+                dict(zip(FeatureExtractor.RAW_FEATURES, raw_row)), score)
+        self.assertEqual(predict.call_count, 2)
+        self.assertEqual(len(search['levers']), len(CounterfactualGenerator.LEVERS))
+        self.assertGreater(len(search['grid']), 100)
+        self.assertTrue(improvements[0]['in_plan'])
+
+    def test_raw_levers_go_through_feature_mapping(self):
+        """Cutting overdrafts re-derives PAY_0 from payment gaps, like real data would."""
+        feature_row, raw_row = self.struggling
+        income, expenses = self.generator._estimate_totals(feature_row, raw_row)
+        self.assertAlmostEqual(income, self.totals[0], places=3)
+        self.assertAlmostEqual(expenses, self.totals[1], places=3)
+
+        search = self.generator.search(feature_row, raw_row, self._score(feature_row, raw_row))
+        overdraft = search['levers'].index('overdraft')
+        only_overdraft = np.flatnonzero((search['grid'] > 0).sum(axis=1) == 1)
+        row = next(i for i in only_overdraft if search['grid'][i, overdraft] == 2)
+        expected_raw = raw_row.copy()
+        expected_raw[FeatureExtractor.RAW_FEATURES.index('overdraft_frequency')] = 0.0
+        expected = self.extractor.map_to_model_features_many(expected_raw[None, :], np.array([income]),
+                                                             np.array([expenses]))[0]
+        np.testing.assert_allclose(search['feature_matrix'][row], expected)
+        np.testing.assert_array_equal(search['raw_matrix'][row], expected_raw)
+
+    def test_default_rows_skip_raw_levers(self):
+        """Rows the mapping cannot be inverted for only get model-feature levers."""
+        feature_row, raw_row = self.extractor._default_feature_rows()
+        self.assertIsNone(self.generator._estimate_totals(feature_row, raw_row))
+        search = self.generator.search(feature_row, raw_row, self._score(feature_row, raw_row))
+        if search is not None:
+            self.assertFalse(set(search['levers']) & set(CounterfactualGenerator.RAW_LEVERS))
+
+    def test_suggestion_format(self):
+        """Suggestions keep the fields the endpoints and recommendation engine read."""
+        for feature_row, raw_row in self.rows + [self.struggling]:
+            score = self._score(feature_row, raw_row)
+            improvements = self.generator.generate_improvements(
+                dict(zip(self.predictor.feature_names, feature_row)),
+                dict(zip(FeatureExtractor.RAW_FEATURES, raw_row)), score)
+            for improvement in improvements:
+                with self.subTest(score=score, action=improvement['action']):
+                    for key in ('action', 'detail', 'timeline', 'impact', 'impact_value',
+                                'priority', 'current', 'target', 'potential_score'):
+                        self.assertIn(key, improvement)
+                    self.assertEqual(improvement['impact'], f"+{improvement['impact_value']} points")
+                    self.assertLessEqual(improvement['potential_score'], Config.SCORE_MAX)
+
+    def test_candidate_grid(self):
+        grid = candidate_grid((2, 0, 3), 3)
+        self.assertEqual(grid[0].tolist(), [0, 0, 0])
+        self.assertEqual(len(grid), 1 + 2 + 3 + 2 * 3)
+        self.assertTrue((grid[:, 1] == 0).all())
+        self.assertLessEqual((candidate_grid((1,) * 6, 2) > 0).sum(axis=1).max(), 2)
+
+
+
+class TestPortfolioSearch(unittest.TestCase):
+    def setUp(self):
+        self.generator = get_counterfactual_generator()
+        self.predictor = self.generator.predictor
+
+        # Random applicants across categories, some with non-invertible rows
+        rng = np.random.default_rng(11)
+        n = 80
+        col = {name: i for i, name in enumerate(FeatureExtractor.RAW_FEATURES)}
+        raw = np.zeros((n, len(FeatureExtractor.RAW_FEATURES)))
+        income = rng.uniform(500, 8000, n)
+        expenses = rng.uniform(-2000, 30000, n)
+        raw[:, col['transaction_volatility']] = rng.uniform(0.1, 3.0, n)
+        raw[:, col['expense_ratio']] = expenses / (income + 1)
+        raw[:, col['payment_consistency']] = rng.uniform(10, 120, n)
+        raw[:, col['overdraft_frequency']] = rng.uniform(0, 0.5, n)
+        raw[:, col['avg_balance']] = rng.uniform(100, 20000, n)
+        self.feature_matrix = FeatureExtractor().map_to_model_features_many(raw, income, expenses)
+        self.raw_matrix = raw
+        self.feature_matrix[:5], self.raw_matrix[:5] = FeatureExtractor()._default_feature_rows()
+        self.scores = self.predictor.predict_many(self.feature_matrix, self.raw_matrix)['score']
+
+    def test_matches_single_search(self):
+        """Each applicant gets the plan search() finds for it alone."""
+        plans = self.generator.search_many(self.feature_matrix, self.raw_matrix, self.scores)
+        for i in range(len(self.scores)):
+            search = self.generator.search(self.feature_matrix[i], self.raw_matrix[i], int(self.scores[i]))
+            plan = search['plan'] if search else None
+            with self.subTest(row=i):
+                self.assertEqual(plans['has_plan'][i], plan is not None)
+                self.assertEqual(plans['candidates'][i], len(search['grid']) if search else 1)
+                if plan is None:
+                    self.assertEqual(plans['score'][i], self.scores[i])
+                    continue
+                changes = {lever: plans['changes'][i, j] for j, lever in enumerate(self.generator.LEVERS)
+                           if not np.isnan(plans['changes'][i, j])}
+                self.assertEqual(changes, plan['changes'])
+                self.assertEqual(plans['score'][i], plan['score'])
+                self.assertEqual(plans['category'][i], plan['category'])
+                self.assertAlmostEqual(plans['cost'][i], plan['cost'], places=4)
+                self.assertEqual(plans['reaches_target'][i], plan['reaches_next_category'])
+
+    def test_chunking_under_memory_cap(self):
+        """A tiny memory cap scores one applicant per call with identical results."""
+        full = self.generator.search_many(self.feature_matrix, self.raw_matrix, self.scores)
+        with mock.patch.object(self.predictor, 'predict_many', wraps=self.predictor.predict_many) as predict:
+            chunked = self.generator.search_many(self.feature_matrix, self.raw_matrix, self.scores, max_bytes=1)
+        self.assertEqual(predict.call_count, len(self.scores))
+        for key in ('score', 'cost', 'has_plan', 'reaches_target', 'candidates'):
+            np.testing.assert_array_equal(chunked[key], full[key])
+        np.testing.assert_array_equal(chunked['changes'], full['changes'])
+
+    def test_fixed_target(self):
+        """With one target score, applicants already above it need no changes."""
+        plans = self.generator.search_many(self.feature_matrix, self.raw_matrix, self.scores, target_scores=670)
+        above = self.scores >= 670
+        self.assertTrue(plans['reaches_target'][above].all())
+        self.assertFalse(plans['has_plan'][above].any())
+        self.assertTrue(np.isnan(plans['changes'][above]).all())
+        reached = plans['reaches_target'] & plans['has_plan']
+        self.assertTrue((plans['score'][reached] >= 670).all())
+
+
+class TestBatchImprovementsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.previous_logger = audit_logger._logger
+        audit_logger._logger = AuditLogger(storage=JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')))
+        self.client = create_app().test_client()
+        token = self.client.post('/api/auth/login', json={
+            'email': 'admin@test.com', 'password': 'password'}).get_json()['token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.applicants = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                self.applicants.append({'applicant_id': os.path.basename(path),
+                                        'transactions': parse_csv_transactions(f.read())})
+
+    def tearDown(self):
+        audit_logger._logger.storage.close()
+        audit_logger._logger = self.previous_logger
+        self.tmp.cleanup()
+
+    def test_plans_per_applicant(self):
+        response = self.client.post('/api/bank/batch/improvements', headers=self.headers, json={
+            'applicants': self.applicants + [{'applicant_id': 'EMPTY'}]})
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['target_score'], 670)
+        self.assertEqual(body['summary']['total'], len(self.applicants))
+        self.assertEqual(body['results'][-1]['error'], 'No transaction data')
+
+        for result in body['results'][:-1]:
+            with self.subTest(applicant=result['applicant_id']):
+                if result['decision'] == 'APPROVE':
+                    self.assertEqual(result['changes'], [])
+                elif result['reaches_target']:
+                    self.assertEqual(result['potential_decision'], 'APPROVE')
+                    self.assertGreaterEqual(result['potential_score'], 670)
+                    self.assertTrue(result['changes'])
+        actions = [log['action'] for log in audit_logger._logger.get_logs(limit=20)['logs']]
+        self.assertEqual(actions.count('improvement_plan'), len(self.applicants))
+
+    def test_unknown_target(self):
+        response = self.client.post('/api/bank/batch/improvements', headers=self.headers, json={
+            'applicants': self.applicants, 'target_decision': 'INSTANT'})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import glob
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import numpy as np
+
+from ml.dispatcher import MicroBatchDispatcher
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions
+from ml.predictor import get_predictor
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '../backend/data/samples')
+
+
+class FailingBackend:
+    def predict_proba(self, feature_matrix):
+        raise RuntimeError('backend down')
+
+
+class TestMicroBatchDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.predictor = get_predictor()
+        if self.predictor.backend is None:
+            self.skipTest('model artifacts not available')
+
+        extractor = FeatureExtractor()
+        self.vectors = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                features = extractor.extract_features(parse_csv_transactions(f.read()))
+            self.vectors.append(self.predictor._prepare_feature_vector(features))
+
+    def test_concurrent_callers_get_their_own_results(self):
+        """Batched probabilities match one-row backend calls for every caller."""
+        dispatcher = MicroBatchDispatcher(window_ms=5, max_rows=16)
+        backend = self.predictor.backend
+        rows = [self.vectors[i % len(self.vectors)] for i in range(200)]
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            batched = list(pool.map(lambda row: dispatcher.predict_proba(backend, row), rows))
+
+        expected = backend.predict_proba(np.array(rows))
+        np.testing.assert_allclose(batched, expected, atol=1e-7)
+
+        metrics = dispatcher.metrics()
+        self.assertEqual(metrics['rows'], len(rows))
+        self.assertEqual(sum(metrics['batch_size_histogram'].values()), metrics['batches'])
+        self.assertEqual(metrics['batch_size_histogram']['>256'], 0)
+
+    def test_backend_errors_reach_callers(self):
+        """An exception in the batched call is raised in the waiting caller."""
+        dispatcher = MicroBatchDispatcher(window_ms=1)
+        with self.assertRaises(RuntimeError):
+            dispatcher.predict_proba(FailingBackend(), self.vectors[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
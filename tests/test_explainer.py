@@ -0,0 +1,79 @@
+import unittest
+import glob
+import os
+import subprocess
+import sys
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import numpy as np
+
+from ml.explainer import CreditScoreExplainer, NativeContributions, ShapContributions, get_explainer
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions, transactions_to_block
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend'))
+SAMPLES_DIR = os.path.join(BACKEND_DIR, 'data', 'samples')
+
+
+class TestNativeExplainer(unittest.TestCase):
+    def setUp(self):
+        self.explainer = get_explainer()
+        if not isinstance(self.explainer.backend, NativeContributions):
+            self.skipTest('model artifacts not available')
+
+        applicants = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                applicants.append(parse_csv_transactions(f.read()))
+        extractor = FeatureExtractor()
+        self.feature_matrix, self.raw_matrix = extractor.extract_features_many(*transactions_to_block(applicants))
+        self.values = [dict(zip(extractor.MODEL_FEATURES, row)) for row in self.feature_matrix.tolist()]
+        self.raw = [dict(zip(extractor.RAW_FEATURES, row)) for row in self.raw_matrix.tolist()]
+        # Random profiles around the training distribution exercise more trees
+        rng = np.random.default_rng(7)
+        self.scaled = rng.normal(size=(200, self.feature_matrix.shape[1]))
+
+    def test_matches_shap_tree_explainer(self):
+        """pred_contribs gives the same values as shap.TreeExplainer."""
+        try:
+            shap_backend = ShapContributions(self.explainer.model)
+        except ImportError:
+            self.skipTest('shap not installed')
+        np.testing.assert_allclose(self.explainer.backend.contributions(self.scaled),
+                                   shap_backend.contributions(self.scaled), atol=1e-5)
+
+    def test_batch_matches_single_rows(self):
+        """explain_many gives each row the explanation explain() gives it alone."""
+        batch = self.explainer.explain_many(self.feature_matrix, self.values, self.raw)
+        for row, explanation in enumerate(batch):
+            with self.subTest(row=row):
+                self.assertEqual(explanation, self.explainer.explain(
+                    self.feature_matrix[row].tolist(), self.values[row], self.raw[row]))
+
+    def test_top_factors_follow_contributions(self):
+        """Factors come from the TOP_FACTORS largest |contributions|, split by sign."""
+        contributions = self.explainer.backend.contributions(self.scaled)
+        values = [{} for _ in range(len(self.scaled))]
+        explanations = self.explainer.explain_many(self.scaled, values, [None] * len(self.scaled),
+                                                   scaled=self.scaled)
+        for row, explanation in enumerate(explanations[:20]):
+            importance = sorted(zip(self.explainer.feature_names, contributions[row].tolist()),
+                                key=lambda item: abs(item[1]), reverse=True)
+            self.assertEqual(list(explanation['feature_importance'].items()), importance)
+            top = importance[:CreditScoreExplainer.TOP_FACTORS]
+            expected_negative = [self.explainer._format_negative_factor(feature, 0, abs(value))
+                                 for feature, value in top if value >= 0][:3]
+            self.assertEqual(explanation['negative'], expected_negative)
+
+    def test_shap_not_imported(self):
+        """Building the explainer does not import shap."""
+        code = ('import sys; from ml.explainer import get_explainer; get_explainer(); '
+                'print("shap" in sys.modules)')
+        output = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
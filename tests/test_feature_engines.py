@@ -0,0 +1,93 @@
+
+import unittest
+import glob
+import os
+import sys
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import numpy as np
+
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions, transactions_to_block
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '../backend/data/samples')
+
+
+class TestFeatureEngines(unittest.TestCase):
+    def setUp(self):
+        self.pandas_engine = FeatureExtractor(engine='pandas')
+        self.numpy_engine = FeatureExtractor(engine='numpy')
+
+    def assertEnginesAgree(self, transactions):
+        expected = self.pandas_engine.extract_features(transactions)
+        actual = self.numpy_engine.extract_features(transactions)
+        self.assertEqual(actual, expected)
+
+    def test_sample_profiles_match(self):
+        """Both engines produce identical features for every sample CSV."""
+        paths = sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv')))
+        self.assertTrue(paths)
+        for path in paths:
+            with open(path, 'r') as f:
+                transactions = parse_csv_transactions(f.read())
+            with self.subTest(profile=os.path.basename(path)):
+                self.assertEnginesAgree(transactions)
+
+    def test_unsorted_dates_and_ties(self):
+        """Row order after sorting (including equal dates) matches pandas."""
+        transactions = [
+            {'date': '2024-03-01', 'amount': 1000.1, 'category': 'salary', 'type': 'credit', 'balance': 900.3},
+            {'date': '2024-01-01', 'amount': 20.7, 'category': 'food', 'type': 'debit', 'balance': -50.2},
+            {'date': '2024-03-01', 'amount': 1333.3, 'category': 'salary', 'type': 'CREDIT', 'balance': 1200.9},
+            {'date': '2024-02-15', 'amount': 75.25, 'category': 'rent', 'type': 'Debit', 'balance': 400.1},
+            {'date': '2024-01-01', 'amount': 999.9, 'category': 'salary', 'type': 'credit', 'balance': 30.0},
+        ]
+        self.assertEnginesAgree(transactions)
+
+    def test_dirty_values(self):
+        """Invalid dates, amounts and categories are coerced the same way."""
+        transactions = [
+            {'date': '2024-01-01', 'amount': 'abc', 'category': None, 'type': 'credit', 'balance': 100},
+            {'date': 'not-a-date', 'amount': 250, 'category': 'food', 'type': 'debit', 'balance': None},
+            {'date': '2024-02-30', 'amount': None, 'category': 'food', 'type': None, 'balance': -10},
+            {'date': '2024-02-01', 'amount': 1200, 'category': float('nan'), 'type': 'credit', 'balance': 1300},
+        ]
+        self.assertEnginesAgree(transactions)
+
+    def test_single_transaction_without_category(self):
+        """Defaults for a one-row history without a category column match."""
+        self.assertEnginesAgree([{'date': '2024-01-01', 'amount': 500, 'type': 'credit', 'balance': 500}])
+
+    def test_extract_features_many_matches_single(self):
+        """Segmented batch extraction agrees with per-applicant extraction."""
+        applicants = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                applicants.append(parse_csv_transactions(f.read()))
+        applicants.append([])
+        applicants.append([{'date': '2024-01-01', 'amount': 500, 'type': 'credit', 'balance': -5}])
+
+        columns, offsets = transactions_to_block(applicants)
+        feature_matrix, raw_matrix = self.numpy_engine.extract_features_many(columns, offsets)
+
+        self.assertEqual(feature_matrix.shape, (len(applicants), len(FeatureExtractor.MODEL_FEATURES)))
+        self.assertEqual(raw_matrix.shape, (len(applicants), len(FeatureExtractor.RAW_FEATURES)))
+        for i, transactions in enumerate(applicants):
+            expected = self.numpy_engine.extract_features(transactions)
+            actual = self.numpy_engine.to_feature_dict(feature_matrix[i], raw_matrix[i])
+            expected_raw = expected.pop('_raw_features')
+            actual_raw = actual.pop('_raw_features')
+            with self.subTest(applicant=i):
+                for name, value in expected.items():
+                    self.assertTrue(np.isclose(actual[name], value, rtol=1e-9), name)
+                for name, value in expected_raw.items():
+                    self.assertTrue(np.isclose(actual_raw[name], value, rtol=1e-9), name)
+
+    def test_unknown_engine_rejected(self):
+        with self.assertRaises(ValueError):
+            FeatureExtractor(engine='polars')
+
+
+if __name__ == '__main__':
+    unittest.main()
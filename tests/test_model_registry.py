@@ -0,0 +1,58 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from config import Config
+from ml.registry import ModelRegistry, get_model_registry
+from ml.predictor import get_predictor
+from ml.explainer import get_explainer
+from ml.counterfactual import get_counterfactual_generator
+from ml.anomaly import get_anomaly_scorer
+
+
+class TestModelRegistry(unittest.TestCase):
+    def test_consumers_share_artifacts(self):
+        """Predictor, explainer, counterfactuals and anomaly scorer hold the same objects."""
+        registry = get_model_registry()
+        if registry.get('model') is None:
+            self.skipTest('model artifacts not available')
+
+        self.assertIs(get_predictor().model, registry.get('model'))
+        self.assertIs(get_explainer().model, registry.get('model'))
+        self.assertIs(get_counterfactual_generator().predictor, get_predictor())
+        self.assertIs(get_counterfactual_generator().predictor.model, registry.get('model'))
+        self.assertIs(get_predictor().scaler, get_anomaly_scorer().scaler)
+
+        stats = registry.stats()['model']
+        self.assertEqual(stats['status'], 'loaded')
+        self.assertIn('load_ms', stats)
+        self.assertIn('rss_delta_mb', stats)
+
+    def test_missing_artifact(self):
+        """A missing file is reported as not_found and returned as None."""
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = ModelRegistry({'model': os.path.join(tmp, 'missing.pkl'),
+                                      'scaler': Config.SCALER_PATH})
+            self.assertIsNone(registry.get('model'))
+            self.assertEqual(registry.status('model'), 'not_found')
+            self.assertEqual(registry.status('scaler'), 'not_loaded')
+
+    def test_anomaly_scores(self):
+        """The anomaly scorer returns one score and flag per row."""
+        scorer = get_anomaly_scorer()
+        if not scorer.available:
+            self.skipTest('anomaly detector not available')
+
+        rows = [scorer.scaler.mean_.tolist(), (scorer.scaler.mean_ + 50 * scorer.scaler.scale_).tolist()]
+        result = scorer.score_many(rows)
+        self.assertEqual(len(result['anomaly_score']), 2)
+        self.assertFalse(result['is_anomaly'][0])
+        self.assertTrue(result['is_anomaly'][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from ml.registry import (get_model_registry, swap_model_registry, pin_model_registry,
+                         unpin_model_registry, read_manifest)
+from ml.model_reload import ModelReloader, load_samples, smoke_test
+from ml.predictor import CreditScorePredictor
+from ml.predictor import get_predictor
+from ml.publish_model import publish
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../backend/data')
+
+
+class TestModelReload(unittest.TestCase):
+    def setUp(self):
+        if get_model_registry().get('model') is None:
+            self.skipTest('model artifacts not available')
+        self.artifacts_dir = tempfile.mkdtemp()
+        self.original = get_model_registry()
+
+    def tearDown(self):
+        swap_model_registry(self.original)
+        shutil.rmtree(self.artifacts_dir, ignore_errors=True)
+
+    def test_reload_swaps_version(self):
+        """A published version is smoke-tested, swapped in, and recorded in predictions."""
+        publish('v1', source_dir=DATA_DIR, artifacts_dir=self.artifacts_dir)
+        publish('v2', source_dir=DATA_DIR, artifacts_dir=self.artifacts_dir)
+        self.assertEqual(read_manifest(self.artifacts_dir)['active'], 'v1')
+
+        reloader = ModelReloader(artifacts_dir=self.artifacts_dir)
+        result = reloader.reload('v2', activate=True)
+
+        self.assertEqual(result['status'], 'swapped')
+        self.assertTrue(result['smoke_test']['passed'])
+        self.assertEqual(result['smoke_test']['max_score_change'], 0)
+        self.assertEqual(get_model_registry().version, 'v2')
+        self.assertEqual(read_manifest(self.artifacts_dir)['active'], 'v2')
+        self.assertEqual(get_predictor().predict({})['model_version'], 'v2')
+
+    def test_pinned_request_keeps_old_version(self):
+        """A request that started before the swap finishes on the old model."""
+        publish('v1', source_dir=DATA_DIR, artifacts_dir=self.artifacts_dir)
+        token = pin_model_registry()
+        try:
+            old_predictor = get_predictor()
+            ModelReloader(artifacts_dir=self.artifacts_dir).reload('v1')
+            self.assertIs(get_predictor(), old_predictor)
+            self.assertEqual(get_predictor().model_version, self.original.version)
+        finally:
+            unpin_model_registry(token)
+        self.assertEqual(get_predictor().model_version, 'v1')
+
+    def test_broken_version_is_not_swapped(self):
+        """A version whose artifacts fail to load keeps the current model live."""
+        publish('broken', source_dir=DATA_DIR, artifacts_dir=self.artifacts_dir)
+        os.remove(os.path.join(self.artifacts_dir, 'broken', 'model.pkl'))
+
+        result = ModelReloader(artifacts_dir=self.artifacts_dir).reload('broken')
+        self.assertEqual(result['status'], 'failed')
+        self.assertIs(get_model_registry(), self.original)
+
+    def test_tampered_version_is_rejected(self):
+        """A version whose files differ from the manifest checksums is not loaded."""
+        publish('tampered', source_dir=DATA_DIR, artifacts_dir=self.artifacts_dir)
+        with open(os.path.join(self.artifacts_dir, 'tampered', 'scaler.pkl'), 'ab') as f:
+            f.write(b'\0')
+
+        reloader = ModelReloader(artifacts_dir=self.artifacts_dir)
+        result = reloader.reload('tampered')
+        self.assertEqual(result['status'], 'failed')
+        self.assertIn('Checksum mismatch for scaler.pkl', result['error'])
+        self.assertIs(get_model_registry(), self.original)
+        self.assertIsNone(reloader.check_manifest())
+
+    def test_smoke_test_tolerates_rounding_between_paths(self):
+        """Batch and single-applicant results may differ by one rounding step, not more."""
+        applicants = load_samples()
+        predict_many = CreditScorePredictor.predict_many
+
+        def shifted(probability_shift, score_shift):
+            def predict(self, *args, **kwargs):
+                result = predict_many(self, *args, **kwargs)
+                result['probability_of_default'] = result['probability_of_default'] + probability_shift
+                result['score'] = result['score'] + score_shift
+                return result
+            return predict
+
+        for probability_shift, score_shift, passed in ((1e-4, 1, True), (1e-3, 0, False), (0, 2, False)):
+            with self.subTest(probability_shift=probability_shift, score_shift=score_shift):
+                with mock.patch.object(CreditScorePredictor, 'predict_many', shifted(probability_shift, score_shift)):
+                    result = smoke_test(self.original, applicants)
+                self.assertEqual(result['passed'], passed, result['failures'])
+
+
+if __name__ == '__main__':
+    unittest.main()
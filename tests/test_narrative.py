@@ -0,0 +1,364 @@
+import unittest
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from app import create_app
+from config import Config
+from utils import audit_logger, narrative
+from utils.audit_logger import AuditLogger
+from utils.audit_storage import JsonlAuditStorage
+from utils.lru_cache import LRUCache
+from utils.narrative import CircuitBreaker, NarrativeCache, NarrativeClient
+from utils.recommendations import RecommendationEngine
+
+EXPLANATIONS = {'positive': ['Consistent income'], 'negative': ['High spending volatility']}
+IMPROVEMENTS = [{'action': 'Reduce spending volatility', 'timeline': '3 months'}]
+
+
+class StubInferenceServer:
+    """Local HTTP server answering like the HuggingFace Inference API."""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.status = 200
+        self.requests = 0
+        self.client_ports = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, so pooled connections are reused
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                stub.requests += 1
+                stub.client_ports.add(self.client_address[1])
+                prompt = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['inputs']
+                time.sleep(stub.delay)
+                if stub.status == 200:
+                    body = json.dumps([{'generated_text': prompt + ' You are doing well.'}]).encode()
+                else:
+                    body = json.dumps({'error': 'model overloaded'}).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/models/stub'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestNarrativeClient(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubInferenceServer()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = NarrativeClient(url=self.stub.url, api_key='test', workers=2, budget_ms=500,
+                                      timeout_seconds=5, breaker_failures=3, breaker_reset_seconds=60,
+                                      results_dir=self.tmp.name)
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.close()
+        self.tmp.cleanup()
+
+    def _wait_for(self, narrative_id, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            result = self.client.result(narrative_id)
+            if result['status'] != 'pending':
+                return result
+            time.sleep(0.01)
+        self.fail('narrative still pending')
+
+    def test_in_budget_reuses_connection(self):
+        for _ in range(5):
+            text, status = self.client.generate('Explain my score.')
+            self.assertEqual(text, 'You are doing well.')
+            self.assertEqual(status, {'narrative_status': 'ready'})
+        self.assertEqual(self.stub.requests, 5)
+        self.assertEqual(len(self.stub.client_ports), 1)
+        self.assertEqual(self.client.metrics()['in_budget'], 5)
+
+    def test_late_result_is_kept(self):
+        self.stub.delay = 0.3
+        self.client.budget_ms = 50
+        start = time.perf_counter()
+        text, status = self.client.generate('Explain my score.')
+        self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertIsNone(text)
+        self.assertEqual(status['narrative_status'], 'pending')
+
+        result = self._wait_for(status['narrative_id'])
+        self.assertEqual(result, {'status': 'ready', 'narrative': 'You are doing well.'})
+        self.assertEqual(self.client.metrics()['late'], 1)
+        self.assertIsNone(self.client.result('unknown'))
+
+    def test_late_result_is_shared_with_other_workers(self):
+        """Another process's client (same results dir) answers for a late narrative."""
+        other = NarrativeClient(url=self.stub.url, api_key='test', results_dir=self.tmp.name)
+        self.stub.delay = 0.3
+        self.client.budget_ms = 50
+        _, status = self.client.generate('Explain my score.')
+        self.assertEqual(other.result(status['narrative_id']), {'status': 'pending'})
+
+        self._wait_for(status['narrative_id'])
+        self.assertEqual(other.result(status['narrative_id']),
+                         {'status': 'ready', 'narrative': 'You are doing well.'})
+        self.assertIsNone(other.result('../' + os.path.basename(self.tmp.name)))
+
+        # In-budget results stay in the calling process
+        self.client.budget_ms = 1000
+        self.stub.delay = 0.0
+        text, status = self.client.generate('Explain my score.')
+        self.assertEqual(status, {'narrative_status': 'ready'})
+        self.assertEqual(len(os.listdir(self.tmp.name)), 1)
+
+    def test_breaker_opens_after_repeated_failures(self):
+        self.stub.status = 503
+        for _ in range(3):
+            text, status = self.client.generate('Explain my score.')
+            self.assertIsNone(text)
+            self.assertEqual(status['narrative_status'], 'failed')
+        self.assertEqual(self.client.breaker.state, 'open')
+
+        text, status = self.client.generate('Explain my score.')
+        self.assertEqual(status, {'narrative_status': 'circuit_open'})
+        self.assertEqual(self.stub.requests, 3)
+
+        # After the reset period one trial call goes through and closes the breaker
+        self.stub.status = 200
+        self.client.breaker.reset_seconds = 0
+        text, status = self.client.generate('Explain my score.')
+        self.assertEqual(text, 'You are doing well.')
+        self.assertEqual(self.client.breaker.state, 'closed')
+
+    def test_overload_skips_the_call(self):
+        self.stub.delay = 0.2
+        self.client.budget_ms = 0
+        self.client.max_pending = 1
+        _, first = self.client.generate('Explain my score.')
+        _, second = self.client.generate('Explain my score.')
+        self.assertEqual(first['narrative_status'], 'pending')
+        self.assertEqual(second, {'narrative_status': 'overloaded'})
+        self._wait_for(first['narrative_id'])
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_half_open_allows_one_trial(self):
+        breaker = CircuitBreaker(failures=2, reset_seconds=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.opened, 2)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+
+class TestNarrativeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'narratives.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_score_is_reworded_within_bucket(self):
+        cache = NarrativeCache(max_entries=10, ttl_seconds=60, path='', score_bucket=10)
+        signature = cache.signature(683, 'Good', EXPLANATIONS, IMPROVEMENTS)
+        self.assertEqual(signature, cache.signature(689, 'Good', EXPLANATIONS, IMPROVEMENTS))
+        self.assertNotEqual(signature, cache.signature(690, 'Good', EXPLANATIONS, IMPROVEMENTS))
+
+        cache.put(signature, 683, 'Your score of 683 is solid.')
+        self.assertEqual(cache.get(signature, 687), 'Your score of 687 is solid.')
+
+    def test_only_the_score_itself_is_reworded(self):
+        cache = NarrativeCache(max_entries=10, ttl_seconds=60, path='', score_bucket=20)
+        signature = cache.signature(700, 'Good', EXPLANATIONS, IMPROVEMENTS)
+        cache.put(signature, 700, 'At 700, keep 7000 in savings, not 1,700 or 700.5 {per month}. Score: 700.')
+        self.assertEqual(cache.get(signature, 712),
+                         'At 712, keep 7000 in savings, not 1,700 or 700.5 {per month}. Score: 712.')
+
+    def test_persists_across_restarts(self):
+        cache = NarrativeCache(max_entries=10, ttl_seconds=60, path=self.path)
+        signature = cache.signature(683, 'Good', EXPLANATIONS, IMPROVEMENTS)
+        cache.put(signature, 683, 'Your score of 683 is solid.')
+        with open(self.path, 'a') as f:
+            f.write('{"signature": [1, "Go')  # torn write from a crash
+
+        restarted = NarrativeCache(max_entries=10, ttl_seconds=60, path=self.path)
+        self.assertEqual(restarted.loaded, 1)
+        self.assertEqual(restarted.get(signature, 681), 'Your score of 681 is solid.')
+
+    def test_expired_entries_are_dropped_and_compacted(self):
+        cache = NarrativeCache(max_entries=10, ttl_seconds=60, path=self.path)
+        for score in (600, 700, 800):
+            cache.put(cache.signature(score, 'Good', EXPLANATIONS, IMPROVEMENTS), score, 'Text.')
+        with open(self.path, 'r') as f:
+            records = [json.loads(line) for line in f]
+        records[0]['saved_at'] -= 3600
+        records[1]['saved_at'] -= 30
+        with open(self.path, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+
+        restarted = NarrativeCache(max_entries=10, ttl_seconds=60, path=self.path)
+        self.assertEqual(restarted.loaded, 2)
+        self.assertIsNone(restarted.get(tuple(tuple(p) if isinstance(p, list) else p
+                                              for p in records[0]['signature']), 600))
+        with open(self.path, 'r') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        # Ages survive the rewrite
+        ages = sorted(age for _, _, age in restarted.cache.items())
+        self.assertGreater(ages[-1], 29)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+    def test_workers_appending_while_another_compacts_lose_nothing(self):
+        """Appends from forked workers survive a concurrent load + compaction."""
+        seed = NarrativeCache(max_entries=1000, ttl_seconds=60, path=self.path)
+        seed.put(seed.signature(600, 'Fair', EXPLANATIONS, IMPROVEMENTS), 600, 'Text.')
+        with open(self.path, 'a') as f:
+            f.write('torn\n')  # forces every load to compact
+
+        def append(worker):
+            cache = NarrativeCache(max_entries=1000, ttl_seconds=60, path=self.path)
+            for i in range(100):
+                cache.put(cache.signature(700, 'Good', EXPLANATIONS, [{'action': f'{worker}-{i}'}]), 700, 'Text.')
+
+        def compact():
+            for _ in range(20):
+                NarrativeCache(max_entries=1000, ttl_seconds=60, path=self.path)
+                with open(self.path, 'a') as f:
+                    f.write('torn\n')
+
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=append, args=(worker,)) for worker in range(3)]
+        processes.append(context.Process(target=compact))
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+
+        self.assertEqual(NarrativeCache(max_entries=1000, ttl_seconds=60, path=self.path).loaded, 301)
+
+    def test_lru_restores_age(self):
+        cache = LRUCache(max_entries=2, ttl_seconds=10)
+        cache.put('old', 1, age_seconds=11)
+        cache.put('new', 2, age_seconds=5)
+        self.assertEqual([key for key, _, _ in cache.items()], ['new'])
+        self.assertIsNone(cache.get('old'))
+
+
+class TestNarrativeRecommendations(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubInferenceServer()
+        self.previous_client = narrative._client
+        self.previous_cache = narrative._cache
+        narrative._client = NarrativeClient(url=self.stub.url, api_key='test', workers=2, budget_ms=500,
+                                            timeout_seconds=5, breaker_failures=3, breaker_reset_seconds=60)
+        narrative._cache = NarrativeCache(max_entries=100, ttl_seconds=600, path='')
+        self.key = mock.patch.object(Config, 'HUGGINGFACE_API_KEY', 'test')
+        self.key.start()
+
+    def tearDown(self):
+        self.key.stop()
+        narrative._client.close()
+        narrative._client = self.previous_client
+        narrative._cache = self.previous_cache
+        self.stub.close()
+
+    def test_template_without_api_key(self):
+        with mock.patch.object(Config, 'HUGGINGFACE_API_KEY', ''):
+            result = RecommendationEngine().generate_citizen_recommendations(680, 'Good', EXPLANATIONS, IMPROVEMENTS)
+        self.assertNotIn('narrative_source', result)
+        self.assertEqual(self.stub.requests, 0)
+
+    def test_ai_narrative_in_budget(self):
+        result = RecommendationEngine().generate_citizen_recommendations(680, 'Good', EXPLANATIONS, IMPROVEMENTS)
+        self.assertEqual(result['narrative'], 'You are doing well.')
+        self.assertEqual(result['narrative_source'], 'ai')
+
+    def test_same_signature_reuses_narrative(self):
+        engine = RecommendationEngine()
+        first = engine.generate_citizen_recommendations(683, 'Good', EXPLANATIONS, IMPROVEMENTS)
+        self.assertNotIn('narrative_cached', first)
+
+        # Same bucket, category, factors (up to case) and action: no second call
+        explanations = {'positive': [' consistent income'], 'negative': ['HIGH SPENDING VOLATILITY']}
+        second = engine.generate_citizen_recommendations(687, 'Good', explanations, IMPROVEMENTS)
+        self.assertTrue(second['narrative_cached'])
+        self.assertEqual(second['narrative_source'], 'ai')
+        self.assertEqual(self.stub.requests, 1)
+
+        # A different top action is a different signature
+        engine.generate_citizen_recommendations(683, 'Good', EXPLANATIONS, [{'action': 'Pay on time'}])
+        self.assertEqual(self.stub.requests, 2)
+
+    def test_concurrent_misses_share_one_call(self):
+        self.stub.delay = 0.2
+        engine = RecommendationEngine()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: engine.generate_citizen_recommendations(
+                683, 'Good', EXPLANATIONS, IMPROVEMENTS), range(4)))
+        self.assertEqual(self.stub.requests, 1)
+        self.assertTrue(all(result['narrative'] == 'You are doing well.' for result in results))
+        self.assertEqual(narrative._client.metrics()['joined'], 3)
+
+    def test_template_then_follow_up_endpoint(self):
+        self.stub.delay = 0.3
+        narrative._client.budget_ms = 20
+        tmp = tempfile.TemporaryDirectory()
+        previous_logger = audit_logger._logger
+        audit_logger._logger = AuditLogger(storage=JsonlAuditStorage(os.path.join(tmp.name, 'audit')))
+        try:
+            client = create_app().test_client()
+            token = client.post('/api/auth/login', json={
+                'email': 'citizen@test.com', 'password': 'password'}).get_json()['token']
+            headers = {'Authorization': f'Bearer {token}'}
+            sample = client.get('/api/citizen/sample-analysis', headers=headers).get_json()
+            recommendations = sample['recommendations']
+            self.assertEqual(recommendations['narrative_source'], 'template')
+            self.assertEqual(recommendations['narrative_status'], 'pending')
+
+            url = f"/api/citizen/narrative/{recommendations['narrative_id']}"
+            deadline = time.monotonic() + 5
+            body = client.get(url, headers=headers).get_json()
+            while body['status'] == 'pending' and time.monotonic() < deadline:
+                time.sleep(0.02)
+                body = client.get(url, headers=headers).get_json()
+            self.assertEqual(body['status'], 'ready')
+            self.assertEqual(body['narrative'], 'You are doing well.')
+
+            self.assertEqual(client.get('/api/citizen/narrative/unknown', headers=headers).status_code, 404)
+        finally:
+            audit_logger._logger.storage.close()
+            audit_logger._logger = previous_logger
+            tmp.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+
+import unittest
+import os
+import sys
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import numpy as np
+
+from ml.feature_extractor import FeatureExtractor
+from ml.score_rules import ScoreCapRules
+
+
+def legacy_caps(score, pay_status, overdraft_freq, volatility, expense_ratio):
+    """The hard-coded cap chain the rule table replaces."""
+    if pay_status > 0:
+        score = min(score, 660)
+    if pay_status >= 2:
+        score = min(score, 579)
+    if overdraft_freq > 0.2:
+        score = min(score, 550)
+    elif overdraft_freq > 0.1:
+        score = min(score, 620)
+    elif overdraft_freq > 0:
+        score = min(score, 740)
+    if volatility > 1.0:
+        score = min(score, 720)
+    if expense_ratio > 0.95:
+        score = min(score, 650)
+    return score
+
+
+class TestScoreCapRules(unittest.TestCase):
+    def setUp(self):
+        self.rules = ScoreCapRules()
+
+    def test_matches_legacy_cap_chain(self):
+        """The compiled table caps scores exactly like the old if-chain."""
+        rng = np.random.default_rng(7)
+        n = 5000
+        features = np.zeros((n, len(FeatureExtractor.MODEL_FEATURES)))
+        raw = np.zeros((n, len(FeatureExtractor.RAW_FEATURES)))
+        features[:, FeatureExtractor.MODEL_FEATURES.index('PAY_0')] = rng.integers(-2, 5, n)
+        for name in ['overdraft_frequency', 'transaction_volatility', 'expense_ratio']:
+            values = rng.choice([0.0, 0.05, 0.1, 0.15, 0.2, 0.3, 0.95, 1.0, 1.5], n)
+            raw[:, FeatureExtractor.RAW_FEATURES.index(name)] = values
+        scores = rng.integers(300, 851, n)
+
+        capped, fired = self.rules.apply(scores, features, raw)
+
+        self.assertEqual(fired.shape, (n, len(ScoreCapRules.DEFAULT_RULES)))
+        col = {name: raw[:, i] for i, name in enumerate(FeatureExtractor.RAW_FEATURES)}
+        pay = features[:, FeatureExtractor.MODEL_FEATURES.index('PAY_0')]
+        for i in range(n):
+            expected = legacy_caps(scores[i], pay[i], col['overdraft_frequency'][i],
+                                   col['transaction_volatility'][i], col['expense_ratio'][i])
+            self.assertEqual(capped[i], expected)
+
+    def test_apply_one_reports_fired_rules(self):
+        score, fired = self.rules.apply_one(
+            800, {'PAY_0': 2}, {'overdraft_frequency': 0.15, 'expense_ratio': 0.5}
+        )
+        self.assertEqual(score, 579)
+        self.assertEqual(fired, ['late_payment', 'late_payment_2_months',
+                                 'overdraft_frequent', 'overdraft_any'])
+
+    def test_less_than_comparator(self):
+        rules = ScoreCapRules([('thin_history', 'account_age', '<', 60, 700)])
+        score, fired = rules.apply_one(820, {}, {'account_age': 30})
+        self.assertEqual((score, fired), (700, ['thin_history']))
+        score, fired = rules.apply_one(820, {}, {'account_age': 60})
+        self.assertEqual((score, fired), (820, []))
+
+    def test_unknown_feature_rejected(self):
+        with self.assertRaises(ValueError):
+            ScoreCapRules([('bad', 'not_a_feature', '>', 0, 500)])
+
+
+if __name__ == '__main__':
+    unittest.main()
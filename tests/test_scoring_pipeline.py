@@ -0,0 +1,276 @@
+import unittest
+import glob
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import numpy as np
+
+from app import create_app
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions
+from ml.pipeline import ScoringPipeline, get_scoring_pipeline, stages_for_fields
+from ml.predictor import get_predictor
+from ml.explainer import get_explainer
+from ml.counterfactual import get_counterfactual_generator
+from ml.registry import ModelRegistry, swap_model_registry
+from utils import audit_logger
+from utils.audit_logger import AuditLogger
+from utils.audit_storage import JsonlAuditStorage
+from utils.recommendations import get_recommendation_engine
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '../backend/data/samples')
+
+
+class TestScoringPipeline(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = get_scoring_pipeline()
+        self.applicants = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                self.applicants.append(parse_csv_transactions(f.read()))
+
+    def test_citizen_run_matches_step_by_step(self):
+        """The pipeline returns what the old extract/predict/explain/... sequence did."""
+        result = self.pipeline.run(self.applicants, audience='citizen')
+
+        extractor = FeatureExtractor()
+        for transactions, applicant in zip(self.applicants, result.applicants):
+            prediction = get_predictor().predict(extractor.extract_features(transactions))
+            explanations = get_explainer().explain(prediction['feature_vector'],
+                                                   prediction['feature_values'],
+                                                   prediction['raw_features'])
+            improvements = get_counterfactual_generator().generate_improvements(
+                prediction['feature_values'], prediction['raw_features'], prediction['score'])
+            recommendations = get_recommendation_engine().generate_citizen_recommendations(
+                prediction['score'], prediction['category'], explanations, improvements)
+
+            with self.subTest(score=prediction['score']):
+                self.assertEqual(applicant.score, prediction['score'])
+                self.assertEqual(applicant.category, prediction['category'])
+                self.assertEqual(applicant.probability_of_default, prediction['probability_of_default'])
+                self.assertEqual(applicant.explanations['positive'], explanations['positive'])
+                self.assertEqual(applicant.explanations['negative'], explanations['negative'])
+                for key, value in explanations['feature_importance'].items():
+                    self.assertAlmostEqual(applicant.explanations['feature_importance'][key], value, places=6)
+                self.assertEqual(applicant.improvements, improvements)
+                self.assertEqual(applicant.recommendations['narrative'], recommendations['narrative'])
+                self.assertEqual(applicant.recommendations['next_steps'], recommendations['next_steps'])
+
+    def test_bank_run_skips_counterfactuals(self):
+        """Bank runs build bank recommendations and never time the counterfactual stage."""
+        ids = [f'APP{i}' for i in range(len(self.applicants))]
+        result = self.pipeline.run(self.applicants, audience='bank', applicant_ids=ids)
+
+        self.assertNotIn('counterfactual', result.timings_ms)
+        self.assertNotIn('audit', result.timings_ms)  # no audit callback given
+        for stage in ('extract', 'predict', 'explain', 'recommend'):
+            self.assertIn(stage, result.timings_ms)
+        for applicant_id, applicant in zip(ids, result.applicants):
+            self.assertEqual(applicant.applicant_id, applicant_id)
+            self.assertIsNone(applicant.improvements)
+            self.assertIn('decision', applicant.recommendations)
+
+    def test_scaled_matrix_reused(self):
+        """Explanations from the predictor's scaled rows equal re-scaling them."""
+        features = self.pipeline.extract(self.applicants)
+        prediction = self.pipeline.predict(features)
+        if prediction.scaled_matrix is None:
+            self.skipTest('model artifacts not available')
+
+        explainer = self.pipeline.explainer
+        np.testing.assert_allclose(prediction.scaled_matrix,
+                                   explainer.scaler.transform(features.feature_matrix))
+        row = features.feature_matrix[0]
+        values = dict(zip(FeatureExtractor.MODEL_FEATURES, row.tolist()))
+        self.assertEqual(explainer.explain(row, values, {}, scaled_vector=prediction.scaled_matrix[0]),
+                         explainer.explain(row, values, {}))
+
+    def test_row_errors_and_audit(self):
+        """Audit runs per applicant; with row_errors a failure stays on its row."""
+        audited = []
+
+        def audit(result):
+            if result.applicant_id == 'bad':
+                raise RuntimeError('audit store down')
+            audited.append(result.applicant_id)
+
+        result = self.pipeline.run(self.applicants[:2], audience='bank', audit=audit,
+                                   applicant_ids=['ok', 'bad'], row_errors=True)
+        self.assertEqual(audited, ['ok'])
+        self.assertIsNone(result.applicants[0].error)
+        self.assertEqual(result.applicants[1].error, 'audit store down')
+
+        with self.assertRaises(RuntimeError):
+            self.pipeline.run(self.applicants[:2], audience='bank', audit=audit,
+                              applicant_ids=['ok', 'bad'])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            self.pipeline.run(self.applicants, audience='insurer')
+        with self.assertRaises(ValueError):
+            self.pipeline.run(self.applicants, stages=('explain', 'narrate'))
+        self.assertEqual(self.pipeline.run([]).applicants, [])
+
+    def test_metrics(self):
+        pipeline = ScoringPipeline()
+        pipeline.run(self.applicants, audience='citizen', stages=('explain',))
+        metrics = pipeline.metrics()
+        self.assertEqual(metrics['runs'], 1)
+        self.assertEqual(metrics['rows'], len(self.applicants))
+        self.assertEqual(set(metrics['stage_ms']), {'extract', 'cache', 'predict', 'explain'})
+        self.assertEqual(metrics['cache']['misses'], len(self.applicants))
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.applicants = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                self.applicants.append(parse_csv_transactions(f.read()))
+        self.pipeline = ScoringPipeline()
+
+    def test_hits_skip_model_work(self):
+        """A repeated history is served without the predictor, explainer or counterfactuals."""
+        first = self.pipeline.run(self.applicants, audience='citizen')
+        with mock.patch.object(self.pipeline.predictor, 'predict_many') as predict, \
+                mock.patch.object(self.pipeline.explainer, 'explain_many') as explain, \
+                mock.patch.object(self.pipeline.counterfactual, 'generate_improvements') as improve:
+            second = self.pipeline.run(self.applicants, audience='citizen')
+        predict.assert_not_called()
+        explain.assert_not_called()
+        improve.assert_not_called()
+        self.assertNotIn('predict', second.timings_ms)
+
+        for cold, warm in zip(first.applicants, second.applicants):
+            self.assertEqual(warm.score, cold.score)
+            self.assertEqual(warm.explanations, cold.explanations)
+            self.assertEqual(warm.improvements, cold.improvements)
+            self.assertEqual(warm.recommendations['narrative'], cold.recommendations['narrative'])
+        metrics = self.pipeline.cache.metrics()
+        self.assertEqual(metrics['hits'], len(self.applicants))
+        self.assertEqual(metrics['misses'], len(self.applicants))
+
+    def test_only_misses_are_scored(self):
+        """In a mixed batch only the new rows go through the model, in order."""
+        self.pipeline.run(self.applicants[:2], audience='bank')
+        original = self.pipeline.predictor.predict_many
+        with mock.patch.object(self.pipeline.predictor, 'predict_many', side_effect=original) as predict:
+            result = self.pipeline.run(self.applicants, audience='bank')
+        self.assertEqual(len(predict.call_args[0][0]), len(self.applicants) - 2)
+
+        reference = ScoringPipeline().run(self.applicants, audience='bank')
+        self.assertEqual([a.score for a in result.applicants], [a.score for a in reference.applicants])
+        self.assertEqual([a.anomaly for a in result.applicants], [a.anomaly for a in reference.applicants])
+
+    def test_key_covers_requested_stages(self):
+        """A score-only entry is not served to a request that needs explanations."""
+        self.pipeline.run(self.applicants[:1], stages=stages_for_fields('citizen', ['score']))
+        result = self.pipeline.run(self.applicants[:1], audience='citizen')
+        self.assertEqual(self.pipeline.cache.hits, 0)
+        self.assertIsNotNone(result.applicants[0].explanations)
+
+    def test_ttl_and_eviction(self):
+        with mock.patch('ml.pipeline.Config.RESULT_CACHE_SIZE', 2), \
+                mock.patch('ml.pipeline.Config.RESULT_CACHE_TTL_SECONDS', 60):
+            pipeline = ScoringPipeline()
+        pipeline.run(self.applicants[:3], stages=())
+        self.assertEqual(len(pipeline.cache), 2)
+        self.assertEqual(pipeline.cache.evictions, 1)
+
+        with mock.patch('utils.lru_cache.time.monotonic', return_value=time.monotonic() + 61):
+            pipeline.run(self.applicants[1:3], stages=())
+        self.assertEqual(pipeline.cache.expirations, 2)
+        self.assertEqual(pipeline.cache.hits, 0)
+
+    def test_disabled(self):
+        with mock.patch('ml.pipeline.Config.RESULT_CACHE_SIZE', 0):
+            pipeline = ScoringPipeline()
+        pipeline.run(self.applicants, stages=())
+        result = pipeline.run(self.applicants, stages=())
+        self.assertEqual(len(pipeline.cache), 0)
+        self.assertNotIn('cache', result.timings_ms)
+
+    def test_registry_swap_starts_empty(self):
+        """The cache lives on the per-version pipeline, so a swap drops it."""
+        get_scoring_pipeline().run(self.applicants[:1], stages=())
+        previous = swap_model_registry(ModelRegistry())
+        try:
+            pipeline = get_scoring_pipeline()
+            self.assertEqual(len(pipeline.cache), 0)
+            pipeline.run(self.applicants[:1], stages=())
+            self.assertEqual(pipeline.cache.hits, 0)
+        finally:
+            swap_model_registry(previous)
+
+
+class TestIncludeFields(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.previous_logger = audit_logger._logger
+        audit_logger._logger = AuditLogger(storage=JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')))
+        self.client = create_app().test_client()
+        token = self.client.post('/api/auth/login', json={
+            'email': 'admin@test.com', 'password': 'password'}).get_json()['token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+        with open(os.path.join(SAMPLES_DIR, 'good.csv'), 'r') as f:
+            self.csv = f.read()
+        self.pipeline = get_scoring_pipeline()
+
+    def tearDown(self):
+        audit_logger._logger.storage.close()
+        audit_logger._logger = self.previous_logger
+        self.tmp.cleanup()
+
+    def _post(self, path, body, query=''):
+        return self.client.post(f'{path}{query}', json=body, headers=self.headers)
+
+    def test_score_only_skips_later_stages(self):
+        """include=score runs neither the explainer, counterfactuals nor recommendations."""
+        with mock.patch.object(self.pipeline.explainer, 'explain') as explain, \
+                mock.patch.object(self.pipeline.counterfactual, 'generate_improvements') as improve, \
+                mock.patch.object(self.pipeline.anomaly_scorer, 'score_many') as anomaly:
+            citizen = self._post('/api/citizen/score', {'csv_content': self.csv, 'include': 'score'})
+            bank = self._post('/api/bank/score', {'applicant_id': 'A1', 'csv_content': self.csv},
+                              query='?include=score')
+        explain.assert_not_called()
+        improve.assert_not_called()
+        anomaly.assert_not_called()
+
+        full = self._post('/api/citizen/score', {'csv_content': self.csv}).get_json()
+        self.assertEqual(citizen.status_code, 200)
+        self.assertEqual(set(citizen.get_json()),
+                         {'score', 'category', 'probability_of_default', 'trend',
+                          'reward_eligible', 'model_version'})
+        self.assertEqual(citizen.get_json()['score'], full['score'])
+        self.assertEqual(set(bank.get_json()),
+                         {'applicant_id', 'score', 'probability_of_default', 'model_version'})
+
+        # The skipped stages do not stop the request from being audited
+        actions = [log['action'] for log in audit_logger._logger.get_logs(limit=10)['logs']]
+        self.assertEqual(sorted(actions), ['risk_assessment', 'score_request', 'score_request'])
+
+    def test_field_groups(self):
+        """Each group returns its keys, with the same values as a full response."""
+        body = {'applicant_id': 'A1', 'csv_content': self.csv}
+        full = self._post('/api/bank/score', body).get_json()
+        partial = self._post('/api/bank/score', {**body, 'fields': ['anomaly', 'factors']}).get_json()
+        self.assertNotIn('recommendation', partial)
+        for key in ('anomaly', 'risk_factors', 'positive_factors', 'feature_importance', 'score'):
+            self.assertEqual(partial[key], full[key])
+
+        self.assertEqual(stages_for_fields('citizen', ['recommendations']),
+                         {'explain', 'counterfactual', 'recommend', 'audit'})
+
+    def test_unknown_field_rejected(self):
+        response = self._post('/api/citizen/score', {'csv_content': self.csv, 'include': ['score', 'shap']})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('shap', response.get_json()['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import glob
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend'))
+
+
+def post(port, path, body, token=None):
+    """POST JSON on a new connection, so the kernel may hand it to any worker."""
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'serve.py needs os.fork()')
+class TestPreforkServer(unittest.TestCase):
+    def setUp(self):
+        self.process = subprocess.Popen(
+            [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', '0', '--workers', '2'],
+            cwd=BACKEND_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        self.port = None
+        for line in self.process.stdout:
+            match = re.search(r'Serving on http://127\.0\.0\.1:(\d+) with 2 workers', line)
+            if match:
+                self.port = int(match.group(1))
+                break
+
+    def tearDown(self):
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(timeout=20), 0)
+        self.process.stdout.close()
+
+    def test_workers_serve_and_stop(self):
+        """Preloaded workers answer requests and exit on SIGTERM."""
+        self.assertIsNotNone(self.port, 'server did not start')
+        for _ in range(4):
+            with urllib.request.urlopen(f'http://127.0.0.1:{self.port}/api/health', timeout=10) as response:
+                self.assertEqual(json.load(response)['status'], 'healthy')
+
+    def test_what_if_session_works_on_every_worker(self):
+        """Slider follow-ups succeed whichever worker accepts the connection."""
+        self.assertIsNotNone(self.port, 'server did not start')
+        _, login = post(self.port, '/api/auth/login', {'email': 'citizen@test.com', 'password': 'password'})
+        with open(sorted(glob.glob(os.path.join(BACKEND_DIR, 'data', 'samples', '*.csv')))[0], 'r') as f:
+            csv_content = f.read()
+        status, opened = post(self.port, '/api/citizen/what-if', {'csv_content': csv_content}, login['token'])
+        self.assertEqual(status, 200)
+
+        results = []
+        for value in range(12):
+            status, data = post(self.port, '/api/citizen/what-if',
+                                {'session_id': opened['session_id'], 'changes': {'PAY_0': value % 4}},
+                                login['token'])
+            self.assertEqual(status, 200, data)
+            results.append(data['result']['score'])
+        self.assertEqual(results[:4], results[4:8])
+
+
+if __name__ == '__main__':
+    unittest.main()
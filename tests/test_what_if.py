@@ -0,0 +1,221 @@
+import unittest
+import glob
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add backend to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import numpy as np
+
+from app import create_app
+from ml.feature_extractor import FeatureExtractor, parse_csv_transactions, transactions_to_block
+from ml.what_if import WhatIfEngine, get_what_if_engine
+from utils import audit_logger
+from utils.audit_logger import AuditLogger
+from utils.audit_storage import JsonlAuditStorage
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '../backend/data/samples')
+
+
+class TestWhatIfEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = get_what_if_engine()
+        if self.engine.ensemble is None:
+            self.skipTest('No trained model')
+        applicants = []
+        for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv'))):
+            with open(path, 'r') as f:
+                applicants.append(parse_csv_transactions(f.read()))
+        feature_matrix, raw_matrix = FeatureExtractor().extract_features_many(*transactions_to_block(applicants))
+        self.rows = list(zip(feature_matrix, raw_matrix))
+
+    def _full_score(self, feature_row, raw_row):
+        """Score with a full walk of every compiled tree."""
+        default_prob = self.engine.ensemble.predict_proba(feature_row[None, :])
+        scores, categories, _ = self.engine.predictor.score_probabilities(
+            default_prob, feature_row[None, :], raw_row[None, :])
+        return int(scores[0]), str(categories[0])
+
+    def test_base_matches_full_walk(self):
+        for feature_row, raw_row in self.rows:
+            _, session = self.engine.start(feature_row, raw_row, 'citizen@test.com')
+            self.assertEqual((session.base['score'], session.base['category']),
+                             self._full_score(feature_row, raw_row))
+
+    def test_patched_margin_matches_full_walk(self):
+        """Walking only the trees on changed paths gives the full-walk score."""
+        rng = np.random.default_rng(7)
+        names = self.engine.feature_names
+        for feature_row, raw_row in self.rows:
+            _, session = self.engine.start(feature_row, raw_row, 'citizen@test.com')
+            for _ in range(20):
+                columns = rng.choice(len(names), size=rng.integers(1, 3), replace=False)
+                changes = {names[c]: float(feature_row[c] * rng.uniform(0, 2) + rng.integers(-2, 3))
+                           for c in columns}
+                changed_row = feature_row.copy()
+                changed_row[columns] = list(changes.values())
+                result = self.engine.evaluate(session, changes)
+                with self.subTest(changes=changes):
+                    self.assertEqual((result['score'], result['category']),
+                                     self._full_score(changed_row, raw_row))
+                    self.assertLessEqual(result['trees_evaluated'], len(self.engine.ensemble.roots))
+
+    def test_only_trees_on_changed_paths_are_walked(self):
+        feature_row, raw_row = self.rows[0]
+        _, session = self.engine.start(feature_row, raw_row, 'citizen@test.com')
+        pay_0 = self.engine.feature_names.index('PAY_0')
+        on_path = int((session.first_test[pay_0] < self.engine.ensemble.max_depth).sum())
+
+        result = self.engine.evaluate(session, {'PAY_0': feature_row[pay_0] + 2})
+        self.assertEqual(result['trees_evaluated'], on_path)
+        self.assertLess(on_path, len(self.engine.ensemble.roots))
+
+        unchanged = self.engine.evaluate(session, {'PAY_0': feature_row[pay_0]})
+        self.assertEqual(unchanged['trees_evaluated'], 0)
+        self.assertEqual(unchanged['score'], session.base['score'])
+        self.assertEqual(unchanged['score_change'], 0)
+
+    def test_rules_apply_to_changed_features(self):
+        feature_row, raw_row = self.rows[0]
+        _, session = self.engine.start(feature_row, raw_row, 'citizen@test.com')
+        result = self.engine.evaluate(session, {'PAY_0': 3})
+        self.assertIn('late_payment_2_months', result['rules_fired'])
+        self.assertLessEqual(result['score'], 579)
+
+    def test_invalid_changes(self):
+        feature_row, raw_row = self.rows[0]
+        _, session = self.engine.start(feature_row, raw_row, 'citizen@test.com')
+        for changes in ({'income': 1}, {'PAY_0': 'late'}, {'PAY_0': float('nan')}):
+            with self.subTest(changes=changes):
+                with self.assertRaises(ValueError):
+                    self.engine.evaluate(session, changes)
+
+    def test_sessions_are_per_owner(self):
+        feature_row, raw_row = self.rows[0]
+        session_id, session = self.engine.start(feature_row, raw_row, 'citizen@test.com')
+        self.assertIs(self.engine.session(session_id, 'citizen@test.com'), session)
+        self.assertIsNone(self.engine.session(session_id, 'someone@test.com'))
+        self.assertIsNone(self.engine.session('unknown', 'citizen@test.com'))
+
+    def test_session_is_rebuilt_from_its_id(self):
+        """Another worker (a fresh engine) rebuilds the session from the signed id."""
+        feature_row, raw_row = self.rows[0]
+        session_id, session = self.engine.start(feature_row, raw_row, 'citizen@test.com')
+        other = WhatIfEngine(self.engine.registry)
+
+        restored = other.session(session_id, 'citizen@test.com')
+        self.assertIsNotNone(restored)
+        self.assertEqual(restored.base, session.base)
+        np.testing.assert_array_equal(restored.raw_row, session.raw_row)
+        self.assertEqual(other.evaluate(restored, {'PAY_0': 2}), self.engine.evaluate(session, {'PAY_0': 2}))
+        self.assertEqual(other.metrics()['restored'], 1)
+
+        self.assertIsNone(WhatIfEngine(self.engine.registry).session(session_id, 'someone@test.com'))
+        header, payload, signature = session_id.split('.')
+        self.assertIsNone(other.session(f'{header}.{payload}.{signature[::-1]}', 'citizen@test.com'))
+        with mock.patch.object(other, 'model_version', 'another-model'):
+            other.sessions.clear()
+            self.assertIsNone(other.session(session_id, 'citizen@test.com'))
+
+    def test_falls_back_without_trees(self):
+        """Without a compiled ensemble every what-if goes through predict_many."""
+        with mock.patch.object(WhatIfEngine, '_load_ensemble', return_value=None):
+            engine = WhatIfEngine(self.engine.registry)
+        feature_row, raw_row = self.rows[0]
+        _, session = engine.start(feature_row, raw_row, 'citizen@test.com')
+        changed_row = feature_row.copy()
+        changed_row[engine.feature_names.index('PAY_0')] = 0
+        result = engine.evaluate(session, {'PAY_0': 0})
+        expected = engine.predictor.predict_many(changed_row[None, :], raw_row[None, :])
+        self.assertEqual(result['score'], int(expected['score'][0]))
+        self.assertEqual(result['trees_evaluated'], 0)
+
+
+class TestWhatIfEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.previous_logger = audit_logger._logger
+        audit_logger._logger = AuditLogger(storage=JsonlAuditStorage(os.path.join(self.tmp.name, 'audit')))
+        self.client = create_app().test_client()
+        self.headers = self._login('citizen@test.com')
+        path = sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.csv')))[0]
+        with open(path, 'r') as f:
+            self.csv_content = f.read()
+
+    def tearDown(self):
+        audit_logger._logger.storage.close()
+        audit_logger._logger = self.previous_logger
+        self.tmp.cleanup()
+
+    def _login(self, email):
+        token = self.client.post('/api/auth/login', json={
+            'email': email, 'password': 'password'}).get_json()['token']
+        return {'Authorization': f'Bearer {token}'}
+
+    def test_session_then_changes(self):
+        response = self.client.post('/api/citizen/what-if', headers=self.headers,
+                                    json={'csv_content': self.csv_content})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertNotIn('result', data)
+        self.assertIn('PAY_0', data['features'])
+
+        score = self.client.post('/api/citizen/score', headers=self.headers,
+                                 json={'csv_content': self.csv_content, 'include': 'score'}).get_json()
+        self.assertEqual(data['base']['category'], score['category'])
+        self.assertLessEqual(abs(data['base']['score'] - score['score']), 1)
+
+        response = self.client.post('/api/citizen/what-if', headers=self.headers, json={
+            'session_id': data['session_id'], 'changes': {'PAY_0': 3}})
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()['result']
+        self.assertIn('late_payment_2_months', result['rules_fired'])
+        self.assertEqual(result['score_change'], result['score'] - data['base']['score'])
+
+        actions = [log['action'] for log in audit_logger._logger.get_logs(limit=20)['logs']]
+        self.assertEqual(actions.count('what_if_session'), 1)
+
+    def test_changes_with_transactions(self):
+        response = self.client.post('/api/citizen/what-if', headers=self.headers, json={
+            'csv_content': self.csv_content, 'changes': {'BILL_AMT1': 0}})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('result', response.get_json())
+
+    def test_errors(self):
+        data = self.client.post('/api/citizen/what-if', headers=self.headers,
+                                json={'csv_content': self.csv_content}).get_json()
+        cases = [
+            ({'session_id': data['session_id'], 'changes': {'income': 1}}, 400),
+            ({'session_id': data['session_id'], 'changes': [1]}, 400),
+            ({'session_id': 'expired', 'changes': {'PAY_0': 0}}, 404),
+            ({'changes': {'PAY_0': 0}}, 400),
+        ]
+        for body, status in cases:
+            with self.subTest(body=body):
+                response = self.client.post('/api/citizen/what-if', headers=self.headers, json=body)
+                self.assertEqual(response.status_code, status)
+
+        # Another user cannot read the session
+        response = self.client.post('/api/citizen/what-if', headers=self._login('admin@test.com'), json={
+            'session_id': data['session_id'], 'changes': {'PAY_0': 0}})
+        self.assertEqual(response.status_code, 404)
+
+    def test_without_session_cache(self):
+        """With WHAT_IF_SESSIONS=0 every follow-up rebuilds the session from its id."""
+        engine = get_what_if_engine()
+        with mock.patch.object(engine.sessions, 'max_entries', 0):
+            response = self.client.post('/api/citizen/what-if', headers=self.headers, json={
+                'csv_content': self.csv_content, 'changes': {'PAY_0': 0}})
+            self.assertEqual(response.status_code, 200)
+            first = response.get_json()
+            response = self.client.post('/api/citizen/what-if', headers=self.headers, json={
+                'session_id': first['session_id'], 'changes': {'PAY_0': 0}})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['result'], first['result'])
+
+
+if __name__ == '__main__':
+    unittest.main()